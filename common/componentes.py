@@ -0,0 +1,115 @@
+# Registro dos componentes caros do processo (clientes Redis, LLMs, embeddings, agentes).
+#
+# Nada é construído no import: cada componente é registrado com uma fábrica e
+# criado no primeiro uso (obter), uma única vez por processo. Clientes
+# compartilhados têm um único nome aqui (ex.: "redis" serve histórico, cache das
+# tools e ingestão), então existem uma vez só. Os módulos guardam referências
+# preguiçosas (preguicoso), que repassam os atributos ao componente real:
+#
+#     redis_client = componentes.preguicoso("redis")
+#     redis_client.get(...)   # o cliente é criado aqui, na primeira chamada
+#
+# aquecer() é o hook opcional da subida (COMPONENTES_AQUECER) e estado()
+# informa o que já foi inicializado (GET /ready).
+import threading
+from typing import Callable
+import redis
+import redis.asyncio as aioredis
+from common.env import ENV
+
+_fabricas: dict[str, Callable] = {}
+_instancias: dict[str, object] = {}
+_erros: dict[str, str] = {}
+# Reentrante: uma fábrica pode obter() outros componentes
+_lock = threading.RLock()
+
+
+def registrar(nome: str):
+    """Decorator: registra a função como fábrica do componente `nome`."""
+    def decorador(fabrica):
+        _fabricas[nome] = fabrica
+        return fabrica
+    return decorador
+
+
+def obter(nome: str):
+    """Instância do componente, construída na primeira chamada."""
+    instancia = _instancias.get(nome)
+    if instancia is not None:
+        return instancia
+    with _lock:
+        if nome not in _instancias:
+            try:
+                _instancias[nome] = _fabricas[nome]()
+                _erros.pop(nome, None)
+            except Exception as e:
+                _erros[nome] = f"{type(e).__name__}: {e}"
+                raise
+        return _instancias[nome]
+
+
+def inicializado(nome: str) -> bool:
+    return nome in _instancias
+
+
+def aquecer(nomes: list[str] | None = None) -> dict[str, str]:
+    """Constrói os componentes (todos, sem `nomes`) antes do primeiro uso. Retorna os erros por nome."""
+    erros = {}
+    for nome in nomes or list(_fabricas):
+        try:
+            obter(nome)
+        except Exception as e:
+            erros[nome] = f"{type(e).__name__}: {e}"
+            print(f"[COMPONENTES] Falha ao inicializar {nome}: {erros[nome]}")
+    return erros
+
+
+def estado() -> dict[str, dict]:
+    """{nome: {"inicializado": bool, "erro": str | None}} de todos os componentes registrados."""
+    with _lock:
+        return {nome: {"inicializado": nome in _instancias, "erro": _erros.get(nome)} for nome in _fabricas}
+
+
+class Preguicoso:
+    """Referência a um componente: repassa atributos à instância, criada no primeiro acesso."""
+
+    __slots__ = ("_nome",)
+
+    def __init__(self, nome: str):
+        object.__setattr__(self, "_nome", nome)
+
+    def __getattr__(self, atributo):
+        return getattr(obter(self._nome), atributo)
+
+    def __repr__(self):
+        situacao = "inicializado" if inicializado(self._nome) else "pendente"
+        return f"<componente {self._nome} ({situacao})>"
+
+
+def preguicoso(nome: str) -> Preguicoso:
+    return Preguicoso(nome)
+
+
+# --- Clientes Redis compartilhados ---
+# Os demais componentes são registrados nos módulos que os usam (LLMs e agentes
+# em purpuria/core.py, modelo de embeddings em purpuria/cache_embeddings.py).
+
+@registrar("redis")
+def _redis():
+    return redis.Redis.from_url(ENV.REDIS_URL, decode_responses=True)
+
+
+@registrar("redis_async")
+def _redis_async():
+    return aioredis.Redis.from_url(ENV.REDIS_URL, decode_responses=True)
+
+
+# Binários: os vetores são bytes, então não há decode_responses
+@registrar("redis_bin")
+def _redis_bin():
+    return redis.Redis.from_url(ENV.REDIS_URL)
+
+
+@registrar("redis_bin_async")
+def _redis_bin_async():
+    return aioredis.Redis.from_url(ENV.REDIS_URL)
@@ -10,13 +10,83 @@ class ENV:
 
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+    # "deterministico" (renderiza o JSON do especialista em Python) ou "llm"
+    ORQUESTRADOR_MODO = os.getenv("ORQUESTRADOR_MODO", "deterministico")
+
+    # Confiança mínima (margem entre domínios, 0..1) para o pré-roteador local
+    # dispensar o Roteador LLM. Valores acima de 1 desativam o pré-roteador.
+    PRE_ROTEADOR_LIMIAR = float(os.getenv("PRE_ROTEADOR_LIMIAR", "0.2"))
+
+    # Busca vetorial: "exato" (padrão), "ivf" (NumPy) ou "hnsw" (requer hnswlib).
+    # Abaixo de ANN_MIN_DOCUMENTOS a busca exata é usada mesmo com ANN ativo.
+    ANN_BACKEND = os.getenv("ANN_BACKEND", "exato")
+    ANN_MIN_DOCUMENTOS = int(os.getenv("ANN_MIN_DOCUMENTOS", "5000"))
+    ANN_IVF_LISTAS = int(os.getenv("ANN_IVF_LISTAS", "0"))
+    ANN_IVF_SONDAS = int(os.getenv("ANN_IVF_SONDAS", "8"))
+    ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", "16"))
+    ANN_HNSW_EF_CONSTRUCAO = int(os.getenv("ANN_HNSW_EF_CONSTRUCAO", "200"))
+    ANN_HNSW_EF_BUSCA = int(os.getenv("ANN_HNSW_EF_BUSCA", "64"))
+
+    # Cache semântico de respostas (rotas separadas por vírgula; pedidos/residuos nunca são cacheadas)
+    CACHE_SEMANTICO_ROTAS = os.getenv("CACHE_SEMANTICO_ROTAS", "duvidas_app")
+    CACHE_SEMANTICO_LIMIAR = float(os.getenv("CACHE_SEMANTICO_LIMIAR", "0.92"))
+    CACHE_SEMANTICO_TTL = int(os.getenv("CACHE_SEMANTICO_TTL", str(24 * 3600)))
+
+    # Cache de embeddings: vetores no LRU em memória e TTL (s) do nível no Redis
+    EMBEDDING_CACHE_MAX_MEMORIA = int(os.getenv("EMBEDDING_CACHE_MAX_MEMORIA", "2048"))
+    EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", str(7 * 24 * 3600)))
+
+    # Histórico enviado aos LLMs: janela por etapa ("etapa=turnos:tokens"), trocas
+    # mantidas na íntegra antes de irem para o resumo, tamanho do bloco resumido
+    # de cada vez e máximo de mensagens guardadas na lista do chat
+    HISTORICO_JANELAS = os.getenv(
+        "HISTORICO_JANELAS",
+        "roteador=3:600,especialista=6:2000,orquestrador=2:500,juiz=2:500"
+    )
+    HISTORICO_TURNOS_VERBATIM = int(os.getenv("HISTORICO_TURNOS_VERBATIM", "6"))
+    HISTORICO_BLOCO_RESUMO = int(os.getenv("HISTORICO_BLOCO_RESUMO", "8"))
+    HISTORICO_MAX_MENSAGENS = int(os.getenv("HISTORICO_MAX_MENSAGENS", "200"))
+    # Chats sem atividade por mais que isso (s) expiram do Redis
+    HISTORICO_TTL = int(os.getenv("HISTORICO_TTL", str(30 * 24 * 3600)))
+
+    # Pool PostgreSQL compartilhado (common/postgres.py)
+    POSTGRES_POOL_MIN = int(os.getenv("POSTGRES_POOL_MIN", "1"))
+    POSTGRES_POOL_MAX = int(os.getenv("POSTGRES_POOL_MAX", "10"))
+    POSTGRES_POOL_ESPERA = float(os.getenv("POSTGRES_POOL_ESPERA", "10"))
+    POSTGRES_POOL_VERIFICAR_APOS = float(os.getenv("POSTGRES_POOL_VERIFICAR_APOS", "30"))
+    POSTGRES_CONNECT_TIMEOUT = int(os.getenv("POSTGRES_CONNECT_TIMEOUT", "5"))
+    POSTGRES_STATEMENT_TIMEOUT_MS = int(os.getenv("POSTGRES_STATEMENT_TIMEOUT_MS", "5000"))
+    # Máximo de pedidos por chamada das tools de pedidos (o resto é paginado)
+    PEDIDOS_LIMITE = int(os.getenv("PEDIDOS_LIMITE", "20"))
+    # Orçamento (tokens estimados) do resultado de cada chamada de tool no prompt do agente
+    TOOL_ORCAMENTO_TOKENS = int(os.getenv("TOOL_ORCAMENTO_TOKENS", "1500"))
+    # Cache dos resultados das tools por usuário (TTLs definidos em cada tool)
+    TOOL_CACHE_ATIVO = os.getenv("TOOL_CACHE_ATIVO", "true").lower() == "true"
+    # Pré-busca dos dados do usuário em paralelo com o Roteador LLM (purpuria/prefetch.py)
+    PREFETCH_ATIVO = os.getenv("PREFETCH_ATIVO", "true").lower() == "true"
+    PREFETCH_MAX_CONCORRENTES = int(os.getenv("PREFETCH_MAX_CONCORRENTES", "4"))
+
+    # Cliente MongoDB compartilhado e cache do catálogo de resíduos por empresa
+    MONGO_POOL_MAX = int(os.getenv("MONGO_POOL_MAX", "20"))
+    MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))
+    CATALOGO_CACHE_TTL = int(os.getenv("CATALOGO_CACHE_TTL", "300"))
+    CATALOGO_CACHE_MAX = int(os.getenv("CATALOGO_CACHE_MAX", "1000"))
+    # Invalida o cache pelo change stream da coleção empresas (requer replica set)
+    CATALOGO_CHANGE_STREAM = os.getenv("CATALOGO_CHANGE_STREAM", "false").lower() == "true"
+
+    # Componentes construídos já na subida, em segundo plano (common/componentes.py):
+    # vazio = tudo sob demanda, "todos" ou nomes separados por vírgula (ex.: "redis,llm_fast")
+    COMPONENTES_AQUECER = os.getenv("COMPONENTES_AQUECER", "")
+
+    @classmethod
+    def ausentes(cls) -> list[str]:
+        """Variáveis obrigatórias (sem valor padrão) que não foram definidas."""
+        return [attr for attr, value in cls.__dict__.items()
+                if not attr.startswith("_") and not callable(value) and value is None]
+
     @classmethod
     def check_missing(cls):
-        missing = []
-        for attr, value in cls.__dict__.items():
-            if not attr.startswith("_") and not callable(value):
-                if value is None:
-                    missing.append(attr)
+        missing = cls.ausentes()
         if missing:
             print("[ERROR] Variáveis de ambiente não definidas:")
             for name in missing:
@@ -25,5 +95,4 @@ class ENV:
             print("[INFO] Por favor assegurar-se que tenha um arquivo .env na raíz do seu projeto com essas variáveis claramente definidas e com o exato mesmo nome.")
         else:
             print("[OK] Todas as variáveis de ambiente carregadas.")
-
-ENV.check_missing()
\ No newline at end of file
+        return missing
@@ -0,0 +1,45 @@
+# Cliente MongoDB compartilhado.
+#
+# O MongoClient já mantém o próprio pool de conexões e o monitoramento do
+# cluster; criar um por chamada refaz descoberta de servidores e handshake toda
+# vez. Aqui existe um único cliente por processo, criado sob demanda.
+import threading
+from pymongo import MongoClient
+from common.env import ENV
+
+NOME_BANCO = "purpura"
+
+_cliente: MongoClient | None = None
+_cliente_lock = threading.Lock()
+
+
+def cliente() -> MongoClient:
+    global _cliente
+    if _cliente is None:
+        with _cliente_lock:
+            if _cliente is None:
+                _cliente = MongoClient(
+                    ENV.MONGO_URL,
+                    maxPoolSize=ENV.MONGO_POOL_MAX,
+                    serverSelectionTimeoutMS=ENV.MONGO_TIMEOUT_MS,
+                    connectTimeoutMS=ENV.MONGO_TIMEOUT_MS,
+                    socketTimeoutMS=ENV.MONGO_TIMEOUT_MS,
+                )
+    return _cliente
+
+
+def colecao(nome: str):
+    return cliente()[NOME_BANCO][nome]
+
+
+def inicializado() -> bool:
+    return _cliente is not None
+
+
+def fechar():
+    """Fecha o cliente (chamado no shutdown)."""
+    global _cliente
+    with _cliente_lock:
+        if _cliente is not None:
+            _cliente.close()
+            _cliente = None
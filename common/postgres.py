@@ -0,0 +1,218 @@
+# Pool de conexões PostgreSQL compartilhado por todas as tools SQL.
+#
+# - Um único ThreadedConnectionPool por processo (as tools síncronas rodam no
+#   threadpool do LangChain/FastAPI), criado sob demanda ou no aquecer() do startup.
+# - Conexões em autocommit e somente leitura, com statement_timeout no servidor.
+# - Health check na retirada: conexão fechada ou parada há mais de
+#   POSTGRES_POOL_VERIFICAR_APOS segundos executa SELECT 1; se falhar, é
+#   descartada e substituída.
+# - Com o pool esgotado, espera até POSTGRES_POOL_ESPERA segundos em vez de falhar na hora.
+# - Consultas registradas com preparar() viram prepared statements no servidor
+#   (PREPARE na primeira execução em cada conexão, EXECUTE nas seguintes), então
+#   o Postgres reaproveita o plano.
+import threading
+import time
+from contextlib import contextmanager
+import psycopg2
+import psycopg2.errors
+from psycopg2 import pool as pg_pool
+from psycopg2.extras import RealDictCursor
+from common.env import ENV
+
+_pool: pg_pool.ThreadedConnectionPool | None = None
+_pool_lock = threading.Lock()
+_vagas = threading.BoundedSemaphore(ENV.POSTGRES_POOL_MAX)
+_ultimo_uso: dict[int, float] = {}
+
+# nome → SQL com $1, $2, ... ; e os nomes já preparados em cada conexão
+_consultas: dict[str, str] = {}
+_preparadas: dict[int, set[str]] = {}
+
+_metricas = {
+    "retiradas": 0,
+    "espera_total_s": 0.0,
+    "espera_max_s": 0.0,
+    "em_uso": 0,
+    "descartadas": 0,
+    "falhas_health_check": 0,
+    "timeouts_pool": 0,
+    "erros_consulta": 0,
+}
+_metricas_lock = threading.Lock()
+
+
+def _contar(**valores):
+    with _metricas_lock:
+        for nome, valor in valores.items():
+            _metricas[nome] += valor
+
+
+def _obter_pool() -> pg_pool.ThreadedConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pg_pool.ThreadedConnectionPool(
+                    ENV.POSTGRES_POOL_MIN,
+                    ENV.POSTGRES_POOL_MAX,
+                    ENV.POSTGRES_URL,
+                    connect_timeout=ENV.POSTGRES_CONNECT_TIMEOUT,
+                    options=f"-c statement_timeout={ENV.POSTGRES_STATEMENT_TIMEOUT_MS}",
+                    application_name="purpuria",
+                )
+    return _pool
+
+
+def _esquecer(conn):
+    _ultimo_uso.pop(id(conn), None)
+    _preparadas.pop(id(conn), None)
+
+
+def _preparar(conn):
+    if not conn.autocommit:
+        conn.set_session(readonly=True, autocommit=True)
+
+
+def _saudavel(conn) -> bool:
+    if conn.closed:
+        return False
+    try:
+        _preparar(conn)
+        if time.monotonic() - _ultimo_uso.get(id(conn), 0.0) < ENV.POSTGRES_POOL_VERIFICAR_APOS:
+            return True
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        return True
+    except psycopg2.Error:
+        return False
+
+
+@contextmanager
+def conexao():
+    """Empresta uma conexão saudável do pool e a devolve ao final (descartando se quebrou)."""
+    inicio = time.monotonic()
+    if not _vagas.acquire(timeout=ENV.POSTGRES_POOL_ESPERA):
+        _contar(timeouts_pool=1)
+        raise pg_pool.PoolError(f"Pool PostgreSQL esgotado por mais de {ENV.POSTGRES_POOL_ESPERA}s")
+
+    pool = conn = None
+    try:
+        pool = _obter_pool()
+        conn = pool.getconn()
+        while not _saudavel(conn):
+            _contar(falhas_health_check=1, descartadas=1)
+            _esquecer(conn)
+            descartada, conn = conn, None
+            pool.putconn(descartada, close=True)
+            conn = pool.getconn()
+
+        espera = time.monotonic() - inicio
+        with _metricas_lock:
+            _metricas["retiradas"] += 1
+            _metricas["em_uso"] += 1
+            _metricas["espera_total_s"] += espera
+            _metricas["espera_max_s"] = max(_metricas["espera_max_s"], espera)
+
+        try:
+            yield conn
+        finally:
+            _contar(em_uso=-1)
+    finally:
+        if conn is not None:
+            quebrada = conn.closed != 0
+            if quebrada:
+                _contar(descartadas=1)
+                _esquecer(conn)
+            else:
+                _ultimo_uso[id(conn)] = time.monotonic()
+            pool.putconn(conn, close=quebrada)
+        _vagas.release()
+
+
+def executar(sql: str, params=None) -> list[dict]:
+    """Executa uma consulta com parâmetros e retorna as linhas como dicts."""
+    with conexao() as conn:
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(sql, params)
+                return [dict(linha) for linha in cur.fetchall()]
+        except psycopg2.Error:
+            _contar(erros_consulta=1)
+            raise
+
+
+def preparar(nome: str, sql: str) -> str:
+    """Registra uma consulta parametrizada ($1, $2, ...) para execução como prepared statement."""
+    _consultas[nome] = sql
+    return nome
+
+
+def executar_preparada(nome: str, params: tuple = ()) -> list[dict]:
+    """Executa a consulta registrada em preparar(), preparando-a na conexão se ainda não estiver."""
+    with conexao() as conn:
+        preparadas = _preparadas.setdefault(id(conn), set())
+        marcadores = ", ".join(["%s"] * len(params))
+        execute = f"EXECUTE {nome} ({marcadores})" if params else f"EXECUTE {nome}"
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                for tentativa in range(2):
+                    if nome not in preparadas:
+                        cur.execute(f"PREPARE {nome} AS {_consultas[nome]}")
+                        preparadas.add(nome)
+                    try:
+                        cur.execute(execute, params)
+                        break
+                    except psycopg2.errors.InvalidSqlStatementName:
+                        # Sessão reiniciada no servidor (ex.: DISCARD ALL): prepara de novo
+                        preparadas.clear()
+                        if tentativa:
+                            raise
+                return [dict(linha) for linha in cur.fetchall()]
+        except psycopg2.Error:
+            _contar(erros_consulta=1)
+            raise
+
+
+def aquecer():
+    """Cria o pool e abre POSTGRES_POOL_MIN conexões já validadas (chamado no startup)."""
+    pool = _obter_pool()
+    conexoes = []
+    try:
+        for _ in range(ENV.POSTGRES_POOL_MIN):
+            conn = pool.getconn()
+            _preparar(conn)
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            _ultimo_uso[id(conn)] = time.monotonic()
+            conexoes.append(conn)
+    finally:
+        for conn in conexoes:
+            pool.putconn(conn)
+
+
+def inicializado() -> bool:
+    return _pool is not None
+
+
+def fechar():
+    """Fecha todas as conexões (chamado no shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _ultimo_uso.clear()
+            _preparadas.clear()
+
+
+def metricas() -> dict:
+    """Retiradas, espera média/máxima, conexões em uso/ociosas e falhas do pool."""
+    with _metricas_lock:
+        dados = dict(_metricas)
+    dados["espera_media_s"] = dados["espera_total_s"] / dados["retiradas"] if dados["retiradas"] else 0.0
+    if _pool is not None:
+        dados["abertas"] = len(_pool._used) + len(_pool._pool)
+        dados["ociosas"] = len(_pool._pool)
+    dados["min"] = ENV.POSTGRES_POOL_MIN
+    dados["max"] = ENV.POSTGRES_POOL_MAX
+    return dados
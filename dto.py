@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 
@@ -10,7 +10,51 @@ class MessageResponseDTO(BaseModel):
     content: str
     senderId: str | None
     read: bool = True
-    timestamp: datetime = datetime.now()
+    timestamp: datetime | None = Field(default_factory=datetime.now)
+    # Posição da mensagem no chat; usada como cursor (before) no GET /chat
+    id: int | None = None
 
 class EmbeddingRequestDTO(BaseModel):
-    texto: str
\ No newline at end of file
+    texto: str
+
+class EmbeddingBatchRequestDTO(BaseModel):
+    textos: list[str]
+
+class EmbeddingItemStatusDTO(BaseModel):
+    indice: int
+    status: str
+    id: int | None = None
+    erro: str | None = None
+
+class EmbeddingBatchResponseDTO(BaseModel):
+    adicionados: int
+    falhas: int
+    itens: list[EmbeddingItemStatusDTO]
+
+class JobIngestaoCriadoDTO(BaseModel):
+    job_id: str
+    status: str
+
+class JobIngestaoDTO(BaseModel):
+    id: str
+    status: str
+    total: int
+    processados: int
+    adicionados: int
+    falhas: int
+    tentativas: int
+    progresso: float
+    vazao: float
+    criado_em: float
+    iniciado_em: float | None = None
+    concluido_em: float | None = None
+    erros: list[EmbeddingItemStatusDTO] = []
+
+class InvalidarCacheDTO(BaseModel):
+    # Pedido alterado: o vendedor e o comprador são buscados no Postgres
+    pedido_id: int | None = None
+    # Usuários afetados, se o serviço de pedidos já os conhecer
+    user_ids: list[str] = []
+
+class CacheInvalidadoDTO(BaseModel):
+    user_ids: list[str]
@@ -1,67 +1,35 @@
+import asyncio
 import json
+import sys
 import redis
 from common.env import ENV
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from purpuria import base_conhecimento
+from purpuria.cache_embeddings import embeddings_model
 
-print("Carregando o modelo de embeddings...")
+# Ingestão em lote: o endpoint batchEmbedContents aceita até 100 textos por chamada
+TAMANHO_LOTE_EMBEDDING = 100
+CONCORRENCIA_EMBEDDING = 4
+TAMANHO_MINIMO_TEXTO = 5
 
-# Inicializa o modelo de embeddings (Google)
-embeddings_model = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004",
-    google_api_key=ENV.GEMINI_API_KEY
-)
-
-# Conexão Redis
-redis_client = redis.Redis.from_url(
-    ENV.REDIS_URL,
-    decode_responses=True
-)
-
-# redis_client = redis.Redis(
-#     host="localhost",
-#     port=6379,
-#     db=0,
-#     decode_responses=True
-# )
+# Modelo de embeddings (Google) com o cache compartilhado: textos já conhecidos
+# não passam pela API de novo
 
 def gerar_embedding(texto: str):
-    """Gera um embedding usando o modelo Google Generative AI."""
-    emb = embeddings_model.embed_query(texto)
+    """Gera o embedding de um documento da base (mesmo tipo da ingestão em lote)."""
+    # embed_documents, não embed_query: o modelo gera vetores diferentes por tipo de
+    # tarefa, e a base precisa de um só (consultas usam embed_query na busca)
+    emb = embeddings_model.embed_documents([texto])[0]
     return emb
 
-def proxima_chave():
-    """Gera o próximo nome de chave disponível (info0, info1, ...)."""
-    chaves = redis_client.keys("info*")
-
-    if not chaves:
-        return "info0"
-    
-    indices = [int(c.replace("info", "")) for c in chaves if c.replace("info", "").isdigit()]
-    return f"info{max(indices) + 1}" if indices else "info0"
-
-
 def add_embedding(texto: str) -> bool:
     try:
         # Gera o embedding
         embedding = gerar_embedding(texto)
 
-        # Define a próxima chave
-        chave = proxima_chave()
-
-        # Salva o texto simples no Redis
-        redis_client.set(chave, texto)
-
-        # Recupera lista existente de embeddings ou cria uma nova
-        embeddings_json = redis_client.get("embeddings_list")
-        embeddings_list = json.loads(embeddings_json) if embeddings_json else []
+        # Grava texto + vetor (float32) no hash do documento, com ID alocado via INCR
+        doc_id = base_conhecimento.salvar_documento(texto, embedding)
 
-        # Adiciona novo embedding à lista
-        embeddings_list.append(embedding)
-
-        # Atualiza lista no Redis
-        redis_client.set("embeddings_list", json.dumps(embeddings_list))
-
-        print(f"Texto salvo como '{chave}' e embedding armazenado (índice {len(embeddings_list) - 1}).")
+        print(f"Texto e embedding salvos como documento {doc_id}.")
         return True
     except redis.exceptions.ConnectionError:
         print("\nERRO: Não foi possível conectar ao Redis. Verifique se o servidor está ativo.")
@@ -70,22 +38,70 @@ def add_embedding(texto: str) -> bool:
 
     return False
 
+async def add_embeddings_lote(textos: list[str],
+                              tamanho_lote: int = TAMANHO_LOTE_EMBEDDING,
+                              concorrencia: int = CONCORRENCIA_EMBEDDING) -> list[dict]:
+    """
+    Adiciona vários textos de uma vez.
+    - Embeddings gerados em lotes via aembed_documents, com no máximo `concorrencia` lotes em paralelo.
+    - Todas as escritas vão numa única transação no Redis.
+    Retorna o status de cada item: {"indice", "status" (adicionado | invalido | erro), "id", "erro"}.
+    """
+    resultados = [{"indice": i, "status": "pendente", "id": None, "erro": None} for i in range(len(textos))]
+
+    validos = []
+    for i, texto in enumerate(textos):
+        texto = (texto or "").strip()
+        if len(texto) < TAMANHO_MINIMO_TEXTO:
+            resultados[i].update(status="invalido", erro="Conteúdo muito curto.")
+        else:
+            validos.append((i, texto))
+
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def gerar_lote(lote):
+        async with semaforo:
+            try:
+                vetores = await embeddings_model.aembed_documents([t for _, t in lote], batch_size=tamanho_lote)
+                return lote, vetores
+            except Exception as e:
+                return lote, e
+
+    lotes = [validos[i:i + tamanho_lote] for i in range(0, len(validos), tamanho_lote)]
+
+    documentos, posicoes = [], []
+    for lote, vetores in await asyncio.gather(*(gerar_lote(lote) for lote in lotes)):
+        if isinstance(vetores, Exception):
+            for i, _ in lote:
+                resultados[i].update(status="erro", erro=f"Falha ao gerar embedding: {vetores}")
+            continue
+        documentos.extend((texto, vetor) for (_, texto), vetor in zip(lote, vetores))
+        posicoes.extend(i for i, _ in lote)
+
+    try:
+        ids = await base_conhecimento.asalvar_documentos(documentos)
+    except redis.exceptions.RedisError as e:
+        for i in posicoes:
+            resultados[i].update(status="erro", erro=f"Falha ao gravar no Redis: {e}")
+        return resultados
+
+    for i, doc_id in zip(posicoes, ids):
+        resultados[i].update(status="adicionado", id=doc_id)
+    return resultados
+
 def limpar_embedding():
-    redis_client.flushdb()
+    base_conhecimento.limpar()
     print("Embeddings limpos do Redis.")
 
 def pegar_embeddings():
-    embeddings_json = redis_client.get("embeddings_list")
-    if not embeddings_json:
-        return []
-    return json.loads(embeddings_json)
+    _, _, vetores = base_conhecimento.ler_documentos()
+    return [vetor.tolist() for vetor in vetores]
 
 
 def adicionar_embedding_interativo():
     """
     Modo interativo: o usuário adiciona textos, e o sistema gera e salva os embeddings.
-    - Texto é salvo em uma chave individual (info0, info1, ...).
-    - Embeddings são armazenados juntos em uma lista (embeddings_list).
+    - Texto e embedding são salvos juntos em um hash por documento (embedding:doc:{id}).
     """
     print("\n" + "="*60)
     print("MODO INTERATIVO: Adicionar informações e embeddings ao Redis")
@@ -110,5 +126,35 @@ def adicionar_embedding_interativo():
         else:
             print('Erro ao adicionar o texto. Tente novamente.')
 
+def importar_arquivo(caminho: str):
+    """
+    Modo de importação: adiciona todos os textos de um arquivo pelo mesmo caminho de /embed/batch.
+    - .json → lista de strings
+    - outros → um texto por linha (linhas vazias são ignoradas)
+    """
+    with open(caminho, encoding="utf-8") as f:
+        if caminho.endswith(".json"):
+            textos = json.load(f)
+        else:
+            textos = [linha.strip() for linha in f if linha.strip()]
+
+    print(f"Importando {len(textos)} texto(s) de '{caminho}'...")
+    resultados = asyncio.run(add_embeddings_lote(textos))
+
+    adicionados = sum(1 for r in resultados if r["status"] == "adicionado")
+    print(f"{adicionados} de {len(textos)} texto(s) adicionados.")
+    for r in resultados:
+        if r["status"] != "adicionado":
+            print(f"  - Linha/item {r['indice']}: {r['status']} ({r['erro']})")
+
 if __name__ == "__main__":
-    adicionar_embedding_interativo()
\ No newline at end of file
+    # python infoRedis.py --migrar          → converte o formato antigo (info0.. + embeddings_list)
+    # python infoRedis.py --arquivo faq.txt → importa um arquivo inteiro em lote
+    ENV.check_missing()
+    if "--migrar" in sys.argv:
+        migrados = base_conhecimento.migrar_formato_legado()
+        print(f"{migrados} documento(s) migrado(s) para o novo formato.")
+    elif "--arquivo" in sys.argv:
+        importar_arquivo(sys.argv[sys.argv.index("--arquivo") + 1])
+    else:
+        adicionar_embedding_interativo()
@@ -1,14 +1,79 @@
-from purpuria.core import executar_fluxo_purpuria
-from purpuria.redis_history import get_history
-from dto import MessageResponseDTO, MessageRequestDTO, EmbeddingRequestDTO
+from purpuria.core import executar_fluxo_purpuria_async, executar_fluxo_purpuria_eventos
+from purpuria.redis_history import aget_history_pagina
+from dto import (MessageResponseDTO, MessageRequestDTO, EmbeddingRequestDTO, EmbeddingBatchRequestDTO,
+                 EmbeddingBatchResponseDTO, JobIngestaoCriadoDTO, JobIngestaoDTO, InvalidarCacheDTO,
+                 CacheInvalidadoDTO)
 from fastapi.middleware.cors import CORSMiddleware
-from infoRedis import add_embedding, limpar_embedding, pegar_embeddings
-from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from infoRedis import add_embeddings_lote, limpar_embedding, pegar_embeddings
+from purpuria.ingestao import enfileirar_job, consultar_job, worker_ingestao
+from common import postgres, mongo, componentes
+from common.env import ENV
+from purpuria import catalogo_residuos, prefetch, metricas
+from purpuria.tools import cache_tools
+from purpuria.tools.pedidos_tool import participantes_pedido
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime
+import asyncio
+import json
+
+
+# Situação do aquecimento da subida (reportada em GET /ready)
+aquecimento = {"situacao": "pendente", "erros": {}}
+
+
+def _aquecer():
+    """Pool PostgreSQL + componentes de COMPONENTES_AQUECER, fora do caminho da subida."""
+    erros = {}
+    try:
+        postgres.aquecer()
+    except Exception as e:
+        erros["postgres"] = f"{type(e).__name__}: {e}"
+        print(f"[POSTGRES] Não foi possível aquecer o pool: {erros['postgres']}")
+
+    nomes = [n.strip() for n in ENV.COMPONENTES_AQUECER.split(",") if n.strip()]
+    if nomes:
+        erros.update(componentes.aquecer(None if nomes == ["todos"] else nomes))
+    return erros
+
+
+async def _aquecer_em_segundo_plano():
+    aquecimento["situacao"] = "em_andamento"
+    aquecimento["erros"] = await asyncio.to_thread(_aquecer)
+    aquecimento["situacao"] = "concluido"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Variável ausente não impede a subida: só os componentes que dependem dela falham (ver /ready)
+    ENV.check_missing()
+
+    # Aquecimento em segundo plano: a API já atende enquanto pool e clientes são criados
+    tarefa_aquecimento = asyncio.create_task(_aquecer_em_segundo_plano())
+
+    # Invalidação do cache do catálogo de resíduos via change stream (opcional)
+    parar_catalogo = catalogo_residuos.iniciar_invalidacao()
+
+    # Worker de ingestão de embeddings (fila no Redis) roda junto com a API
+    worker = asyncio.create_task(worker_ingestao())
+    yield
+    for tarefa in (worker, tarefa_aquecimento):
+        tarefa.cancel()
+        with suppress(asyncio.CancelledError):
+            await tarefa
+    if parar_catalogo is not None:
+        parar_catalogo.set()
+    postgres.fechar()
+    mongo.fechar()
+
 
 app = FastAPI(
     title="API Purpuria Chatbot",
     description="API para interação com o chatbot Purpuria, incluindo gerenciamento de conversas e embeddings",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -29,6 +94,44 @@ async def alive():
     return {"status": "banana", "content": "API is alive!"}
 
 
+@app.get("/ready",
+         summary="Verificar se a API está pronta",
+         description="Informa quais backends e componentes já foram inicializados, variáveis de ambiente "
+                     "ausentes e a situação do aquecimento. Responde 503 enquanto não estiver pronta.",
+         tags=["Saúde"]
+)
+async def ready():
+    ausentes = ENV.ausentes()
+    estado = {
+        "postgres": {"inicializado": postgres.inicializado(), "erro": aquecimento["erros"].get("postgres")},
+        "mongo": {"inicializado": mongo.inicializado(), "erro": None},
+        **componentes.estado(),
+    }
+    # Falha ao aquecer o pool não bloqueia (o pool tenta de novo a cada requisição, como na subida);
+    # erro de componente sim, até uma nova tentativa de construção dar certo
+    pronto = (not ausentes and aquecimento["situacao"] == "concluido"
+              and not any(item["erro"] for nome, item in estado.items() if nome != "postgres"))
+    return JSONResponse(
+        status_code=200 if pronto else 503,
+        content={
+            "pronto": pronto,
+            "aquecimento": aquecimento["situacao"],
+            "variaveis_ausentes": ausentes,
+            "componentes": estado,
+        }
+    )
+
+
+@app.get("/metrics",
+         summary="Métricas Prometheus",
+         description="Latência por etapa e por tool, rotas, iterações do especialista, guardrails, "
+                     "JSON inválido, caches e pool PostgreSQL no formato texto do Prometheus.",
+         tags=["Saúde"]
+)
+async def metrics():
+    return Response(content=await metricas.exportar(), media_type=metricas.CONTENT_TYPE)
+
+
 @app.post('/chat/{chat_id}', 
           response_model=MessageResponseDTO,
           summary="Enviar mensagem para o chat",
@@ -55,49 +158,109 @@ async def doMessage(chat_id: str, msg: MessageRequestDTO):
     - **chat_id**: Identificador único da conversa
     - **msg**: Objeto contendo o conteúdo da mensagem e o ID do remetente
     """
-    resposta = executar_fluxo_purpuria(msg.content, msg.senderId, chat_id)
+    resposta = await executar_fluxo_purpuria_async(msg.content, msg.senderId, chat_id)
 
     return MessageResponseDTO(
         senderId=None,
         content=resposta
     )
 
+@app.post('/chat/{chat_id}/stream',
+          summary="Enviar mensagem para o chat (streaming)",
+          description="Mesmo fluxo de /chat/{chat_id}, mas responde com Server-Sent Events: "
+                      "eventos de progresso (roteando, consultando_<rota>, validando), os tokens "
+                      "da resposta, uma eventual substituição quando o juiz rejeita a resposta "
+                      "transmitida e, por fim, o MessageResponseDTO salvo no histórico.",
+          tags=["Chat"],
+          response_class=StreamingResponse,
+          responses={
+              200: {
+                  "description": "Fluxo de eventos SSE",
+                  "content": {
+                      "text/event-stream": {
+                          "example": "event: progresso\ndata: {\"etapa\": \"roteando\"}\n\n"
+                                     "event: token\ndata: {\"conteudo\": \"Você tem 2 pedidos\"}\n\n"
+                                     "event: fim\ndata: {\"content\": \"Você tem 2 pedidos...\", \"senderId\": null}\n\n"
+                      }
+                  }
+              }
+          })
+async def doMessageStream(chat_id: str, msg: MessageRequestDTO):
+    """
+    Processa uma mensagem do usuário transmitindo o progresso e a resposta via SSE.
+    
+    - **chat_id**: Identificador único da conversa
+    - **msg**: Objeto contendo o conteúdo da mensagem e o ID do remetente
+    """
+    def sse(evento: str, dados: str) -> str:
+        return f"event: {evento}\ndata: {dados}\n\n"
+
+    async def gerar_eventos():
+        async for evento in executar_fluxo_purpuria_eventos(msg.content, msg.senderId, chat_id):
+            nome = evento.pop("evento")
+            if nome == "fim":
+                resposta = MessageResponseDTO(senderId=None, content=evento["conteudo"])
+                yield sse(nome, resposta.model_dump_json())
+            else:
+                yield sse(nome, json.dumps(evento, ensure_ascii=False))
+
+    return StreamingResponse(
+        gerar_eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get(
     "/chat", 
     response_model = list[MessageResponseDTO],
     summary = "Obter histórico do chat",
-    description = "Recupera o histórico completo de mensagens de uma conversa específica",
+    description = "Recupera as mensagens de uma conversa, da mais recente para a mais antiga, "
+                  "em páginas de até `limit` mensagens. Para a página seguinte, envie "
+                  "`before` com o `id` da mensagem mais antiga recebida.",
     tags = ["Chat"]
 )
-async def getMessages(chatId: str, senderId: str):
+async def getMessages(chatId: str, senderId: str,
+                      limit: int = Query(50, ge=1, le=200),
+                      before: int | None = Query(None, ge=0)):
     """
-    Retorna todas as mensagens de um chat baseado no senderId e chatId.
+    Retorna uma página de mensagens de um chat baseado no senderId e chatId.
     
     - **senderId**: ID do usuário que está solicitando o histórico
     - **chatId**: ID do chat do qual recuperar as mensagens
+    - **limit**: quantidade máxima de mensagens na página
+    - **before**: cursor; só mensagens com id menor que este
     """
-    history = get_history(senderId, chatId)
+    pagina = await aget_history_pagina(senderId, chatId, limit, before)
     def toSenderId(role: str):
         return senderId if role == "user" else None
 
     return [
-        MessageResponseDTO(senderId=toSenderId(message['role']), content=message['conteudo'])
-        for message in history
+        MessageResponseDTO(
+            id=posicao,
+            senderId=toSenderId(message['role']),
+            content=message['conteudo'],
+            # Mensagens gravadas antes dos timestamps não têm "ts"
+            timestamp=datetime.fromtimestamp(message['ts']) if 'ts' in message else None
+        )
+        for posicao, message in pagina
     ]
 
 
 @app.post(
     "/embed",
+    status_code=202,
+    response_model=JobIngestaoCriadoDTO,
     summary="Adicionar embedding",
-    description="Adiciona um novo texto ao sistema de embeddings no Redis para melhorar "
-                "as respostas do chatbot com informações contextuais",
+    description="Enfileira um novo texto para o sistema de embeddings no Redis, para melhorar "
+                "as respostas do chatbot com informações contextuais. O processamento acontece "
+                "em segundo plano; acompanhe pelo GET /embed/jobs/{job_id}.",
     tags=["Embeddings"],
     responses={
-        200: {
-            "description": "Embedding adicionado com sucesso",
+        202: {
+            "description": "Job de ingestão criado",
             "content": {
                 "application/json": {
-                    "example": {"status": "Embedding added to Redis!"}
+                    "example": {"job_id": "5f0c9a1e2b7d4c3a9e8f7a6b5c4d3e2f", "status": "na_fila"}
                 }
             }
         }
@@ -105,12 +268,73 @@ async def getMessages(chatId: str, senderId: str):
 )
 async def embed(embedding: EmbeddingRequestDTO):
     """
-    Adiciona um texto ao banco de embeddings.
+    Enfileira um texto para o banco de embeddings.
     
     - **texto**: Texto que será convertido em embedding e armazenado
     """
-    add_embedding(embedding.texto)
-    return {"status": "Embedding added to Redis!"}
+    job_id = await enfileirar_job([embedding.texto])
+    return JobIngestaoCriadoDTO(job_id=job_id, status="na_fila")
+
+
+@app.get(
+    "/embed/jobs/{job_id}",
+    response_model=JobIngestaoDTO,
+    summary="Consultar job de ingestão",
+    description="Retorna status, progresso, vazão (textos/s), tentativas e falhas de um job de ingestão.",
+    tags=["Embeddings"],
+    responses={404: {"description": "Job não encontrado (ou expirado)"}}
+)
+async def get_embed_job(job_id: str):
+    """
+    Consulta o andamento de um job criado pelo POST /embed.
+    
+    - **job_id**: ID retornado na criação do job
+    """
+    job = await consultar_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return job
+
+
+@app.post(
+    "/embed/batch",
+    response_model=EmbeddingBatchResponseDTO,
+    summary="Adicionar embeddings em lote",
+    description="Adiciona vários textos de uma vez. Os embeddings são gerados em lotes "
+                "(embed_documents) com concorrência limitada e gravados numa única transação "
+                "no Redis. A resposta traz o status de cada item.",
+    tags=["Embeddings"],
+    responses={
+        200: {
+            "description": "Lote processado (verifique o status de cada item)",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "adicionados": 1,
+                        "falhas": 1,
+                        "itens": [
+                            {"indice": 0, "status": "adicionado", "id": 42, "erro": None},
+                            {"indice": 1, "status": "invalido", "id": None, "erro": "Conteúdo muito curto."}
+                        ]
+                    }
+                }
+            }
+        }
+    }
+)
+async def embed_batch(lote: EmbeddingBatchRequestDTO):
+    """
+    Adiciona uma lista de textos ao banco de embeddings.
+    
+    - **textos**: Lista de textos que serão convertidos em embeddings e armazenados
+    """
+    itens = await add_embeddings_lote(lote.textos)
+    adicionados = sum(1 for item in itens if item["status"] == "adicionado")
+    return EmbeddingBatchResponseDTO(
+        adicionados=adicionados,
+        falhas=len(itens) - adicionados,
+        itens=itens
+    )
 
 
 @app.get(
@@ -130,7 +354,7 @@ async def embed(embedding: EmbeddingRequestDTO):
     }
 )
 async def get_embeddings():
-    return {"embeddings": pegar_embeddings()}
+    return {"embeddings": await run_in_threadpool(pegar_embeddings)}
 
 @app.delete(
     "/embed",
@@ -154,5 +378,47 @@ async def clear_embeddings():
     
     **Atenção**: Esta operação é irreversível e afetará o contexto do chatbot.
     """
-    limpar_embedding()
-    return {"status": "Embeddings cleared from Redis!"}
\ No newline at end of file
+    await run_in_threadpool(limpar_embedding)
+    return {"status": "Embeddings cleared from Redis!"}
+
+@app.post(
+    "/cache/invalidar",
+    response_model=CacheInvalidadoDTO,
+    summary="Invalidar cache das tools",
+    description="Chamado pelo serviço de pedidos quando um pedido muda: descarta os resultados "
+                "de tools cacheados do vendedor e do comprador (ou dos user_ids informados).",
+    tags=["Cache"]
+)
+async def invalidar_cache(dados: InvalidarCacheDTO):
+    """
+    Invalida o cache das tools dos usuários afetados por uma alteração.
+
+    - **pedido_id**: pedido alterado (vendedor e comprador são invalidados)
+    - **user_ids**: usuários a invalidar diretamente
+    """
+    user_ids = list(dados.user_ids)
+    if dados.pedido_id is not None:
+        user_ids += await run_in_threadpool(participantes_pedido, dados.pedido_id)
+    if not user_ids:
+        raise HTTPException(status_code=404, detail="Nenhum usuário encontrado para invalidar.")
+    return CacheInvalidadoDTO(user_ids=await run_in_threadpool(cache_tools.invalidar_usuarios, user_ids))
+
+
+@app.get(
+    "/cache/estatisticas",
+    summary="Estatísticas do cache das tools",
+    description="Acertos e falhas do cache de resultados por tool (chamadas do agente) e uso da pré-busca.",
+    tags=["Cache"]
+)
+async def estatisticas_cache():
+    return await run_in_threadpool(cache_tools.estatisticas)
+
+
+@app.get(
+    "/prefetch/estatisticas",
+    summary="Estatísticas da pré-busca",
+    description="Pré-buscas iniciadas, puladas por falta de vaga e taxa de acerto frente à rota escolhida.",
+    tags=["Cache"]
+)
+async def estatisticas_prefetch():
+    return prefetch.estatisticas()
@@ -0,0 +1,215 @@
+# Base de conhecimento (textos + embeddings) no Redis.
+#
+# Layout (append-only, binário):
+#   - embedding:proximo_id  → contador (INCRBY) que aloca os IDs dos documentos
+#   - embedding:doc:{id}    → hash {texto, vetor}, vetor em bytes float32
+#   - embedding:ids         → lista com os IDs na ordem de inserção
+#   - embedding:epoca       → token aleatório criado na primeira escrita; muda
+#                             quando a base é apagada, invalidando os índices
+#   - embedding:ann:{nome}  → snapshot do índice ANN {epoca, dados}
+#
+# Cada documento é gravado numa transação (HSET + RPUSH), então inserir custa o
+# mesmo qualquer que seja o tamanho da base, e leitores incrementais só
+# precisam ler os IDs a partir da última posição carregada.
+import json
+import uuid
+import numpy as np
+from common import componentes
+
+CHAVE_PROXIMO_ID = "embedding:proximo_id"
+CHAVE_IDS = "embedding:ids"
+CHAVE_EPOCA = "embedding:epoca"
+CHAVE_SNAPSHOT_ANN = "embedding:ann:{nome}"
+
+# Formato antigo (info0, info1, ... + embeddings_list em JSON)
+CHAVE_LEGADO_LISTA = "embeddings_list"
+CHAVE_LEGADO_VERSAO = "embeddings_versao"
+
+# Clientes binários: os vetores são bytes, então não há decode_responses
+redis_bin = componentes.preguicoso("redis_bin")
+redis_bin_async = componentes.preguicoso("redis_bin_async")
+
+
+def _chave_doc(doc_id) -> str:
+    doc_id = doc_id.decode() if isinstance(doc_id, bytes) else doc_id
+    return f"embedding:doc:{doc_id}"
+
+
+def vetor_para_bytes(vetor) -> bytes:
+    return np.asarray(vetor, dtype=np.float32).tobytes()
+
+
+def bytes_para_vetor(dados: bytes) -> np.ndarray:
+    return np.frombuffer(dados, dtype=np.float32)
+
+
+def salvar_documentos(documentos: list[tuple[str, list[float]]]) -> list[int]:
+    """
+    Grava vários (texto, vetor) de uma vez: um INCRBY para alocar os IDs e uma
+    única transação com todos os HSET + RPUSH. Retorna os IDs gerados.
+    """
+    if not documentos:
+        return []
+
+    ultimo_id = redis_bin.incrby(CHAVE_PROXIMO_ID, len(documentos))
+    ids = list(range(ultimo_id - len(documentos) + 1, ultimo_id + 1))
+
+    pipe = redis_bin.pipeline(transaction=True)
+    pipe.set(CHAVE_EPOCA, uuid.uuid4().hex, nx=True)
+    for doc_id, (texto, vetor) in zip(ids, documentos):
+        pipe.hset(_chave_doc(doc_id), mapping={"texto": texto, "vetor": vetor_para_bytes(vetor)})
+    pipe.rpush(CHAVE_IDS, *ids)
+    pipe.execute()
+    return ids
+
+
+async def asalvar_documentos(documentos: list[tuple[str, list[float]]]) -> list[int]:
+    """Versão assíncrona de salvar_documentos."""
+    if not documentos:
+        return []
+
+    ultimo_id = await redis_bin_async.incrby(CHAVE_PROXIMO_ID, len(documentos))
+    ids = list(range(ultimo_id - len(documentos) + 1, ultimo_id + 1))
+
+    pipe = redis_bin_async.pipeline(transaction=True)
+    pipe.set(CHAVE_EPOCA, uuid.uuid4().hex, nx=True)
+    for doc_id, (texto, vetor) in zip(ids, documentos):
+        pipe.hset(_chave_doc(doc_id), mapping={"texto": texto, "vetor": vetor_para_bytes(vetor)})
+    pipe.rpush(CHAVE_IDS, *ids)
+    await pipe.execute()
+    return ids
+
+
+def salvar_documento(texto: str, vetor: list[float]) -> int:
+    """Grava um documento e retorna seu ID."""
+    return salvar_documentos([(texto, vetor)])[0]
+
+
+def _estado(resultado) -> tuple[str, int]:
+    epoca, total = resultado
+    return (epoca.decode() if epoca else ""), int(total)
+
+
+def estado() -> tuple[str, int]:
+    """(época, quantidade de documentos) em uma ida ao Redis."""
+    pipe = redis_bin.pipeline(transaction=False)
+    pipe.get(CHAVE_EPOCA)
+    pipe.llen(CHAVE_IDS)
+    return _estado(pipe.execute())
+
+
+async def aestado() -> tuple[str, int]:
+    """Versão assíncrona de estado."""
+    pipe = redis_bin_async.pipeline(transaction=False)
+    pipe.get(CHAVE_EPOCA)
+    pipe.llen(CHAVE_IDS)
+    return _estado(await pipe.execute())
+
+
+def _documentos(ids, hashes) -> tuple[list, list[str], list[np.ndarray]]:
+    textos, vetores = [], []
+    for valores in hashes:
+        texto, vetor = valores
+        if texto is None or vetor is None:
+            continue
+        textos.append(texto.decode("utf-8"))
+        vetores.append(bytes_para_vetor(vetor))
+    return ids, textos, vetores
+
+
+def ler_documentos(inicio: int = 0) -> tuple[list, list[str], list[np.ndarray]]:
+    """
+    Lê os documentos a partir da posição `inicio` da lista de IDs.
+    Retorna (ids lidos, textos, vetores); documentos incompletos são ignorados.
+    """
+    ids = redis_bin.lrange(CHAVE_IDS, inicio, -1)
+    if not ids:
+        return [], [], []
+    pipe = redis_bin.pipeline(transaction=False)
+    for doc_id in ids:
+        pipe.hmget(_chave_doc(doc_id), "texto", "vetor")
+    return _documentos(ids, pipe.execute())
+
+
+async def aler_documentos(inicio: int = 0) -> tuple[list, list[str], list[np.ndarray]]:
+    """Versão assíncrona de ler_documentos."""
+    ids = await redis_bin_async.lrange(CHAVE_IDS, inicio, -1)
+    if not ids:
+        return [], [], []
+    pipe = redis_bin_async.pipeline(transaction=False)
+    for doc_id in ids:
+        pipe.hmget(_chave_doc(doc_id), "texto", "vetor")
+    return _documentos(ids, await pipe.execute())
+
+
+def salvar_snapshot_ann(nome: str, epoca: str, dados: bytes):
+    """Persiste o snapshot do índice ANN, associado à época da base."""
+    redis_bin.hset(CHAVE_SNAPSHOT_ANN.format(nome=nome), mapping={"epoca": epoca, "dados": dados})
+
+
+async def asalvar_snapshot_ann(nome: str, epoca: str, dados: bytes):
+    """Versão assíncrona de salvar_snapshot_ann."""
+    await redis_bin_async.hset(CHAVE_SNAPSHOT_ANN.format(nome=nome), mapping={"epoca": epoca, "dados": dados})
+
+
+def _snapshot_valido(resultado, epoca: str) -> bytes | None:
+    epoca_snapshot, dados = resultado
+    if epoca_snapshot is None or epoca_snapshot.decode() != epoca:
+        return None
+    return dados
+
+
+def ler_snapshot_ann(nome: str, epoca: str) -> bytes | None:
+    """Snapshot do índice ANN, se for da mesma época da base."""
+    return _snapshot_valido(redis_bin.hmget(CHAVE_SNAPSHOT_ANN.format(nome=nome), "epoca", "dados"), epoca)
+
+
+async def aler_snapshot_ann(nome: str, epoca: str) -> bytes | None:
+    """Versão assíncrona de ler_snapshot_ann."""
+    resultado = await redis_bin_async.hmget(CHAVE_SNAPSHOT_ANN.format(nome=nome), "epoca", "dados")
+    return _snapshot_valido(resultado, epoca)
+
+
+def limpar():
+    """Apaga todos os documentos da base (formato novo e legado)."""
+    ids = redis_bin.lrange(CHAVE_IDS, 0, -1)
+    chaves_legado = list(redis_bin.scan_iter("info*"))
+    chaves_ann = list(redis_bin.scan_iter(CHAVE_SNAPSHOT_ANN.format(nome="*")))
+
+    pipe = redis_bin.pipeline(transaction=True)
+    for doc_id in ids:
+        pipe.delete(_chave_doc(doc_id))
+    if chaves_legado or chaves_ann:
+        pipe.delete(*chaves_legado, *chaves_ann)
+    pipe.delete(CHAVE_IDS, CHAVE_PROXIMO_ID, CHAVE_EPOCA, CHAVE_LEGADO_LISTA, CHAVE_LEGADO_VERSAO)
+    pipe.execute()
+
+
+def migrar_formato_legado() -> int:
+    """
+    Migração única do formato antigo (info0, info1, ... + embeddings_list em
+    JSON) para o layout por documento. Remove as chaves antigas ao final.
+    Retorna quantos documentos foram migrados.
+    """
+    embeddings_json = redis_bin.get(CHAVE_LEGADO_LISTA)
+    if not embeddings_json:
+        return 0
+
+    embeddings_list = json.loads(embeddings_json)
+    # Os números das chaves podem ter lacunas (textos apagados à mão): como no
+    # leitor antigo, a k-ésima chave em ordem numérica é o k-ésimo embedding
+    chaves = sorted(
+        (c for c in redis_bin.scan_iter("info*") if c[4:].isdigit()),
+        key=lambda c: int(c[4:]),
+    )
+    textos = redis_bin.mget(chaves) if chaves else []
+
+    documentos = [
+        (texto.decode("utf-8"), embedding)
+        for texto, embedding in zip(textos, embeddings_list)
+        if texto
+    ]
+    salvar_documentos(documentos)
+
+    redis_bin.delete(CHAVE_LEGADO_LISTA, CHAVE_LEGADO_VERSAO, *chaves)
+    return len(documentos)
@@ -0,0 +1,203 @@
+# Cache de embeddings em dois níveis, compartilhado pela busca (buscar_no_redis),
+# pelo cache semântico e pela ingestão (infoRedis).
+#
+#   1. LRU em memória (por processo), limitado a EMBEDDING_CACHE_MAX_MEMORIA vetores
+#   2. Redis: emb_cache:{modelo}:{tipo}:{sha256 do texto normalizado} → vetor float32
+#      em bytes, com TTL de EMBEDDING_CACHE_TTL segundos (renovado a cada acerto)
+#
+# O tipo ("consulta" ou "documento") faz parte da chave porque o modelo gera
+# vetores diferentes para embed_query e embed_documents (task_type).
+# Só os textos que faltam nos dois níveis vão para a API de embeddings.
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+import redis
+from common import componentes
+from common.env import ENV
+from purpuria import base_conhecimento
+
+MODELO_EMBEDDING = "models/text-embedding-004"
+CHAVE_EMBEDDING = "emb_cache:{modelo}:{tipo}:{hash}"
+
+
+def normalizar_texto(texto: str) -> str:
+    """Forma canônica usada na chave: NFC, sem espaços repetidos, minúsculas."""
+    return " ".join(unicodedata.normalize("NFC", texto).split()).casefold()
+
+
+class EmbeddingsComCache:
+    """
+    Envolve um modelo de embeddings do LangChain com o cache em dois níveis.
+    Expõe a mesma interface usada no projeto (embed_query, aembed_query,
+    embed_documents e aembed_documents), então substitui o modelo diretamente.
+    """
+
+    def __init__(self, modelo, nome_modelo: str, max_memoria: int, ttl: int):
+        self.modelo = modelo
+        self.nome_modelo = nome_modelo
+        self.max_memoria = max_memoria
+        self.ttl = ttl
+        self._memoria: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.estatisticas = {"memoria": 0, "redis": 0, "api": 0}
+
+    def _chave(self, texto: str, tipo: str) -> str:
+        digest = hashlib.sha256(normalizar_texto(texto).encode("utf-8")).hexdigest()
+        return CHAVE_EMBEDDING.format(modelo=self.nome_modelo, tipo=tipo, hash=digest)
+
+    # --- Nível 1: memória ---
+    def _ler_memoria(self, chave: str) -> list[float] | None:
+        with self._lock:
+            vetor = self._memoria.get(chave)
+            if vetor is not None:
+                self._memoria.move_to_end(chave)
+            return vetor
+
+    def _gravar_memoria(self, chave: str, vetor: list[float]):
+        with self._lock:
+            self._memoria[chave] = vetor
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.max_memoria:
+                self._memoria.popitem(last=False)
+
+    def _contar(self, nivel: str, quantidade: int = 1):
+        with self._lock:
+            self.estatisticas[nivel] += quantidade
+
+    # --- Resolução em lote ---
+    def _da_memoria(self, chaves: list[str]) -> tuple[list, list[int]]:
+        """Vetores já em memória e as posições que faltam."""
+        vetores = [self._ler_memoria(chave) for chave in chaves]
+        faltando = [i for i, v in enumerate(vetores) if v is None]
+        self._contar("memoria", len(chaves) - len(faltando))
+        return vetores, faltando
+
+    def _aplicar_redis(self, vetores: list, chaves: list[str], faltando: list[int], brutos) -> list[int]:
+        for i, dados in zip(faltando, brutos):
+            if dados:
+                vetores[i] = base_conhecimento.bytes_para_vetor(dados).tolist()
+                self._gravar_memoria(chaves[i], vetores[i])
+        restantes = [i for i in faltando if vetores[i] is None]
+        self._contar("redis", len(faltando) - len(restantes))
+        return restantes
+
+    def _aplicar_api(self, vetores: list, chaves: list[str], restantes: list[int], novos) -> dict:
+        self._contar("api", len(restantes))
+        para_redis = {}
+        for i, vetor in zip(restantes, novos):
+            vetores[i] = list(vetor)
+            self._gravar_memoria(chaves[i], vetores[i])
+            para_redis[chaves[i]] = base_conhecimento.vetor_para_bytes(vetor)
+        return para_redis
+
+    def _resolver(self, textos: list[str], tipo: str, gerar) -> list[list[float]]:
+        """Busca cada texto na memória, depois no Redis; só os restantes vão para `gerar`."""
+        chaves = [self._chave(t, tipo) for t in textos]
+        vetores, faltando = self._da_memoria(chaves)
+        if not faltando:
+            return vetores
+
+        try:
+            brutos = base_conhecimento.redis_bin.mget([chaves[i] for i in faltando])
+            pipe = base_conhecimento.redis_bin.pipeline(transaction=False)
+            for i, dados in zip(faltando, brutos):
+                if dados:
+                    pipe.expire(chaves[i], self.ttl)
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            print(f"[CACHE_EMBEDDINGS] Redis indisponível, seguindo sem o segundo nível: {e}")
+            brutos = [None] * len(faltando)
+        restantes = self._aplicar_redis(vetores, chaves, faltando, brutos)
+        if not restantes:
+            return vetores
+
+        novos = gerar([textos[i] for i in restantes])
+        para_redis = self._aplicar_api(vetores, chaves, restantes, novos)
+        try:
+            pipe = base_conhecimento.redis_bin.pipeline(transaction=False)
+            for chave, dados in para_redis.items():
+                pipe.set(chave, dados, ex=self.ttl)
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            print(f"[CACHE_EMBEDDINGS] Falha ao gravar no Redis: {e}")
+        return vetores
+
+    async def _aresolver(self, textos: list[str], tipo: str, agerar) -> list[list[float]]:
+        """Versão assíncrona de _resolver."""
+        chaves = [self._chave(t, tipo) for t in textos]
+        vetores, faltando = self._da_memoria(chaves)
+        if not faltando:
+            return vetores
+
+        try:
+            brutos = await base_conhecimento.redis_bin_async.mget([chaves[i] for i in faltando])
+            pipe = base_conhecimento.redis_bin_async.pipeline(transaction=False)
+            for i, dados in zip(faltando, brutos):
+                if dados:
+                    pipe.expire(chaves[i], self.ttl)
+            await pipe.execute()
+        except redis.exceptions.RedisError as e:
+            print(f"[CACHE_EMBEDDINGS] Redis indisponível, seguindo sem o segundo nível: {e}")
+            brutos = [None] * len(faltando)
+        restantes = self._aplicar_redis(vetores, chaves, faltando, brutos)
+        if not restantes:
+            return vetores
+
+        novos = await agerar([textos[i] for i in restantes])
+        para_redis = self._aplicar_api(vetores, chaves, restantes, novos)
+        try:
+            pipe = base_conhecimento.redis_bin_async.pipeline(transaction=False)
+            for chave, dados in para_redis.items():
+                pipe.set(chave, dados, ex=self.ttl)
+            await pipe.execute()
+        except redis.exceptions.RedisError as e:
+            print(f"[CACHE_EMBEDDINGS] Falha ao gravar no Redis: {e}")
+        return vetores
+
+    def embed_query(self, texto: str) -> list[float]:
+        return self._resolver([texto], "consulta", lambda t: [self.modelo.embed_query(t[0])])[0]
+
+    async def aembed_query(self, texto: str) -> list[float]:
+        async def agerar(t):
+            return [await self.modelo.aembed_query(t[0])]
+        return (await self._aresolver([texto], "consulta", agerar))[0]
+
+    def embed_documents(self, textos: list[str], **kwargs) -> list[list[float]]:
+        return self._resolver(textos, "documento", lambda t: self.modelo.embed_documents(t, **kwargs))
+
+    async def aembed_documents(self, textos: list[str], **kwargs) -> list[list[float]]:
+        async def agerar(t):
+            return await self.modelo.aembed_documents(t, **kwargs)
+        return await self._aresolver(textos, "documento", agerar)
+
+    def resumo(self) -> dict:
+        """Acertos por nível, chamadas evitadas e ocupação do LRU."""
+        with self._lock:
+            estatisticas = dict(self.estatisticas)
+            em_memoria = len(self._memoria)
+        total = sum(estatisticas.values())
+        return {
+            **estatisticas,
+            "total": total,
+            "taxa_acerto": (total - estatisticas["api"]) / total if total else 0.0,
+            "em_memoria": em_memoria,
+            "max_memoria": self.max_memoria,
+        }
+
+
+@componentes.registrar("embeddings_google")
+def _embeddings_google():
+    # Import aqui: langchain_google_genai pesa no tempo de subida da API
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(model=MODELO_EMBEDDING, google_api_key=ENV.GEMINI_API_KEY)
+
+
+# Instância única do processo: mesmo modelo e mesmo cache para busca e ingestão.
+# O cliente do Google só é criado na primeira chamada que passar do cache.
+embeddings_model = EmbeddingsComCache(
+    componentes.preguicoso("embeddings_google"),
+    nome_modelo=MODELO_EMBEDDING.rsplit("/", 1)[-1],
+    max_memoria=ENV.EMBEDDING_CACHE_MAX_MEMORIA,
+    ttl=ENV.EMBEDDING_CACHE_TTL,
+)
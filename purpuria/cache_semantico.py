@@ -0,0 +1,138 @@
+# Cache semântico de respostas.
+#
+# Guarda respostas já validadas pelo Juiz, indexadas pelo embedding da pergunta.
+# Uma pergunta nova com similaridade >= CACHE_SEMANTICO_LIMIAR com alguma já
+# respondida recebe a mesma resposta, sem passar por especialista/orquestrador/juiz.
+#
+# - Só vale para as rotas em CACHE_SEMANTICO_ROTAS; pedidos e residuos dependem
+#   do usuário e nunca são cacheadas.
+# - As entradas pertencem a uma "geração" = versão da base de conhecimento
+#   (época + quantidade de documentos). Qualquer alteração via /embed muda a
+#   geração, invalidando todo o cache; as entradas antigas expiram pelo TTL.
+#
+# Layout no Redis:
+#   - cache_semantico:{geracao}:{rota}:ids        → lista com os IDs das entradas
+#   - cache_semantico:{geracao}:{rota}:{id}       → hash {pergunta, resposta, vetor}
+#   - cache_semantico:estatisticas                → contadores {rota}:acertos / {rota}:falhas
+import uuid
+import redis
+from common.env import ENV
+from purpuria import base_conhecimento
+from purpuria.indice_vetorial import IndiceVetorial
+
+ROTAS_PROIBIDAS = {"pedidos", "residuos"}
+MAX_ENTRADAS_POR_ROTA = 2000
+# Vizinhos mais próximos conferidos por consulta
+CANDIDATOS = 3
+
+CHAVE_IDS = "cache_semantico:{geracao}:{rota}:ids"
+CHAVE_ENTRADA = "cache_semantico:{geracao}:{rota}:{entrada_id}"
+CHAVE_ESTATISTICAS = "cache_semantico:estatisticas"
+
+# Usa o cliente binário da base de conhecimento (os vetores são bytes)
+redis_bin_async = base_conhecimento.redis_bin_async
+
+# Um índice em memória por rota, sincronizado incrementalmente com o Redis
+_indices: dict[str, IndiceVetorial] = {}
+
+
+def rota_habilitada(rota: str) -> bool:
+    rotas = {r.strip() for r in ENV.CACHE_SEMANTICO_ROTAS.split(",") if r.strip()}
+    return rota in rotas and rota not in ROTAS_PROIBIDAS
+
+
+async def _geracao() -> str:
+    epoca, total = await base_conhecimento.aestado()
+    return f"{epoca}:{total}"
+
+
+async def _sincronizar(rota: str, geracao: str) -> IndiceVetorial:
+    indice = _indices.setdefault(rota, IndiceVetorial())
+    chave_ids = CHAVE_IDS.format(geracao=geracao, rota=rota)
+
+    total = await redis_bin_async.llen(chave_ids)
+    if indice.versao == (geracao, total):
+        return indice
+
+    mesma_geracao = indice.versao is not None and indice.versao[0] == geracao
+    inicio = indice.carregados if mesma_geracao and total >= indice.carregados else 0
+
+    ids = [i.decode() for i in await redis_bin_async.lrange(chave_ids, inicio, -1)]
+    pipe = redis_bin_async.pipeline(transaction=False)
+    for entrada_id in ids:
+        pipe.hget(CHAVE_ENTRADA.format(geracao=geracao, rota=rota, entrada_id=entrada_id), "vetor")
+    vetores = await pipe.execute() if ids else []
+
+    pares = [(entrada_id, base_conhecimento.bytes_para_vetor(v)) for entrada_id, v in zip(ids, vetores) if v]
+    versao = (geracao, inicio + len(ids))
+    if inicio == 0:
+        indice.substituir(len(ids), [v for _, v in pares], [e for e, _ in pares], versao)
+    else:
+        indice.acrescentar(inicio, len(ids), [v for _, v in pares], [e for e, _ in pares], versao)
+    return indice
+
+
+async def buscar(rota: str, vetor_pergunta) -> str | None:
+    """Resposta cacheada para uma pergunta semelhante, ou None (miss)."""
+    try:
+        geracao = await _geracao()
+        indice = await _sincronizar(rota, geracao)
+
+        # Alguns candidatos acima do limiar, lidos numa ida só: se o mais próximo
+        # já expirou no Redis, o seguinte ainda pode responder
+        candidatos = [entrada_id for score, entrada_id in indice.buscar(vetor_pergunta, k=CANDIDATOS)
+                      if score >= ENV.CACHE_SEMANTICO_LIMIAR]
+        resposta = None
+        if candidatos:
+            pipe = redis_bin_async.pipeline(transaction=False)
+            for entrada_id in candidatos:
+                pipe.hget(CHAVE_ENTRADA.format(geracao=geracao, rota=rota, entrada_id=entrada_id), "resposta")
+            respostas = await pipe.execute()
+            resposta = next((r for r in respostas if r), None)
+            # Entradas expiradas saem do índice para não esconderem as válidas
+            expiradas = [e for e, r in zip(candidatos, respostas) if r is None]
+            if expiradas:
+                indice.remover(expiradas)
+
+        campo = "acertos" if resposta else "falhas"
+        await redis_bin_async.hincrby(CHAVE_ESTATISTICAS, f"{rota}:{campo}", 1)
+        return resposta.decode("utf-8") if resposta else None
+    except redis.exceptions.RedisError as e:
+        print(f"[CACHE_SEMANTICO] Falha na consulta, seguindo sem cache: {e}")
+        return None
+
+
+async def salvar(rota: str, pergunta: str, resposta: str, vetor_pergunta):
+    """Guarda uma resposta validada para a rota (com TTL)."""
+    try:
+        geracao = await _geracao()
+        chave_ids = CHAVE_IDS.format(geracao=geracao, rota=rota)
+        entrada_id = uuid.uuid4().hex
+        chave = CHAVE_ENTRADA.format(geracao=geracao, rota=rota, entrada_id=entrada_id)
+
+        # Lista cheia: não acrescenta (a lista só cresce, o que mantém a leitura incremental)
+        if await redis_bin_async.llen(chave_ids) >= MAX_ENTRADAS_POR_ROTA:
+            return
+
+        pipe = redis_bin_async.pipeline(transaction=True)
+        pipe.hset(chave, mapping={
+            "pergunta": pergunta,
+            "resposta": resposta,
+            "vetor": base_conhecimento.vetor_para_bytes(vetor_pergunta),
+        })
+        pipe.expire(chave, ENV.CACHE_SEMANTICO_TTL)
+        pipe.rpush(chave_ids, entrada_id)
+        pipe.expire(chave_ids, ENV.CACHE_SEMANTICO_TTL)
+        await pipe.execute()
+    except redis.exceptions.RedisError as e:
+        print(f"[CACHE_SEMANTICO] Falha ao salvar entrada: {e}")
+
+
+async def estatisticas() -> dict[str, dict[str, int]]:
+    """Contadores de acertos/falhas por rota."""
+    brutos = await redis_bin_async.hgetall(CHAVE_ESTATISTICAS)
+    resultado: dict[str, dict[str, int]] = {}
+    for campo, valor in brutos.items():
+        rota, tipo = campo.decode().rsplit(":", 1)
+        resultado.setdefault(rota, {"acertos": 0, "falhas": 0})[tipo] = int(valor)
+    return resultado
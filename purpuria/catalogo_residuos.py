@@ -0,0 +1,83 @@
+# Cache do catálogo de resíduos (coleção empresas do MongoDB), por user_id.
+#
+# - Cada entrada vale CATALOGO_CACHE_TTL segundos; o cache guarda no máximo
+#   CATALOGO_CACHE_MAX empresas (as menos usadas saem primeiro).
+# - Com CATALOGO_CHANGE_STREAM ativo, uma thread acompanha o change stream da
+#   coleção e remove do cache a empresa alterada assim que o Mongo confirma a
+#   escrita (requer replica set; sem ele, só o TTL vale).
+import threading
+import time
+from collections import OrderedDict
+from pymongo.errors import OperationFailure, PyMongoError
+from common.env import ENV
+from common import mongo
+
+COLECAO = "empresas"
+PROJECAO = {"nome": 1, "residuos": 1, "_id": 0}
+
+_cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+_lock = threading.Lock()
+estatisticas = {"acertos": 0, "falhas": 0, "invalidacoes": 0}
+
+
+def invalidar(user_id: str | None = None):
+    """Remove uma empresa do cache (ou todas, sem user_id)."""
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+        estatisticas["invalidacoes"] += 1
+
+
+def obter_empresa(user_id: str) -> dict | None:
+    """Projeção {nome, residuos} da empresa, do cache ou do Mongo. None se não existir."""
+    agora = time.monotonic()
+    with _lock:
+        entrada = _cache.get(user_id)
+        if entrada is not None and entrada[0] > agora:
+            _cache.move_to_end(user_id)
+            estatisticas["acertos"] += 1
+            return entrada[1]
+        estatisticas["falhas"] += 1
+
+    empresa = mongo.colecao(COLECAO).find_one({"_id": user_id}, PROJECAO)
+    if empresa is not None:
+        with _lock:
+            _cache[user_id] = (agora + ENV.CATALOGO_CACHE_TTL, empresa)
+            _cache.move_to_end(user_id)
+            while len(_cache) > ENV.CATALOGO_CACHE_MAX:
+                _cache.popitem(last=False)
+    return empresa
+
+
+def _acompanhar_alteracoes(parar: threading.Event):
+    """Consome o change stream de empresas e invalida as entradas alteradas."""
+    while not parar.is_set():
+        try:
+            with mongo.colecao(COLECAO).watch(max_await_time_ms=1000) as stream:
+                while not parar.is_set() and stream.alive:
+                    mudanca = stream.try_next()
+                    if mudanca is None:
+                        continue
+                    chave = mudanca.get("documentKey", {}).get("_id")
+                    invalidar(str(chave) if chave is not None else None)
+        except OperationFailure as e:
+            # Sem replica set o change stream não existe: desiste e fica só com o TTL
+            print(f"[CATALOGO] Change stream indisponível, usando apenas o TTL: {e}")
+            return
+        except PyMongoError as e:
+            # Eventos podem ter sido perdidos durante a queda: esvazia o cache e reconecta
+            print(f"[CATALOGO] Change stream interrompido, reconectando: {e}")
+            invalidar()
+            parar.wait(5)
+
+
+def iniciar_invalidacao() -> threading.Event | None:
+    """Inicia a thread do change stream se CATALOGO_CHANGE_STREAM estiver ativo. Retorna o sinal de parada."""
+    if not ENV.CATALOGO_CHANGE_STREAM:
+        return None
+    parar = threading.Event()
+    threading.Thread(target=_acompanhar_alteracoes, args=(parar,), daemon=True,
+                     name="catalogo-change-stream").start()
+    return parar
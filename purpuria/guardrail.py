@@ -0,0 +1,93 @@
+# Guardrails de entrada e saída.
+#
+# As listas de termos ficam em purpuria/dados/guardrail.json, agrupadas em
+# regras: {"regra": nome, "fronteira": "inicio" | "palavra", "termos": [...]}.
+#   - inicio : o termo precisa começar no início de uma palavra ("partido" pega
+#              "partidos", mas não "repartido")
+#   - palavra: o termo precisa ser a palavra inteira
+#
+# Texto e termos passam pela mesma normalização (uma vez por chamada):
+# minúsculas, sem acentos, dígitos/símbolos usados como letras dentro de
+# palavras ("p0lítica", "put@"), letras repetidas 3+ vezes ("merdaaa") e
+# pontuação virando espaço. Todos os termos de um lado (entrada ou saída)
+# formam um único padrão compilado no import: cada verificação é uma passada do
+# motor de regex pelo texto, e o termo encontrado identifica a regra para o log.
+# (Sem grupos nomeados por termo: eles desligam a otimização de prefixos
+# literais do re e deixam a busca ~10x mais lenta.)
+import json
+import re
+import unicodedata
+from pathlib import Path
+from typing import NamedTuple
+
+ARQUIVO_REGRAS = Path(__file__).parent / "dados" / "guardrail.json"
+
+# Só vale dentro de palavras que também têm letras (números soltos ficam como estão)
+SUBSTITUICOES = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"})
+_SUBSTITUIVEL = re.compile(r"[013457@$]")
+_PALAVRA_COM_LETRA = re.compile(r"\S*[a-z]\S*")
+_LETRA_REPETIDA = re.compile(r"([a-z])\1\1+")
+_NAO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+
+
+class Acionamento(NamedTuple):
+    """Regra que bloqueou o texto (para log), com o termo normalizado encontrado."""
+    regra: str
+    termo: str
+
+
+def normalizar(texto: str) -> str:
+    """Forma canônica usada na comparação, com um espaço nas pontas (fronteira de palavra)."""
+    texto = texto.lower()
+    if not texto.isascii():
+        # Decompõe as letras acentuadas e descarta as marcas (e o que não for ASCII)
+        texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    if _SUBSTITUIVEL.search(texto):
+        texto = _PALAVRA_COM_LETRA.sub(lambda m: m.group(0).translate(SUBSTITUICOES), texto)
+    if _LETRA_REPETIDA.search(texto):
+        texto = _LETRA_REPETIDA.sub(r"\1", texto)
+    return f" {_NAO_ALFANUMERICO.sub(' ', texto).strip()} "
+
+
+class Guardrail:
+    """Conjunto de regras de um lado (entrada ou saída) compilado num único padrão."""
+
+    def __init__(self, regras: list[dict]):
+        self._acionamentos: dict[str, Acionamento] = {}
+        fronteiras: dict[str, str] = {}
+        for regra in regras:
+            for termo in regra["termos"]:
+                normalizado = normalizar(termo).strip()
+                if normalizado and normalizado not in self._acionamentos:
+                    self._acionamentos[normalizado] = Acionamento(regra["regra"], normalizado)
+                    fronteiras[normalizado] = r"(?= )" if regra["fronteira"] == "palavra" else ""
+
+        # Termos mais longos primeiro: numa mesma posição, a frase vence a palavra solta
+        termos = sorted(self._acionamentos, key=len, reverse=True)
+        alternativas = "|".join(re.escape(termo) + fronteiras[termo] for termo in termos)
+        # O espaço inicial exige que o termo comece no início de uma palavra
+        self._padrao = re.compile(f" (?:{alternativas})")
+
+    def verificar(self, texto: str) -> Acionamento | None:
+        """Primeira regra acionada pelo texto, ou None se ele passar."""
+        encontrado = self._padrao.search(normalizar(texto))
+        return self._acionamentos[encontrado.group()[1:]] if encontrado else None
+
+
+def _carregar() -> tuple[Guardrail, Guardrail]:
+    with open(ARQUIVO_REGRAS, encoding="utf-8") as f:
+        regras = json.load(f)
+    return Guardrail(regras["entrada"]), Guardrail(regras["saida"])
+
+
+guardrail_entrada, guardrail_saida = _carregar()
+
+
+def verificar_entrada(pergunta: str) -> Acionamento | None:
+    """Pergunta sugestiva, política ou inapropriada → regra acionada."""
+    return guardrail_entrada.verificar(pergunta)
+
+
+def verificar_saida(resposta: str) -> Acionamento | None:
+    """Resposta com linguagem ofensiva → regra acionada."""
+    return guardrail_saida.verificar(resposta)
@@ -0,0 +1,194 @@
+# Backends de busca aproximada (ANN) para o IndiceVetorial.
+#
+# - "ivf"  : Inverted File em NumPy (k-means esférico + listas invertidas).
+#            Parâmetros: ANN_IVF_LISTAS (0 = raiz de N) e ANN_IVF_SONDAS.
+# - "hnsw" : grafo HNSW via hnswlib (dependência opcional: pip install hnswlib).
+#            Parâmetros: ANN_HNSW_M, ANN_HNSW_EF_CONSTRUCAO e ANN_HNSW_EF_BUSCA.
+#
+# Os backends recebem a matriz já normalizada do IndiceVetorial e devolvem os
+# índices das linhas candidatas; o score final é sempre recalculado exatamente.
+import io
+import os
+import tempfile
+import numpy as np
+from common.env import ENV
+
+
+class IndiceIVF:
+    """Inverted File: só compara a consulta com os vetores das `sondas` listas mais próximas."""
+
+    nome = "ivf"
+
+    def __init__(self, listas: int = 0, sondas: int = 8, amostra_treino: int = 20000,
+                 iteracoes: int = 10, semente: int = 0):
+        self.listas = listas
+        self.sondas = sondas
+        self.amostra_treino = amostra_treino
+        self.iteracoes = iteracoes
+        self.semente = semente
+        self.centroides = None
+        self.atribuicoes = np.empty(0, dtype=np.int32)
+        self.treinado_com = 0
+        # (centróides, linhas agrupadas por lista, offsets de cada lista): trocado
+        # numa única atribuição para que buscas concorrentes vejam um estado coerente
+        self._estado = None
+
+    @property
+    def pronto(self) -> bool:
+        return self._estado is not None
+
+    def _atribuir(self, centroides: np.ndarray, matriz: np.ndarray, lote: int = 8192) -> np.ndarray:
+        """Lista (centróide mais próximo) de cada linha, em lotes para limitar memória."""
+        partes = [np.argmax(matriz[i:i + lote] @ centroides.T, axis=1)
+                  for i in range(0, len(matriz), lote)]
+        return np.concatenate(partes).astype(np.int32) if partes else np.empty(0, dtype=np.int32)
+
+    def _publicar(self, centroides: np.ndarray, atribuicoes: np.ndarray):
+        ordem = np.argsort(atribuicoes, kind="stable")
+        contagens = np.bincount(atribuicoes, minlength=len(centroides))
+        offsets = np.concatenate([[0], np.cumsum(contagens)])
+        self.centroides = centroides
+        self.atribuicoes = atribuicoes
+        self._estado = (centroides, ordem, offsets)
+
+    def construir(self, matriz: np.ndarray):
+        """Treina os centróides (k-means esférico sobre uma amostra) e distribui as linhas."""
+        n = len(matriz)
+        n_listas = min(self.listas or max(1, int(np.sqrt(n))), n)
+        rng = np.random.default_rng(self.semente)
+
+        amostra = matriz[rng.choice(n, min(n, self.amostra_treino), replace=False)]
+        n_listas = min(n_listas, len(amostra))
+        centroides = amostra[rng.choice(len(amostra), n_listas, replace=False)].copy()
+
+        for _ in range(self.iteracoes):
+            atribuicao = np.argmax(amostra @ centroides.T, axis=1)
+            somas = np.zeros_like(centroides)
+            np.add.at(somas, atribuicao, amostra)
+            normas = np.linalg.norm(somas, axis=1, keepdims=True)
+            vazias = normas[:, 0] == 0
+            somas[~vazias] /= normas[~vazias]
+            somas[vazias] = centroides[vazias]
+            centroides = somas
+
+        centroides = centroides.astype(np.float32)
+        self.treinado_com = n
+        self._publicar(centroides, self._atribuir(centroides, matriz))
+
+    def acrescentar(self, matriz: np.ndarray, inicio: int):
+        """Distribui as linhas novas nas listas existentes; re-treina se a base cresceu 4x."""
+        if len(matriz) > 4 * self.treinado_com:
+            self.construir(matriz)
+            return
+        novas = self._atribuir(self.centroides, matriz[inicio:])
+        self._publicar(self.centroides, np.concatenate([self.atribuicoes[:inicio], novas]))
+
+    def buscar(self, matriz: np.ndarray, consulta: np.ndarray, k: int) -> np.ndarray:
+        centroides, ordem, offsets = self._estado
+        sondas = min(self.sondas, len(centroides))
+        scores_listas = centroides @ consulta
+        melhores_listas = np.argpartition(-scores_listas, sondas - 1)[:sondas]
+        candidatos = np.concatenate([ordem[offsets[c]:offsets[c + 1]] for c in melhores_listas])
+        candidatos = candidatos[candidatos < len(matriz)]
+        if len(candidatos) <= k:
+            return candidatos
+        scores = matriz[candidatos] @ consulta
+        return candidatos[np.argpartition(-scores, k - 1)[:k]]
+
+    def exportar(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez(buffer, centroides=self.centroides, atribuicoes=self.atribuicoes,
+                 treinado_com=np.array([self.treinado_com]))
+        return buffer.getvalue()
+
+    def importar(self, dados: bytes, matriz: np.ndarray) -> bool:
+        """Restaura um snapshot; linhas além das do snapshot são distribuídas nas listas."""
+        with np.load(io.BytesIO(dados), allow_pickle=False) as snapshot:
+            centroides = snapshot["centroides"]
+            atribuicoes = snapshot["atribuicoes"]
+            treinado_com = int(snapshot["treinado_com"][0])
+        if len(atribuicoes) > len(matriz) or centroides.shape[1] != matriz.shape[1]:
+            return False
+        self.treinado_com = treinado_com
+        self._publicar(centroides, atribuicoes)
+        if len(atribuicoes) < len(matriz):
+            self.acrescentar(matriz, len(atribuicoes))
+        return True
+
+
+class IndiceHNSW:
+    """Grafo HNSW (hnswlib) com produto interno sobre vetores normalizados (= cosseno)."""
+
+    nome = "hnsw"
+
+    def __init__(self, m: int = 16, ef_construcao: int = 200, ef_busca: int = 64):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("ANN_BACKEND=hnsw requer o pacote opcional 'hnswlib' (pip install hnswlib).") from e
+        self._hnswlib = hnswlib
+        self.m = m
+        self.ef_construcao = ef_construcao
+        self.ef_busca = ef_busca
+        self.indice = None
+
+    @property
+    def pronto(self) -> bool:
+        return self.indice is not None
+
+    def _novo_indice(self, dimensao: int, capacidade: int):
+        indice = self._hnswlib.Index(space="ip", dim=dimensao)
+        indice.init_index(max_elements=capacidade, M=self.m, ef_construction=self.ef_construcao)
+        indice.set_ef(self.ef_busca)
+        return indice
+
+    def construir(self, matriz: np.ndarray):
+        indice = self._novo_indice(matriz.shape[1], max(2 * len(matriz), 1024))
+        indice.add_items(matriz, np.arange(len(matriz)))
+        self.indice = indice
+
+    def acrescentar(self, matriz: np.ndarray, inicio: int):
+        if len(matriz) > self.indice.get_max_elements():
+            self.indice.resize_index(2 * len(matriz))
+        self.indice.add_items(matriz[inicio:], np.arange(inicio, len(matriz)))
+
+    def buscar(self, matriz: np.ndarray, consulta: np.ndarray, k: int) -> np.ndarray:
+        k = min(k, self.indice.get_current_count())
+        rotulos, _ = self.indice.knn_query(consulta, k=k)
+        candidatos = rotulos[0].astype(np.int64)
+        return candidatos[candidatos < len(matriz)]
+
+    def exportar(self) -> bytes:
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "indice.bin")
+            self.indice.save_index(caminho)
+            with open(caminho, "rb") as f:
+                return f.read()
+
+    def importar(self, dados: bytes, matriz: np.ndarray) -> bool:
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "indice.bin")
+            with open(caminho, "wb") as f:
+                f.write(dados)
+            indice = self._hnswlib.Index(space="ip", dim=matriz.shape[1])
+            indice.load_index(caminho, max_elements=max(2 * len(matriz), 1024))
+        if indice.get_current_count() > len(matriz):
+            return False
+        indice.set_ef(self.ef_busca)
+        self.indice = indice
+        if indice.get_current_count() < len(matriz):
+            self.acrescentar(matriz, indice.get_current_count())
+        return True
+
+
+def criar_backend_ann(nome: str | None = None):
+    """Instancia o backend configurado em ENV.ANN_BACKEND ("exato" → None)."""
+    nome = (nome or ENV.ANN_BACKEND).lower()
+    if nome == "exato":
+        return None
+    if nome == "ivf":
+        return IndiceIVF(listas=ENV.ANN_IVF_LISTAS, sondas=ENV.ANN_IVF_SONDAS)
+    if nome == "hnsw":
+        return IndiceHNSW(m=ENV.ANN_HNSW_M, ef_construcao=ENV.ANN_HNSW_EF_CONSTRUCAO,
+                          ef_busca=ENV.ANN_HNSW_EF_BUSCA)
+    raise ValueError(f"ANN_BACKEND desconhecido: {nome!r} (use exato, ivf ou hnsw)")
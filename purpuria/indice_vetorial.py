@@ -0,0 +1,135 @@
+# Índice vetorial em memória para a busca semântica (buscar_no_redis).
+# Mantém uma matriz float32 já normalizada + os textos correspondentes, de
+# modo que o top-k sai de um único produto matriz-vetor + argpartition.
+# Opcionalmente delega a seleção de candidatos a um backend ANN (indice_ann.py)
+# quando a base passa de `min_documentos_ann`.
+import threading
+import numpy as np
+
+
+class IndiceVetorial:
+    """Índice por similaridade de cosseno, atualizado de forma incremental."""
+
+    def __init__(self, ann=None, min_documentos_ann: int = 0):
+        # (matriz normalizada, textos) trocados juntos numa única atribuição,
+        # para que uma busca concorrente nunca veja os dois fora de sincronia
+        self.dados = (np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=object))
+        # Quantidade de documentos da origem já consumidos (inclusive os ignorados)
+        self.carregados = 0
+        # Versão da origem (contador no Redis) refletida no índice
+        self.versao = None
+        self._lock = threading.Lock()
+
+        # Backend ANN opcional (None = sempre busca exata)
+        self.ann = ann
+        self.min_documentos_ann = min_documentos_ann
+        # Linhas da matriz cobertas pelo ANN (0 = ANN inativo, usa busca exata)
+        self.ann_linhas = 0
+        # True quando o ANN foi (re)construído e ainda não teve o snapshot persistido
+        self.ann_snapshot_pendente = False
+
+    def __len__(self):
+        return len(self.dados[1])
+
+    @staticmethod
+    def _normalizar(vetores: np.ndarray) -> np.ndarray:
+        normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+        normas[normas == 0] = 1.0
+        return vetores / normas
+
+    def _matriz(self, vetores, quantidade: int) -> np.ndarray:
+        if not quantidade:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._normalizar(np.asarray(vetores, dtype=np.float32).reshape(quantidade, -1))
+
+    def _atualizar_ann(self, snapshot: bytes | None = None):
+        """Mantém o backend ANN alinhado à matriz (chamado com o lock adquirido)."""
+        if self.ann is None:
+            return
+        matriz = self.dados[0]
+        if len(matriz) < self.min_documentos_ann:
+            self.ann_linhas = 0
+            return
+
+        if snapshot is not None and self.ann.importar(snapshot, matriz):
+            pass
+        elif self.ann_linhas and self.ann_linhas <= len(matriz):
+            self.ann.acrescentar(matriz, self.ann_linhas)
+        else:
+            self.ann.construir(matriz)
+            self.ann_snapshot_pendente = True
+        self.ann_linhas = len(matriz)
+
+    def substituir(self, consumidos: int, vetores, textos, versao, snapshot_ann: bytes | None = None):
+        """
+        Reconstrói o índice inteiro a partir de `consumidos` documentos da origem.
+        `snapshot_ann` (opcional) evita re-treinar o ANN quando há um snapshot persistido.
+        """
+        matriz = self._matriz(vetores, len(textos))
+        with self._lock:
+            self.dados = (matriz, np.asarray(textos, dtype=object))
+            self.carregados = consumidos
+            self.versao = versao
+            self.ann_linhas = 0
+            self._atualizar_ann(snapshot_ann)
+
+    def acrescentar(self, inicio: int, consumidos: int, vetores, textos, versao) -> bool:
+        """
+        Acrescenta os documentos lidos da origem a partir da posição `inicio`.
+        Ignora a chamada (retorna False) se outro carregamento já avançou o
+        índice, evitando duplicatas em atualizações concorrentes.
+        """
+        with self._lock:
+            if inicio != self.carregados:
+                return False
+            if len(textos):
+                matriz, atuais = self.dados
+                novos = self._matriz(vetores, len(textos))
+                self.dados = (
+                    np.vstack([matriz, novos]) if len(atuais) else novos,
+                    np.concatenate([atuais, np.asarray(textos, dtype=object)]),
+                )
+            self.carregados = inicio + consumidos
+            self.versao = versao
+            self._atualizar_ann()
+            return True
+
+    def remover(self, textos) -> int:
+        """
+        Tira do índice as linhas com esses textos (ex.: entradas que expiraram na
+        origem). Não altera `carregados`/`versao`. Retorna quantas saíram.
+        """
+        remover = set(textos)
+        with self._lock:
+            matriz, atuais = self.dados
+            manter = np.array([t not in remover for t in atuais], dtype=bool)
+            removidas = int(len(atuais) - manter.sum())
+            if removidas:
+                self.dados = (matriz[manter], atuais[manter])
+                self.ann_linhas = 0
+                self._atualizar_ann()
+            return removidas
+
+    def buscar(self, vetor, k: int = 3) -> list[tuple[float, str]]:
+        """Retorna os k textos mais similares como (score, texto), do maior para o menor."""
+        matriz, textos = self.dados
+        if not len(textos):
+            return []
+
+        consulta = np.asarray(vetor, dtype=np.float32)
+        norma = np.linalg.norm(consulta)
+        if norma:
+            consulta = consulta / norma
+
+        if self.ann is not None and self.ann_linhas:
+            # Candidatos do ANN, re-pontuados exatamente
+            candidatos = self.ann.buscar(matriz, consulta, k)
+            scores = matriz[candidatos] @ consulta
+            ordem = np.argsort(-scores)
+            return [(float(scores[i]), textos[candidatos[i]]) for i in ordem]
+
+        scores = matriz @ consulta
+        k = min(k, len(scores))
+        melhores = np.argpartition(-scores, k - 1)[:k]
+        melhores = melhores[np.argsort(-scores[melhores])]
+        return [(float(scores[i]), textos[i]) for i in melhores]
@@ -0,0 +1,212 @@
+# Jobs de ingestão de embeddings em segundo plano.
+#
+# POST /embed só enfileira o job; um worker dentro do processo da API consome a
+# fila. Tudo fica no Redis, então jobs sobrevivem a reinícios:
+#   - embed:fila          → IDs aguardando processamento
+#   - embed:processando   → IDs em processamento (BLMOVE da fila)
+#   - embed:job:{id}      → hash com textos, status, progresso e erros
+import asyncio
+import json
+import time
+import uuid
+import redis
+from common import componentes
+from infoRedis import add_embeddings_lote, TAMANHO_LOTE_EMBEDDING
+
+CHAVE_FILA = "embed:fila"
+CHAVE_PROCESSANDO = "embed:processando"
+CHAVE_JOB = "embed:job:{job_id}"
+
+MAX_TENTATIVAS = 5
+BACKOFF_INICIAL = 1.0           # segundos; dobra a cada tentativa
+LEASE_SEGUNDOS = 120            # job sem atualização por mais que isso volta para a fila
+TTL_JOB_FINALIZADO = 24 * 3600  # jobs concluídos ficam consultáveis por 1 dia
+
+# Mesmo cliente assíncrono do histórico (common/componentes.py)
+redis_client_async = componentes.preguicoso("redis_async")
+
+
+def _chave_job(job_id: str) -> str:
+    return CHAVE_JOB.format(job_id=job_id)
+
+
+async def enfileirar_job(textos: list[str]) -> str:
+    """Cria o job e o coloca na fila. Retorna o ID do job."""
+    job_id = uuid.uuid4().hex
+    pipe = redis_client_async.pipeline(transaction=True)
+    pipe.hset(_chave_job(job_id), mapping={
+        "status": "na_fila",
+        "textos": json.dumps(textos),
+        "total": len(textos),
+        "processados": 0,
+        "adicionados": 0,
+        "falhas": 0,
+        "tentativas": 0,
+        "criado_em": time.time(),
+        "erros": "[]",
+    })
+    pipe.lpush(CHAVE_FILA, job_id)
+    await pipe.execute()
+    return job_id
+
+
+async def consultar_job(job_id: str) -> dict | None:
+    """Status do job com progresso e vazão (textos/s). None se não existir."""
+    job = await redis_client_async.hgetall(_chave_job(job_id))
+    if not job:
+        return None
+
+    total = int(job["total"])
+    processados = int(job["processados"])
+    iniciado_em = float(job["iniciado_em"]) if job.get("iniciado_em") else None
+    concluido_em = float(job["concluido_em"]) if job.get("concluido_em") else None
+
+    vazao = 0.0
+    if iniciado_em:
+        decorrido = (concluido_em or time.time()) - iniciado_em
+        vazao = processados / decorrido if decorrido > 0 else 0.0
+
+    return {
+        "id": job_id,
+        "status": job["status"],
+        "total": total,
+        "processados": processados,
+        "adicionados": int(job["adicionados"]),
+        "falhas": int(job["falhas"]),
+        "tentativas": int(job["tentativas"]),
+        "progresso": processados / total if total else 1.0,
+        "vazao": vazao,
+        "criado_em": float(job["criado_em"]),
+        "iniciado_em": iniciado_em,
+        "concluido_em": concluido_em,
+        "erros": json.loads(job.get("erros", "[]")),
+    }
+
+
+async def _processar_lote(textos: list[str], inicio: int, chave: str) -> list[dict]:
+    """Ingere um lote, repetindo os itens que falharam com backoff exponencial."""
+    pendentes = list(range(len(textos)))
+    resultados = {}
+    for tentativa in range(MAX_TENTATIVAS):
+        if tentativa:
+            await redis_client_async.hincrby(chave, "tentativas", 1)
+            await asyncio.sleep(BACKOFF_INICIAL * 2 ** (tentativa - 1))
+        # Renova o lease a cada tentativa: com o backoff, um lote pode passar
+        # do LEASE_SEGUNDOS e o job seria devolvido à fila com o worker vivo
+        await redis_client_async.hset(chave, "lease_ate", time.time() + LEASE_SEGUNDOS)
+
+        itens = await add_embeddings_lote([textos[i] for i in pendentes])
+        nova_pendencia = []
+        for posicao, item in zip(pendentes, itens):
+            item["indice"] = inicio + posicao
+            resultados[posicao] = item
+            # Texto inválido não adianta repetir; erros de embedding/Redis sim
+            if item["status"] == "erro":
+                nova_pendencia.append(posicao)
+        pendentes = nova_pendencia
+        if not pendentes:
+            break
+    return [resultados[i] for i in range(len(textos))]
+
+
+async def processar_job(job_id: str):
+    """
+    Processa um job em lotes, atualizando progresso, erros e lease no Redis a cada lote.
+    Um job devolvido à fila retoma a partir do último lote concluído.
+    """
+    chave = _chave_job(job_id)
+    job = await redis_client_async.hmget(chave, "textos", "processados", "erros", "iniciado_em")
+    textos_json, processados, erros_json, iniciado_em = job
+    if textos_json is None:
+        await redis_client_async.lrem(CHAVE_PROCESSANDO, 1, job_id)
+        return
+    textos = json.loads(textos_json)
+    erros = json.loads(erros_json or "[]")
+
+    await redis_client_async.hset(chave, mapping={
+        "status": "processando",
+        "iniciado_em": iniciado_em or time.time(),
+        "lease_ate": time.time() + LEASE_SEGUNDOS,
+    })
+
+    for inicio in range(int(processados or 0), len(textos), TAMANHO_LOTE_EMBEDDING):
+        itens = await _processar_lote(textos[inicio:inicio + TAMANHO_LOTE_EMBEDDING], inicio, chave)
+        adicionados = sum(1 for item in itens if item["status"] == "adicionado")
+        erros.extend(item for item in itens if item["status"] != "adicionado")
+
+        pipe = redis_client_async.pipeline(transaction=True)
+        pipe.hincrby(chave, "processados", len(itens))
+        pipe.hincrby(chave, "adicionados", adicionados)
+        pipe.hincrby(chave, "falhas", len(itens) - adicionados)
+        pipe.hset(chave, mapping={"erros": json.dumps(erros), "lease_ate": time.time() + LEASE_SEGUNDOS})
+        await pipe.execute()
+
+    pipe = redis_client_async.pipeline(transaction=True)
+    pipe.hset(chave, mapping={
+        "status": "concluido" if not erros else "concluido_com_falhas",
+        "concluido_em": time.time(),
+    })
+    pipe.hdel(chave, "textos", "lease_ate")
+    pipe.expire(chave, TTL_JOB_FINALIZADO)
+    pipe.lrem(CHAVE_PROCESSANDO, 1, job_id)
+    await pipe.execute()
+
+
+async def recuperar_jobs_abandonados():
+    """Devolve à fila os jobs em processamento cujo lease expirou (ex.: processo reiniciado)."""
+    agora = time.time()
+    for job_id in await redis_client_async.lrange(CHAVE_PROCESSANDO, 0, -1):
+        chave = _chave_job(job_id)
+        status, lease_ate = await redis_client_async.hmget(chave, "status", "lease_ate")
+        if status is not None and lease_ate is None:
+            # Sem lease: retirado da fila por um worker que ainda não começou ou
+            # que caiu antes de começar. Ganha um lease agora (o worker, se vivo,
+            # o sobrescreve ao iniciar); se expirar, volta à fila numa próxima passada.
+            await redis_client_async.hsetnx(chave, "lease_ate", agora + LEASE_SEGUNDOS)
+            continue
+        # Job sem hash (expirado/removido) volta à fila e processar_job o descarta
+        if lease_ate is not None and float(lease_ate) > agora:
+            continue
+        if await _devolver_a_fila(job_id, chave, agora):
+            print(f"[INGESTAO] Job {job_id} devolvido à fila.")
+
+
+async def _devolver_a_fila(job_id: str, chave: str, agora: float) -> bool:
+    """
+    Move o job de processando para a fila só se ele ainda estiver lá com o lease
+    vencido. WATCH na lista e no hash: se outro worker já o devolveu, retirou
+    ou renovou o lease, o MULTI é descartado e o job não entra duas vezes na fila.
+    """
+    async with redis_client_async.pipeline(transaction=True) as pipe:
+        try:
+            await pipe.watch(CHAVE_PROCESSANDO, chave)
+            lease_ate = await pipe.hget(chave, "lease_ate")
+            if await pipe.lpos(CHAVE_PROCESSANDO, job_id) is None or (
+                    lease_ate is not None and float(lease_ate) > agora):
+                return False
+            pipe.multi()
+            pipe.lrem(CHAVE_PROCESSANDO, 1, job_id)
+            pipe.rpush(CHAVE_FILA, job_id)
+            await pipe.execute()
+            return True
+        except redis.exceptions.WatchError:
+            # Alguém mexeu na lista ou no job: a próxima passada reavalia
+            return False
+
+
+async def worker_ingestao():
+    """Loop do worker: consome a fila até ser cancelado."""
+    await recuperar_jobs_abandonados()
+    while True:
+        try:
+            job_id = await redis_client_async.blmove(CHAVE_FILA, CHAVE_PROCESSANDO, 5, "RIGHT", "LEFT")
+            if job_id is None:
+                # Fila ociosa: aproveita para resgatar jobs de workers que caíram
+                await recuperar_jobs_abandonados()
+                continue
+            await processar_job(job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[INGESTAO] Erro no worker: {type(e).__name__}: {e}")
+            await asyncio.sleep(BACKOFF_INICIAL)
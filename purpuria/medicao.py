@@ -0,0 +1,73 @@
+# Medição das etapas do fluxo (roteador, especialista, juiz...).
+#
+# O fluxo marca cada etapa com `with medir("etapa"):` e quem quiser os tempos
+# registra um observador, chamado com (etapa, segundos) ao fim de cada uma:
+#
+#     medicao.observar(lambda etapa, segundos: ...)
+#
+# As tools são medidas com o decorator medir_ferramenta, como etapas
+# "ferramenta:<nome>". Sem observadores o custo é só o de dois perf_counter().
+# Observadores rodam no caminho da requisição e devem ser rápidos (acumular e
+# sair); exceções deles são descartadas para nunca derrubar o fluxo.
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+PREFIXO_FERRAMENTA = "ferramenta:"
+
+_observadores: list[Callable[[str, float], None]] = []
+
+
+def observar(observador: Callable[[str, float], None]):
+    """Passa a receber (etapa, segundos) de toda etapa medida."""
+    _observadores.append(observador)
+
+
+def remover(observador: Callable[[str, float], None]):
+    if observador in _observadores:
+        _observadores.remove(observador)
+
+
+@contextmanager
+def medir(etapa: str):
+    """Mede o bloco como `etapa` (também vale em código assíncrono, em volta de awaits)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        for observador in _observadores:
+            try:
+                observador(etapa, duracao)
+            except Exception as e:
+                print(f"[MEDICAO] Observador falhou em {etapa}: {type(e).__name__}: {e}")
+
+
+def medir_ferramenta(funcao: Callable, nome: str | None = None) -> Callable:
+    """
+    Decorator para funções de tool (síncronas ou assíncronas), aplicado abaixo do @tool:
+
+        @tool
+        @medir_ferramenta
+        @cache_por_usuario(ttl=60)
+        def consultar_pedidos_usuario(...): ...
+
+    Mede cada chamada como "ferramenta:<nome>" (padrão: o nome da função), já
+    contando o cache das tools. Preserva assinatura e docstring para o @tool.
+    """
+    etapa = PREFIXO_FERRAMENTA + (nome or funcao.__name__)
+
+    if inspect.iscoroutinefunction(funcao):
+        @functools.wraps(funcao)
+        async def amedida(*args, **kwargs):
+            with medir(etapa):
+                return await funcao(*args, **kwargs)
+        return amedida
+
+    @functools.wraps(funcao)
+    def medida(*args, **kwargs):
+        with medir(etapa):
+            return funcao(*args, **kwargs)
+    return medida
@@ -0,0 +1,176 @@
+# Memória de conversa com orçamento de tokens por etapa.
+#
+# O histórico completo continua em chat:{usuario}:{chat_id}, mas os LLMs só
+# recebem:
+#   - um resumo das mensagens antigas (atualizado de forma incremental, em
+#     segundo plano, a cada HISTORICO_BLOCO_RESUMO mensagens que saem da janela)
+#   - as últimas mensagens na íntegra, limitadas pela janela da etapa
+#     (turnos e tokens, ver HISTORICO_JANELAS)
+#
+# Layout no Redis (além da lista do chat):
+#   - chat:{usuario}:{chat_id}:resumo      → hash {texto, ate, descartadas}
+#       ate         : posição absoluta (desde o início do chat) até onde o resumo cobre
+#       descartadas : quantas mensagens antigas já saíram da lista pelo LTRIM
+#   - chat:{usuario}:{chat_id}:resumo:lock → evita dois resumos simultâneos do mesmo chat
+#
+# A lista só é aparada (LTRIM) em mensagens já resumidas e acima de
+# HISTORICO_MAX_MENSAGENS, então nenhum contexto se perde.
+import asyncio
+import json
+from langchain_core.messages import HumanMessage, AIMessage
+from common.env import ENV
+from purpuria.redis_history import redis_client_async, _chat_key
+from purpuria.serializacao import estimar_tokens
+
+LOCK_RESUMO_SEGUNDOS = 60
+
+
+def _resumo_key(usuario: str, chat_id: str) -> str:
+    return f"{_chat_key(usuario, chat_id)}:resumo"
+
+
+def _ler_janelas(configuracao: str) -> dict[str, tuple[int, int]]:
+    """Lê "etapa=turnos:tokens,..." → {etapa: (turnos, tokens)}."""
+    janelas = {}
+    for item in configuracao.split(","):
+        if not item.strip():
+            continue
+        etapa, valores = item.split("=")
+        turnos, tokens = valores.split(":")
+        janelas[etapa.strip()] = (int(turnos), int(tokens))
+    return janelas
+
+
+JANELAS = _ler_janelas(ENV.HISTORICO_JANELAS)
+# Quantas mensagens recentes carregar: o suficiente para a maior janela e para
+# tudo que ainda não entrou no resumo (a janela verbatim + um bloco incompleto)
+MAX_MENSAGENS_JANELA = max(
+    2 * max([ENV.HISTORICO_TURNOS_VERBATIM, *(turnos for turnos, _ in JANELAS.values())]),
+    2 * ENV.HISTORICO_TURNOS_VERBATIM + ENV.HISTORICO_BLOCO_RESUMO,
+)
+
+
+class HistoricoConversa:
+    """Histórico carregado uma vez por requisição; cada etapa recorta a sua janela."""
+
+    def __init__(self, mensagens: list[dict], resumo: str = "", total: int = 0,
+                 resumo_ate: int = 0, descartadas: int = 0):
+        self.mensagens = mensagens
+        self.resumo = resumo
+        self.total = total
+        self.resumo_ate = resumo_ate
+        self.descartadas = descartadas
+
+    def precisa_resumir(self, tamanho_lista: int) -> bool:
+        """Com a lista neste tamanho, já há um bloco completo fora da janela verbatim?"""
+        limite = self.descartadas + tamanho_lista - 2 * ENV.HISTORICO_TURNOS_VERBATIM
+        return limite - self.resumo_ate >= ENV.HISTORICO_BLOCO_RESUMO
+
+    def para_etapa(self, etapa: str) -> list:
+        """
+        Mensagens para o prompt da etapa: as mais recentes que couberem em
+        (turnos, tokens) e, se ainda houver orçamento, o resumo antes delas.
+        """
+        turnos, orcamento = JANELAS[etapa]
+        selecionadas = []
+        for msg in reversed(self.mensagens[-2 * turnos:] if turnos else []):
+            custo = estimar_tokens(msg["conteudo"])
+            if custo > orcamento:
+                break
+            orcamento -= custo
+            selecionadas.append(msg)
+        selecionadas.reverse()
+
+        chat_msgs = []
+        if self.resumo and estimar_tokens(self.resumo) <= orcamento:
+            # Par pergunta/resposta para manter a alternância de papéis no prompt
+            chat_msgs.append(HumanMessage(content=f"[RESUMO DA CONVERSA ANTERIOR]\n{self.resumo}"))
+            chat_msgs.append(AIMessage(content="Entendido."))
+        for msg in selecionadas:
+            if msg["role"] == "user":
+                chat_msgs.append(HumanMessage(content=msg["conteudo"]))
+            elif msg["role"] == "assistant":
+                chat_msgs.append(AIMessage(content=msg["conteudo"]))
+        return chat_msgs
+
+
+async def carregar(usuario: str, chat_id: str) -> HistoricoConversa:
+    """
+    Resumo + mensagens ainda não resumidas (a partir de `ate`), sem lacuna entre
+    os dois. Normalmente uma única ida ao Redis; se o resumo estiver atrasado
+    (ex.: falhou em segundo plano), uma segunda leitura traz o restante.
+    """
+    key = _chat_key(usuario, chat_id)
+    pipe = redis_client_async.pipeline(transaction=False)
+    pipe.lrange(key, -MAX_MENSAGENS_JANELA, -1)
+    pipe.llen(key)
+    pipe.hmget(_resumo_key(usuario, chat_id), "texto", "ate", "descartadas")
+    recentes, tamanho, (resumo, ate, descartadas) = await pipe.execute()
+    ate, descartadas = int(ate or 0), int(descartadas or 0)
+
+    # Posição absoluta da primeira mensagem lida; corta o que o resumo já cobre
+    inicio = descartadas + tamanho - len(recentes)
+    if ate >= inicio:
+        recentes = recentes[ate - inicio:]
+    else:
+        anteriores = await redis_client_async.lrange(key, max(ate - descartadas, 0), inicio - descartadas - 1)
+        recentes = anteriores + recentes
+
+    return HistoricoConversa(
+        mensagens=[json.loads(m) for m in recentes],
+        resumo=resumo or "",
+        total=descartadas + tamanho,
+        resumo_ate=ate,
+        descartadas=descartadas,
+    )
+
+
+async def atualizar_resumo(usuario: str, chat_id: str, resumir):
+    """
+    Incorpora ao resumo as mensagens que saíram da janela verbatim e apara a lista.
+    `resumir(resumo_anterior, mensagens) -> novo resumo` é fornecido pelo core (LLM).
+    """
+    key = _chat_key(usuario, chat_id)
+    resumo_key = _resumo_key(usuario, chat_id)
+    lock_key = f"{resumo_key}:lock"
+    if not await redis_client_async.set(lock_key, "1", nx=True, ex=LOCK_RESUMO_SEGUNDOS):
+        return
+
+    try:
+        pipe = redis_client_async.pipeline(transaction=False)
+        pipe.hmget(resumo_key, "texto", "ate", "descartadas")
+        pipe.llen(key)
+        (texto, ate, descartadas), tamanho = await pipe.execute()
+        ate, descartadas = int(ate or 0), int(descartadas or 0)
+
+        # Tudo antes das últimas HISTORICO_TURNOS_VERBATIM trocas pode ir para o resumo
+        limite = descartadas + tamanho - 2 * ENV.HISTORICO_TURNOS_VERBATIM
+        if limite - ate < ENV.HISTORICO_BLOCO_RESUMO:
+            return
+
+        antigas = await redis_client_async.lrange(key, ate - descartadas, limite - descartadas - 1)
+        novo_resumo = await resumir(texto or "", [json.loads(m) for m in antigas])
+
+        # Apara só o que já está no resumo e excede o limite de armazenamento
+        aparar = max(0, min(tamanho - ENV.HISTORICO_MAX_MENSAGENS, limite - descartadas))
+        pipe = redis_client_async.pipeline(transaction=True)
+        pipe.hset(resumo_key, mapping={"texto": novo_resumo, "ate": limite})
+        if aparar:
+            pipe.ltrim(key, aparar, -1)
+            pipe.hincrby(resumo_key, "descartadas", aparar)
+        await pipe.execute()
+    except Exception as e:
+        print(f"[MEMORIA] Falha ao atualizar o resumo de {key}: {type(e).__name__}: {e}")
+    finally:
+        await redis_client_async.delete(lock_key)
+
+
+# Referências das tarefas em segundo plano (evita que sejam coletadas antes de terminar)
+_tarefas: set[asyncio.Task] = set()
+
+
+def agendar_resumo(usuario: str, chat_id: str, resumir):
+    """Dispara atualizar_resumo sem bloquear a resposta ao usuário."""
+    tarefa = asyncio.create_task(atualizar_resumo(usuario, chat_id, resumir))
+    _tarefas.add(tarefa)
+    tarefa.add_done_callback(_tarefas.discard)
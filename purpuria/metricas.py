@@ -0,0 +1,181 @@
+# Métricas Prometheus da API (GET /metrics).
+#
+# - Latência por etapa do fluxo e por tool: histogramas alimentados pelos tempos
+#   de purpuria/medicao.py (um observador registrado no import deste módulo).
+# - Rotas, iterações do especialista, guardrails, JSON inválido do especialista
+#   e fallback do orquestrador: atualizados pelo fluxo (purpuria/core.py).
+# - Caches, pool PostgreSQL, pré-busca e serialização das tools: lidos das
+#   estatísticas que cada módulo já mantém, só na hora do scrape.
+#
+# No caminho da requisição o custo é um observe()/inc() por evento (poucos µs).
+# Os contadores do cache das tools e do cache semântico ficam no Redis e são
+# compartilhados entre réplicas: ao agregar instâncias, use max() e não sum().
+import asyncio
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from common import postgres
+from purpuria import cache_semantico, catalogo_residuos, medicao, prefetch, serializacao
+from purpuria.cache_embeddings import embeddings_model
+from purpuria.tools import cache_tools
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# De etapas locais (µs) a chamadas de LLM (segundos)
+BUCKETS_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40)
+
+ETAPA_DURACAO = Histogram(
+    "purpuria_etapa_duracao_segundos", "Duração de cada etapa do fluxo de chat", ["etapa"],
+    buckets=BUCKETS_LATENCIA,
+)
+FERRAMENTA_DURACAO = Histogram(
+    "purpuria_ferramenta_duracao_segundos", "Duração de cada chamada de tool (incluindo o cache das tools)",
+    ["ferramenta"], buckets=BUCKETS_LATENCIA,
+)
+ROTAS = Counter(
+    "purpuria_rotas", "Perguntas por rota e por quem decidiu (pre_roteador ou roteador LLM)", ["rota", "origem"]
+)
+ESPECIALISTA_ITERACOES = Histogram(
+    "purpuria_especialista_iteracoes", "Passos do agente especialista (chamadas ao LLM) por pergunta", ["rota"],
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15),
+)
+ESPECIALISTA_FERRAMENTAS = Histogram(
+    "purpuria_especialista_chamadas_ferramenta", "Chamadas de tool do agente especialista por pergunta", ["rota"],
+    buckets=(0, 1, 2, 3, 4, 6, 8, 12),
+)
+GUARDRAIL = Counter("purpuria_guardrail_acionamentos", "Textos bloqueados pelos guardrails", ["lado", "regra"])
+JSON_INVALIDO = Counter(
+    "purpuria_especialista_json_invalido", "Saídas do especialista que não eram JSON válido", ["rota"]
+)
+ORQUESTRADOR_FALLBACK = Counter(
+    "purpuria_orquestrador_fallback_llm", "JSON fora do contrato renderizado pelo orquestrador LLM", ["rota"]
+)
+
+# Filho do histograma por etapa, resolvido uma vez (labels() faz lock e busca a cada chamada)
+_series_etapa: dict[str, object] = {}
+
+
+def _observar_etapa(etapa: str, segundos: float):
+    serie = _series_etapa.get(etapa)
+    if serie is None:
+        if etapa.startswith(medicao.PREFIXO_FERRAMENTA):
+            serie = FERRAMENTA_DURACAO.labels(etapa[len(medicao.PREFIXO_FERRAMENTA):])
+        else:
+            serie = ETAPA_DURACAO.labels(etapa)
+        _series_etapa[etapa] = serie
+    serie.observe(segundos)
+
+
+medicao.observar(_observar_etapa)
+
+
+def registrar_rota(rota: str, origem: str):
+    ROTAS.labels(rota, origem).inc()
+
+
+def registrar_guardrail(lado: str, regra: str):
+    GUARDRAIL.labels(lado, regra).inc()
+
+
+def registrar_json_invalido(rota: str):
+    JSON_INVALIDO.labels(rota).inc()
+
+
+def registrar_fallback_orquestrador(rota: str):
+    ORQUESTRADOR_FALLBACK.labels(rota).inc()
+
+
+def registrar_especialista(rota: str, passos: list):
+    """Iterações e chamadas de tool a partir dos intermediate_steps do AgentExecutor."""
+    # Tools chamadas em paralelo num mesmo passo saem da mesma mensagem do LLM;
+    # o passo final (a resposta, sem tool) não aparece nos intermediate_steps
+    mensagens = {id(acao.message_log[-1]) if getattr(acao, "message_log", None) else id(acao) for acao, _ in passos}
+    ESPECIALISTA_ITERACOES.labels(rota).observe(len(mensagens) + 1)
+    ESPECIALISTA_FERRAMENTAS.labels(rota).observe(len(passos))
+
+
+class _ColetorEstatisticas:
+    """Converte, a cada scrape, as estatísticas mantidas pelos módulos em métricas."""
+
+    def __init__(self):
+        # Contadores lidos do Redis em exportar() (vazio se o Redis não respondeu)
+        self.compartilhadas: dict[str, dict] = {}
+
+    def collect(self):
+        rotulos = ["cache", "nome"]
+        acertos = CounterMetricFamily("purpuria_cache_acertos", "Acertos por cache", labels=rotulos)
+        falhas = CounterMetricFamily("purpuria_cache_falhas", "Falhas por cache", labels=rotulos)
+        taxa = GaugeMetricFamily("purpuria_cache_taxa_acerto", "Acertos / (acertos + falhas) por cache",
+                                 labels=rotulos)
+
+        def cache(nome_cache: str, nome: str, n_acertos: int, n_falhas: int):
+            acertos.add_metric([nome_cache, nome], n_acertos)
+            falhas.add_metric([nome_cache, nome], n_falhas)
+            if n_acertos + n_falhas:
+                taxa.add_metric([nome_cache, nome], n_acertos / (n_acertos + n_falhas))
+
+        embeddings = embeddings_model.resumo()
+        cache("embeddings", "", embeddings["memoria"] + embeddings["redis"], embeddings["api"])
+        cache("catalogo_residuos", "", catalogo_residuos.estatisticas["acertos"],
+              catalogo_residuos.estatisticas["falhas"])
+        pre_buscas = CounterMetricFamily("purpuria_ferramenta_pre_buscas",
+                                         "Resultados de tool gravados pela pré-busca e aproveitados pelo agente",
+                                         labels=["ferramenta", "resultado"])
+        for ferramenta, contadores in self.compartilhadas.get("ferramentas", {}).items():
+            cache("ferramentas", ferramenta, contadores["acertos"], contadores["falhas"])
+            pre_buscas.add_metric([ferramenta, "gravadas"], contadores["pre_buscas"])
+            pre_buscas.add_metric([ferramenta, "aproveitadas"], contadores["acertos_pre_busca"])
+        for rota, contadores in self.compartilhadas.get("semantico", {}).items():
+            cache("semantico", rota, contadores["acertos"], contadores["falhas"])
+
+        dados_prefetch = prefetch.estatisticas()
+        for alvo, contadores in dados_prefetch["por_alvo"].items():
+            cache("prefetch", alvo, contadores["aproveitadas"], contadores["desperdicadas"])
+        eventos_prefetch = CounterMetricFamily("purpuria_prefetch_eventos", "Pré-buscas por resultado",
+                                               labels=["evento"])
+        for evento in ("iniciadas", "sem_vaga", "erros"):
+            eventos_prefetch.add_metric([evento], dados_prefetch[evento])
+        yield from (acertos, falhas, taxa, pre_buscas, eventos_prefetch)
+
+        pool = postgres.metricas()
+        conexoes = GaugeMetricFamily("purpuria_postgres_conexoes", "Conexões do pool PostgreSQL por estado",
+                                     labels=["estado"])
+        for estado in ("em_uso", "ociosas", "abertas"):
+            if estado in pool:
+                conexoes.add_metric([estado], pool[estado])
+        yield conexoes
+        yield CounterMetricFamily("purpuria_postgres_retiradas", "Conexões retiradas do pool",
+                                  value=pool["retiradas"])
+        yield CounterMetricFamily("purpuria_postgres_espera_segundos", "Tempo total de espera por conexão",
+                                  value=pool["espera_total_s"])
+        yield CounterMetricFamily("purpuria_postgres_timeouts_pool", "Retiradas que desistiram com o pool esgotado",
+                                  value=pool["timeouts_pool"])
+        yield CounterMetricFamily("purpuria_postgres_erros_consulta", "Consultas que falharam",
+                                  value=pool["erros_consulta"])
+
+        dados_serializacao = serializacao.estatisticas()
+        resultado_bytes = CounterMetricFamily("purpuria_ferramenta_resultado_bytes",
+                                              "Bytes dos resultados das tools antes e depois da compactação",
+                                              labels=["tipo"])
+        resultado_bytes.add_metric(["original"], dados_serializacao["bytes_originais"])
+        resultado_bytes.add_metric(["enviado"], dados_serializacao["bytes_enviados"])
+        yield resultado_bytes
+        yield CounterMetricFamily("purpuria_ferramenta_linhas_omitidas", "Linhas cortadas pelo orçamento de tokens",
+                                  value=dados_serializacao["linhas_omitidas"])
+
+
+_coletor = _ColetorEstatisticas()
+REGISTRY.register(_coletor)
+
+
+async def exportar() -> bytes:
+    """Métricas no formato texto do Prometheus (lê antes do Redis os contadores compartilhados)."""
+    try:
+        ferramentas, semantico = await asyncio.gather(
+            asyncio.to_thread(cache_tools.estatisticas), cache_semantico.estatisticas()
+        )
+        _coletor.compartilhadas = {"ferramentas": ferramentas, "semantico": semantico}
+    except Exception as e:
+        # Sem Redis as métricas locais continuam saindo; só as compartilhadas ficam de fora
+        print(f"[METRICAS] Contadores do Redis indisponíveis: {type(e).__name__}: {e}")
+        _coletor.compartilhadas = {}
+    return generate_latest(REGISTRY)
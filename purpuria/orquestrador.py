@@ -0,0 +1,46 @@
+# Renderizador determinístico do Orquestrador.
+# Implementa em Python o contrato de formato do system_prompt_orquestrador,
+# evitando uma chamada de LLM só para montar o texto final.
+
+CAMPOS_OBRIGATORIOS = {"resposta"}
+CAMPOS_CONHECIDOS = {"dominio", "resposta", "recomendacao", "acompanhamento"}
+
+
+def renderizar_resposta(dados_especialista) -> str | None:
+    """
+    Monta a resposta final a partir do JSON do especialista:
+      <resposta>
+      - *Recomendação*:
+      <recomendacao>          (omitida se vazia)
+      - *Acompanhamento*:
+      <acompanhamento>        (omitida se vazia)
+
+    Retorna None quando o JSON foge do contrato (campos inesperados, tipos
+    diferentes de texto ou `resposta` vazia); nesse caso o chamador deve usar
+    o Orquestrador LLM como fallback.
+    """
+    if not isinstance(dados_especialista, dict):
+        return None
+
+    campos = set(dados_especialista)
+    if not CAMPOS_OBRIGATORIOS <= campos or not campos <= CAMPOS_CONHECIDOS:
+        return None
+
+    if not all(isinstance(v, str) for v in dados_especialista.values()):
+        return None
+
+    resposta = dados_especialista["resposta"].strip()
+    if not resposta:
+        return None
+
+    linhas = [resposta]
+
+    recomendacao = dados_especialista.get("recomendacao", "").strip()
+    if recomendacao:
+        linhas.append(f"- *Recomendação*:\n{recomendacao}")
+
+    acompanhamento = dados_especialista.get("acompanhamento", "").strip()
+    if acompanhamento:
+        linhas.append(f"- *Acompanhamento*:\n{acompanhamento}")
+
+    return "\n".join(linhas)
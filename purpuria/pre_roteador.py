@@ -0,0 +1,110 @@
+# Pré-roteador local (sem LLM).
+# Classifica a pergunta entre os domínios do Roteador usando TF-IDF sobre os
+# exemplos rotulados em purpuria/dados/roteador_exemplos.json (shots do roteador
+# + tráfego rotulado). Acima do limiar de confiança emite diretamente o mesmo
+# protocolo ROUTE=...; abaixo dele o chamador usa o Roteador LLM.
+import json
+import math
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from common.env import ENV
+
+ARQUIVO_EXEMPLOS = Path(__file__).parent / "dados" / "roteador_exemplos.json"
+
+STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "uns", "umas", "de", "do", "da", "dos", "das",
+    "em", "no", "na", "nos", "nas", "por", "para", "pra", "com", "e", "ou", "que",
+    "qual", "quais", "quando", "quanto", "quantos", "quantas", "como", "onde", "quem",
+    "eu", "me", "meu", "meus", "minha", "minhas", "voce", "tem", "tenho", "ter", "ja",
+    "ainda", "esta", "estao", "ser", "vai", "sao", "e", "se", "mais", "ao", "aos",
+    "isso", "este", "essa", "esse", "mostre", "mostra", "liste", "faco", "fiz",
+}
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas e sem acentos."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def tokenizar(texto: str) -> list[str]:
+    """Tokens normalizados, sem stopwords e com o plural simples removido."""
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", normalizar(texto)):
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        if len(token) > 3 and token.endswith("s"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _normalizar_vetor(vetor: dict) -> dict:
+    norma = math.sqrt(sum(v * v for v in vetor.values()))
+    return {t: v / norma for t, v in vetor.items()} if norma else {}
+
+
+class PreRoteador:
+    """Classificador TF-IDF por centróide de domínio."""
+
+    def __init__(self, exemplos: dict[str, list[str]]):
+        documentos = [(dominio, tokenizar(texto)) for dominio, textos in exemplos.items() for texto in textos]
+
+        # IDF sobre todos os exemplos
+        df = Counter(t for _, tokens in documentos for t in set(tokens))
+        total = len(documentos)
+        self.idf = {t: math.log((1 + total) / (1 + n)) + 1 for t, n in df.items()}
+
+        # Centróide (normalizado) de cada domínio
+        self.centroides = {}
+        for dominio in exemplos:
+            soma = Counter()
+            for dom, tokens in documentos:
+                if dom == dominio:
+                    soma.update(self._vetorizar(tokens))
+            self.centroides[dominio] = _normalizar_vetor(soma)
+
+    def _vetorizar(self, tokens: list[str]) -> dict:
+        tf = Counter(t for t in tokens if t in self.idf)
+        return _normalizar_vetor({t: n * self.idf[t] for t, n in tf.items()})
+
+    def pontuar(self, pergunta: str) -> dict[str, float]:
+        """Similaridade de cosseno da pergunta com cada domínio."""
+        vetor = self._vetorizar(tokenizar(pergunta))
+        return {
+            dominio: sum(peso * centroide.get(t, 0.0) for t, peso in vetor.items())
+            for dominio, centroide in self.centroides.items()
+        }
+
+    def classificar(self, pergunta: str) -> tuple[str, float]:
+        """Retorna (domínio mais provável, confiança).
+
+        A confiança é a margem entre o melhor e o segundo melhor domínio, então
+        perguntas sem vocabulário do domínio ou ambíguas ficam perto de zero.
+        """
+        pontuacao = sorted(self.pontuar(pergunta).items(), key=lambda x: x[1], reverse=True)
+        (dominio, melhor), (_, segundo) = pontuacao[0], pontuacao[1]
+        return dominio, melhor - segundo
+
+
+def _carregar_exemplos() -> dict[str, list[str]]:
+    with open(ARQUIVO_EXEMPLOS, encoding="utf-8") as f:
+        return json.load(f)
+
+
+pre_roteador = PreRoteador(_carregar_exemplos())
+
+
+def pre_rotear(pergunta: str, limiar: float | None = None) -> str | None:
+    """
+    Tenta rotear localmente. Retorna a saída no protocolo do Roteador
+    (ROUTE=/PERGUNTA_ORIGINAL=/CLARIFY=) ou None quando a confiança fica abaixo
+    do limiar (ENV.PRE_ROTEADOR_LIMIAR) e o Roteador LLM deve decidir.
+    """
+    limiar = ENV.PRE_ROTEADOR_LIMIAR if limiar is None else limiar
+    dominio, confianca = pre_roteador.classificar(pergunta)
+    if confianca < limiar:
+        return None
+    return f"ROUTE={dominio}\nPERGUNTA_ORIGINAL={pergunta}\nCLARIFY="
@@ -0,0 +1,114 @@
+# Pré-busca especulativa dos dados do usuário enquanto o Roteador LLM decide a rota.
+#
+# A chamada ao Roteador é só espera para a camada de dados. Como o usuário já é
+# conhecido e a maioria das perguntas cai em pedidos ou resíduos, o fluxo dispara
+# em paralelo com o Roteador (no threadpool):
+#   - pedidos : consultar_pedidos_usuario com os filtros padrão → cache das tools (Redis)
+#   - residuos: catálogo da empresa no Mongo                    → cache do catálogo
+# Quando o especialista chama a tool, o resultado já está no cache e a latência
+# do banco ficou escondida atrás da latência do LLM.
+#
+# PREFETCH_MAX_CONCORRENTES limita as pré-buscas em andamento no processo; sem
+# vaga, a pré-busca é pulada (nunca espera). estatisticas() compara o que foi
+# pré-buscado com a rota que o Roteador escolheu de fato.
+import asyncio
+import threading
+from common.env import ENV
+from purpuria import catalogo_residuos
+from purpuria.tools.pedidos_tool import consultar_pedidos_usuario
+
+
+def _pedidos(user_id: str):
+    # Mesma chave de cache da chamada do agente, mas registrada como pré-busca:
+    # não entra na latência das tools nem em acertos/falhas do cache (ver cache_tools)
+    resultado = consultar_pedidos_usuario.func.pre_buscar(user_id=user_id)
+    if resultado.startswith("ERRO_"):
+        raise RuntimeError(resultado)
+
+
+def _residuos(user_id: str):
+    catalogo_residuos.obter_empresa(user_id)
+
+
+ALVOS = {"pedidos": _pedidos, "residuos": _residuos}
+
+_vagas = threading.BoundedSemaphore(ENV.PREFETCH_MAX_CONCORRENTES)
+_tarefas: set[asyncio.Task] = set()
+_lock = threading.Lock()
+_estatisticas = {
+    "iniciadas": 0,
+    "sem_vaga": 0,
+    "erros": 0,
+    "rotas": {"aproveitadas": 0, "desperdicadas": 0},
+    "por_alvo": {alvo: {"aproveitadas": 0, "desperdicadas": 0} for alvo in ALVOS},
+}
+
+
+def _alvos_ativos() -> list[str]:
+    # Sem o cache das tools, pré-buscar pedidos só gastaria uma consulta
+    return [alvo for alvo in ALVOS if alvo != "pedidos" or ENV.TOOL_CACHE_ATIVO]
+
+
+def _executar(alvo: str, user_id: str):
+    try:
+        ALVOS[alvo](user_id)
+    except Exception as e:
+        with _lock:
+            _estatisticas["erros"] += 1
+        print(f"[PREFETCH] Falha ao pré-buscar {alvo} de {user_id}: {type(e).__name__}: {e}")
+
+
+async def _pre_buscar(alvos: list[str], user_id: str):
+    try:
+        await asyncio.gather(*(asyncio.to_thread(_executar, alvo, user_id) for alvo in alvos))
+    finally:
+        _vagas.release()
+
+
+def iniciar(user_id: str) -> list[str]:
+    """
+    Dispara a pré-busca do usuário sem bloquear o fluxo.
+    Retorna os alvos pré-buscados (vazio se desativado ou sem vaga), para registrar_rota().
+    """
+    alvos = _alvos_ativos() if ENV.PREFETCH_ATIVO else []
+    if not alvos:
+        return []
+    if not _vagas.acquire(blocking=False):
+        with _lock:
+            _estatisticas["sem_vaga"] += 1
+        return []
+
+    with _lock:
+        _estatisticas["iniciadas"] += 1
+    tarefa = asyncio.create_task(_pre_buscar(alvos, user_id))
+    _tarefas.add(tarefa)
+    tarefa.add_done_callback(_tarefas.discard)
+    return alvos
+
+
+def registrar_rota(alvos: list[str], rota: str | None):
+    """Contabiliza se a rota escolhida aproveitou algum dos alvos pré-buscados."""
+    if not alvos:
+        return
+    with _lock:
+        _estatisticas["rotas"]["aproveitadas" if rota in alvos else "desperdicadas"] += 1
+        for alvo in alvos:
+            _estatisticas["por_alvo"][alvo]["aproveitadas" if alvo == rota else "desperdicadas"] += 1
+
+
+def _com_taxa(contadores: dict) -> dict:
+    total = contadores["aproveitadas"] + contadores["desperdicadas"]
+    return {**contadores, "taxa_acerto": round(contadores["aproveitadas"] / total, 4) if total else None}
+
+
+def estatisticas() -> dict:
+    """Pré-buscas iniciadas/puladas/com erro e taxa de acerto (geral e por alvo) frente às rotas reais."""
+    with _lock:
+        return {
+            "iniciadas": _estatisticas["iniciadas"],
+            "sem_vaga": _estatisticas["sem_vaga"],
+            "erros": _estatisticas["erros"],
+            "em_andamento": len(_tarefas),
+            "rotas": _com_taxa(_estatisticas["rotas"]),
+            "por_alvo": {alvo: _com_taxa(c) for alvo, c in _estatisticas["por_alvo"].items()},
+        }
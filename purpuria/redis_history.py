@@ -1,27 +1,70 @@
-import redis
 import json
+import time
+import redis
+from common import componentes
 from common.env import ENV
 
 
-# Conecta ao Redis usando a URL completa (Host, porta, autenticação)
-redis_client = redis.Redis.from_url(
-    ENV.REDIS_URL,
-    decode_responses=True
-)
+# Cliente assíncrono compartilhado (criado no primeiro uso, ver common/componentes.py)
+redis_client_async = componentes.preguicoso("redis_async")
 
 def _chat_key(usuario: str, chat_id: str) -> str:
     """Monta a chave do Redis para armazenar histórico"""
     return f"chat:{usuario}:{chat_id}"
 
-def get_history(usuario: str, chat_id: str):
-    """Busca histórico salvo no Redis"""
+def _pipeline_turno(pipe, usuario: str, chat_id: str, pergunta: str, resposta: str):
+    """Enfileira no pipeline as duas mensagens do turno e a renovação do TTL do chat."""
     key = _chat_key(usuario, chat_id)
-    data = redis_client.lrange(key, 0, -1)
-    if not data:
-        return []
-    return [json.loads(d) for d in data]
+    agora = time.time()
+    pipe.rpush(key,
+               json.dumps({"role": "user", "conteudo": pergunta, "ts": agora}),
+               json.dumps({"role": "assistant", "conteudo": resposta, "ts": agora}))
+    pipe.expire(key, ENV.HISTORICO_TTL)
+    pipe.expire(f"{key}:resumo", ENV.HISTORICO_TTL)
+
+async def aadd_turno(usuario: str, chat_id: str, pergunta: str, resposta: str) -> int:
+    """
+    Salva pergunta e resposta numa única transação (MULTI) e renova o TTL do
+    chat e do seu resumo. Retorna o tamanho da lista após a escrita.
+    """
+    pipe = redis_client_async.pipeline(transaction=True)
+    _pipeline_turno(pipe, usuario, chat_id, pergunta, resposta)
+    return (await pipe.execute())[0]
+
+async def aget_history_pagina(usuario: str, chat_id: str, limite: int,
+                              antes: int | None = None) -> list[tuple[int, dict]]:
+    """
+    Página do histórico, da mensagem mais recente para a mais antiga.
+    Cada item é (posição, mensagem): a posição é absoluta desde o início do chat
+    (não muda quando mensagens antigas são aparadas) e serve de cursor — a
+    próxima página é pedida com antes=<menor posição recebida>.
+    Lê só o intervalo pedido (LRANGE), qualquer que seja o tamanho do chat.
 
-def add_message(usuario: str, chat_id: str, role: str, conteudo: str):
-    """Adiciona mensagem ao histórico"""
+    O intervalo depende de LLEN e de `descartadas`: as leituras ficam sob WATCH
+    e o LRANGE roda no MULTI, então um LTRIM concorrente (memoria_conversa)
+    refaz a leitura em vez de deslocar a página.
+    """
     key = _chat_key(usuario, chat_id)
-    redis_client.rpush(key, json.dumps({"role": role, "conteudo": conteudo}))
\ No newline at end of file
+    resumo_key = f"{key}:resumo"
+    async with redis_client_async.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                await pipe.watch(key, resumo_key)
+                tamanho = await pipe.llen(key)
+                descartadas = int(await pipe.hget(resumo_key, "descartadas") or 0)
+
+                fim = descartadas + tamanho if antes is None else min(antes, descartadas + tamanho)
+                inicio = max(descartadas, fim - limite)
+                if fim <= inicio:
+                    await pipe.reset()
+                    return []
+
+                pipe.multi()
+                pipe.lrange(key, inicio - descartadas, fim - descartadas - 1)
+                data, = await pipe.execute()
+                break
+            except redis.exceptions.WatchError:
+                # Turno novo ou LTRIM entre a leitura e o MULTI: calcula de novo
+                continue
+
+    return [(inicio + i, json.loads(d)) for i, d in reversed(list(enumerate(data)))]
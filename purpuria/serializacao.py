@@ -0,0 +1,153 @@
+# Formatação dos resultados das tools para o scratchpad do agente.
+#
+# O que as tools devolvem vai inteiro para o prompt do especialista, então:
+#   - JSON compacto (sem indentação) e em colunas: {"colunas": [...], "linhas": [[...], ...]}
+#     em vez de repetir as chaves em todo objeto
+#   - campos de texto longos são cortados em TAMANHO_MAX_CAMPO caracteres
+#   - as linhas param quando o orçamento de tokens (TOOL_ORCAMENTO_TOKENS) acaba;
+#     no lugar das omitidas entra um resumo agregado (quantidade e totais por status)
+#
+# estatisticas() acumula quanto isso economizou em relação ao json.dumps(indent=2) anterior.
+import json
+import threading
+from decimal import Decimal
+from common.env import ENV
+
+TAMANHO_MAX_CAMPO = 300
+
+_estatisticas = {"chamadas": 0, "bytes_originais": 0, "bytes_enviados": 0, "linhas_omitidas": 0}
+_lock = threading.Lock()
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa barata (~4 caracteres por token), suficiente para orçamento."""
+    return len(texto) // 4 + 1
+
+
+def _compacto(valor) -> str:
+    return json.dumps(valor, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _registrar(original, enviado: str, omitidas: int = 0):
+    bytes_originais = len(json.dumps(original, indent=2, default=str).encode("utf-8"))
+    with _lock:
+        _estatisticas["chamadas"] += 1
+        _estatisticas["bytes_originais"] += bytes_originais
+        _estatisticas["bytes_enviados"] += len(enviado.encode("utf-8"))
+        _estatisticas["linhas_omitidas"] += omitidas
+
+
+def _cortar(valor):
+    if isinstance(valor, str) and len(valor) > TAMANHO_MAX_CAMPO:
+        return valor[:TAMANHO_MAX_CAMPO] + "…"
+    return valor
+
+
+def _numero(valor) -> float | None:
+    if isinstance(valor, (int, float, Decimal)) and not isinstance(valor, bool):
+        return float(valor)
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _agregar(linhas: list[dict], agrupar_por: str, somar: str) -> dict:
+    """{grupo: {"quantidade": n, "<somar>_total": soma}} sobre todas as linhas."""
+    grupos: dict[str, dict] = {}
+    for linha in linhas:
+        grupo = grupos.setdefault(str(linha.get(agrupar_por)), {"quantidade": 0})
+        grupo["quantidade"] += 1
+        valor = _numero(linha.get(somar))
+        if valor is not None:
+            chave = f"{somar}_total"
+            grupo[chave] = round(grupo.get(chave, 0.0) + valor, 2)
+    return grupos
+
+
+def _encurtar_textos(valores: list, orcamento: int) -> list:
+    """Corta os campos de texto da linha para que ela caiba (se possível) em `orcamento` tokens."""
+    textos = [i for i, valor in enumerate(valores) if isinstance(valor, str)]
+    if not textos:
+        return valores
+    sem_textos = [("" if i in textos else valor) for i, valor in enumerate(valores)]
+    por_campo = max(0, (orcamento * 4 - len(_compacto(sem_textos))) // len(textos) - 1)
+    return [
+        valor[:por_campo] + "…" if i in textos and len(valor) > por_campo else valor
+        for i, valor in enumerate(valores)
+    ]
+
+
+def formatar_linhas(linhas: list[dict], extras: dict | None = None, orcamento: int | None = None,
+                    agrupar_por: str = "status", somar: str = "valortotal") -> str:
+    """
+    Serializa linhas (dicts) em colunas, dentro do orçamento de tokens.
+    `extras` (ex.: mais_resultados, proximo_cursor) vão junto no objeto final.
+    Se faltar orçamento, as linhas restantes viram um resumo por `agrupar_por`.
+    """
+    orcamento = orcamento or ENV.TOOL_ORCAMENTO_TOKENS
+    colunas = list(dict.fromkeys(chave for linha in linhas for chave in linha))
+    resultado = {"colunas": colunas, "linhas": [], **(extras or {})}
+
+    restante = orcamento - estimar_tokens(_compacto(resultado))
+    for linha in linhas:
+        valores = [_cortar(linha.get(coluna)) for coluna in colunas]
+        custo = estimar_tokens(_compacto(valores))
+        if custo > restante:
+            # Como em formatar_textos: sempre vai ao menos a primeira linha, com os textos cortados
+            if not resultado["linhas"]:
+                resultado["linhas"].append(_encurtar_textos(valores, restante))
+            break
+        resultado["linhas"].append(valores)
+        restante -= custo
+
+    omitidas = len(linhas) - len(resultado["linhas"])
+    if omitidas:
+        resumo = {"total_linhas": len(linhas), "linhas_omitidas": omitidas}
+        if agrupar_por in colunas:
+            resumo[f"por_{agrupar_por}"] = _agregar(linhas, agrupar_por, somar)
+        resultado["resumo"] = resumo
+
+    enviado = _compacto(resultado)
+    _registrar({"linhas": linhas, **(extras or {})}, enviado, omitidas)
+    return enviado
+
+
+def formatar_textos(textos: list[str], orcamento: int | None = None) -> str:
+    """Lista de trechos (ex.: documentos da base de conhecimento) dentro do orçamento."""
+    orcamento = orcamento or ENV.TOOL_ORCAMENTO_TOKENS
+    selecionados = []
+    for texto in textos:
+        custo = estimar_tokens(texto)
+        if custo > orcamento:
+            # Sempre cabe ao menos o começo do trecho mais relevante
+            if not selecionados:
+                selecionados.append(texto[:orcamento * 4] + "…")
+            break
+        selecionados.append(texto)
+        orcamento -= custo
+
+    enviado = _compacto(selecionados)
+    _registrar(textos, enviado, len(textos) - len(selecionados))
+    return enviado
+
+
+def formatar_resultado(valor, orcamento: int | None = None) -> str:
+    """Escolhe o formato pelo tipo: lista de dicts → colunas; lista de textos → trechos; resto → JSON compacto."""
+    if isinstance(valor, list) and valor and all(isinstance(item, dict) for item in valor):
+        return formatar_linhas(valor, orcamento=orcamento)
+    if isinstance(valor, list) and all(isinstance(item, str) for item in valor):
+        return formatar_textos(valor, orcamento=orcamento)
+    enviado = _compacto(valor)
+    _registrar(valor, enviado)
+    return enviado
+
+
+def estatisticas() -> dict:
+    """Bytes antes/depois, tokens estimados economizados e linhas omitidas desde o início do processo."""
+    with _lock:
+        dados = dict(_estatisticas)
+    economizados = dados["bytes_originais"] - dados["bytes_enviados"]
+    dados["bytes_economizados"] = economizados
+    dados["tokens_economizados"] = economizados // 4
+    return dados
@@ -0,0 +1,142 @@
+# Cache de resultados das tools, por usuário, no Redis.
+#
+#   tool_cache:{user_id}:geracao                                → contador do usuário (INCR invalida)
+#   tool_cache:{user_id}:{geracao}:{tool}:{hash dos argumentos} → resultado (com TTL da tool)
+#   tool_cache:{...}:{hash}:pre                                 → marca: resultado gravado pela pré-busca
+#   tool_cache:estatisticas                                     → contadores {tool}:{tipo}
+#
+# Tipos: acertos / falhas (chamadas do agente), pre_buscas (resultados gravados
+# pela pré-busca, purpuria/prefetch.py) e acertos_pre_busca (o agente encontrou
+# um resultado pré-buscado; contado fora de acertos para não inflar a taxa).
+#
+# O user_id faz parte da chave, então um usuário nunca recebe o resultado de
+# outro; tools chamadas sem user_id não são cacheadas. Resultados de erro
+# (ERRO_...) também não.
+#
+# Invalidar é só incrementar a geração: as entradas antigas deixam de ser lidas
+# e expiram pelo TTL. Um resultado calculado durante a invalidação fica gravado
+# na geração antiga, então nunca é servido depois dela.
+import functools
+import hashlib
+import inspect
+import json
+import redis
+from common import componentes
+from common.env import ENV
+
+CHAVE_RESULTADO = "tool_cache:{user_id}:{geracao}:{tool}:{hash}"
+CHAVE_GERACAO = "tool_cache:{user_id}:geracao"
+CHAVE_ESTATISTICAS = "tool_cache:estatisticas"
+TIPOS_ESTATISTICA = ("acertos", "falhas", "pre_buscas", "acertos_pre_busca")
+
+# Muito maior que qualquer TTL de tool: quando a geração expira e volta a 0,
+# as entradas antigas da geração 0 já expiraram há muito tempo
+TTL_GERACAO = 24 * 3600
+
+# Mesmo cliente do histórico (common/componentes.py)
+redis_client = componentes.preguicoso("redis")
+
+
+def _normalizar(valor):
+    """Argumentos equivalentes geram a mesma chave ("aprovado, pendente" == "pendente,aprovado")."""
+    if isinstance(valor, str):
+        partes = [p.strip() for p in valor.split(",")]
+        return ",".join(sorted(partes)) if len(partes) > 1 else valor.strip()
+    return valor
+
+
+def _chave(tool: str, user_id: str, geracao: str, argumentos: dict) -> str:
+    normalizados = {nome: _normalizar(v) for nome, v in argumentos.items() if nome != "user_id"}
+    digest = hashlib.sha256(json.dumps(normalizados, sort_keys=True, default=str).encode()).hexdigest()[:32]
+    return CHAVE_RESULTADO.format(user_id=user_id, geracao=geracao, tool=tool, hash=digest)
+
+
+def cache_por_usuario(ttl: int):
+    """
+    Decorator para funções de tool (aplicar ANTES do @tool):
+
+        @tool
+        @cache_por_usuario(ttl=60)
+        def consultar_pedidos_usuario(user_id: str, ...): ...
+
+    Preserva assinatura e docstring, que o @tool usa para montar o schema.
+    A função decorada ganha `.pre_buscar(...)`: mesma chamada, mas gravada como
+    pré-busca (sem contar acerto/falha do agente).
+    """
+    def decorador(func):
+        assinatura = inspect.signature(func)
+        nome_tool = func.__name__
+
+        def resolver(args, kwargs, pre_busca: bool):
+            argumentos = assinatura.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            user_id = argumentos.arguments.get("user_id")
+            if not ENV.TOOL_CACHE_ATIVO or not user_id:
+                return func(*args, **kwargs)
+
+            try:
+                geracao = redis_client.get(CHAVE_GERACAO.format(user_id=user_id)) or "0"
+                chave = _chave(nome_tool, str(user_id), geracao, argumentos.arguments)
+                armazenado, pre_buscado = redis_client.mget(chave, f"{chave}:pre")
+            except redis.exceptions.RedisError as e:
+                print(f"[CACHE_TOOLS] Redis indisponível, executando {nome_tool} sem cache: {e}")
+                return func(*args, **kwargs)
+
+            if armazenado is not None:
+                if pre_busca:
+                    return armazenado
+                try:
+                    pipe = redis_client.pipeline(transaction=False)
+                    if pre_buscado is not None:
+                        # Só o primeiro acerto conta como aproveitamento da pré-busca
+                        pipe.hincrby(CHAVE_ESTATISTICAS, f"{nome_tool}:acertos_pre_busca", 1)
+                        pipe.delete(f"{chave}:pre")
+                    else:
+                        pipe.hincrby(CHAVE_ESTATISTICAS, f"{nome_tool}:acertos", 1)
+                    pipe.execute()
+                except redis.exceptions.RedisError as e:
+                    # O valor já foi lido: só a contagem se perde
+                    print(f"[CACHE_TOOLS] Falha ao contar acerto de {nome_tool}: {e}")
+                return armazenado
+
+            resultado = func(*args, **kwargs)
+            try:
+                pipe = redis_client.pipeline(transaction=False)
+                pipe.hincrby(CHAVE_ESTATISTICAS, f"{nome_tool}:{'pre_buscas' if pre_busca else 'falhas'}", 1)
+                if isinstance(resultado, str) and not resultado.startswith("ERRO_"):
+                    pipe.set(chave, resultado, ex=ttl)
+                    if pre_busca:
+                        pipe.set(f"{chave}:pre", "1", ex=ttl)
+                pipe.execute()
+            except redis.exceptions.RedisError as e:
+                print(f"[CACHE_TOOLS] Falha ao gravar cache de {nome_tool}: {e}")
+            return resultado
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return resolver(args, kwargs, pre_busca=False)
+
+        wrapper.pre_buscar = lambda *args, **kwargs: resolver(args, kwargs, pre_busca=True)
+        return wrapper
+    return decorador
+
+
+def invalidar_usuarios(user_ids: list[str]) -> list[str]:
+    """Descarta todos os resultados cacheados dos usuários (uma ida ao Redis). Retorna os usuários invalidados."""
+    usuarios = sorted(set(user_ids))
+    pipe = redis_client.pipeline(transaction=True)
+    for user_id in usuarios:
+        chave = CHAVE_GERACAO.format(user_id=user_id)
+        pipe.incr(chave)
+        pipe.expire(chave, TTL_GERACAO)
+    pipe.execute()
+    return usuarios
+
+
+def estatisticas() -> dict[str, dict[str, int]]:
+    """Contadores por tool: acertos, falhas, pre_buscas e acertos_pre_busca."""
+    resultado: dict[str, dict[str, int]] = {}
+    for campo, valor in redis_client.hgetall(CHAVE_ESTATISTICAS).items():
+        tool, tipo = campo.rsplit(":", 1)
+        resultado.setdefault(tool, dict.fromkeys(TIPOS_ESTATISTICA, 0))[tipo] = int(valor)
+    return resultado
@@ -1,55 +1,165 @@
-import json
+from datetime import datetime
 import psycopg2
-from langchain.tools import tool
+from langchain_core.tools import tool
+from common import postgres
 from common.env import ENV
+from purpuria.serializacao import formatar_linhas
+from purpuria.medicao import medir_ferramenta
+from purpuria.tools.cache_tools import cache_por_usuario
+
+# CONSULTAS (prepared statements no servidor; valores sempre como parâmetros $n)
+# O LIMIT é sempre PEDIDOS_LIMITE + 1: a linha extra só indica se há mais resultados.
+
+SQL_PEDIDOS_VENDEDOR = postgres.preparar("pedidos_vendedor", """
+    SELECT idPedido, agendamentoColeta, status, valorTotal
+    FROM pedido
+    WHERE fkEntregador = $1 AND status = ANY($2::text[])
+    ORDER BY agendamentoColeta DESC
+    LIMIT $3
+""")
+
+SQL_PEDIDO_MAIS_ANTIGO = postgres.preparar("pedido_mais_antigo", """
+    SELECT idPedido, data, valorTotal
+    FROM pedido
+    WHERE fkEntregador = $1 AND status IN ('pendente', 'aprovado')
+    ORDER BY data ASC
+    LIMIT 1
+""")
+
+SQL_TRANSPORTE_PEDIDO = postgres.preparar("transporte_pedido", """
+    SELECT t.transportadora, t.dataRetirada
+    FROM transporte t
+    INNER JOIN pedido p ON t.fkPedido = p.idPedido
+    WHERE t.fkPedido = $1 AND p.fkEntregador = $2
+""")
+
+SQL_PEDIDOS_COMPRADOR = postgres.preparar("pedidos_comprador", """
+    SELECT idPedido, agendamentoColeta, status, valorTotal, fkEntregador as Vendedor
+    FROM pedido
+    WHERE fkRecebedor = $1 AND status = ANY($2::text[])
+    ORDER BY agendamentoColeta DESC
+    LIMIT $3
+""")
+
+SQL_PARTICIPANTES_PEDIDO = postgres.preparar("participantes_pedido", """
+    SELECT fkEntregador, fkRecebedor
+    FROM pedido
+    WHERE idPedido = $1
+""")
+
+# Pedidos do usuário (vendedor ou comprador) já com os resíduos e o transporte de
+# cada um, numa única consulta: os LATERAL agregam as linhas filhas em JSON por
+# pedido, sem multiplicar resíduos x transportes como um JOIN simples faria.
+SQL_PEDIDOS_DETALHADOS = postgres.preparar("pedidos_detalhados", """
+    SELECT p.idPedido, p.agendamentoColeta, p.status, p.valorTotal,
+           CASE WHEN p.fkEntregador = $1 THEN 'vendedor' ELSE 'comprador' END AS papel,
+           r.residuos, t.transporte
+    FROM pedido p
+    LEFT JOIN LATERAL (
+        SELECT COALESCE(json_agg(json_build_object(
+                   'residuo', rp.fkResiduo, 'quantidade', rp.quantidadeResiduo,
+                   'peso', rp.pesoComprado, 'unidade', rp.tipoUnidade)), '[]'::json) AS residuos
+        FROM residuoPedido rp
+        WHERE rp.fkPedido = p.idPedido
+    ) r ON true
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_object(
+                   'transportadora', tr.transportadora, 'dataRetirada', tr.dataRetirada)) AS transporte
+        FROM transporte tr
+        WHERE tr.fkPedido = p.idPedido
+    ) t ON true
+    WHERE (p.fkEntregador = $1 OR p.fkRecebedor = $1) AND p.status = ANY($2::text[])
+    ORDER BY p.agendamentoColeta DESC
+    LIMIT $3
+""")
+
+# Filtros opcionais viram "$n IS NULL OR ..." para caber num único statement.
+# Paginação por keyset em (data, idPedido): a próxima página começa depois do
+# último item da anterior, sem OFFSET (custo constante qualquer que seja a página).
+# O $6 (data do cursor) fica sem cast: o Postgres o tipa pela coluna data, então
+# um timestamp não é truncado para o dia (o teste de nulo usa o $7).
+SQL_PEDIDOS_GERAL = postgres.preparar("pedidos_geral", """
+    SELECT idPedido, data, agendamentoColeta, status, valorTotal, fkEntregador, fkRecebedor
+    FROM pedido
+    WHERE (fkEntregador = $1 OR fkRecebedor = $1)
+      AND ($2::date IS NULL OR data >= $2::date)
+      AND ($3::date IS NULL OR data <= $3::date)
+      AND ($4::numeric IS NULL OR valorTotal >= $4::numeric)
+      AND ($5::numeric IS NULL OR valorTotal <= $5::numeric)
+      AND ($7::integer IS NULL OR (data, idPedido) < ($6, $7))
+    ORDER BY data DESC, idPedido DESC
+    LIMIT $8
+""")
+
 
 # FUNÇÃO DE EXECUÇÃO AUXILIAR
 
-def execute_sql_and_return_json(sql: str) -> str:
-    """Executa consultas no PostgreSQL e retorna resultados como JSON."""
-    conn = None
+def _executar(nome: str, params: tuple, formatar=formatar_linhas) -> str:
+    """Executa a consulta preparada (conexão emprestada do pool) e retorna o resultado em JSON compacto."""
     try:
-        conn = psycopg2.connect(ENV.POSTGRES_URL)
-        cur = conn.cursor()
-        cur.execute(sql)
-        
-        colnames = [desc[0] for desc in cur.description]
-        results = [dict(zip(colnames, row)) for row in cur.fetchall()]
-        
-        cur.close()
-        # Retorna o JSON
-        return json.dumps(results, indent=2, default=str)
+        return formatar(postgres.executar_preparada(nome, params))
 
     except psycopg2.Error as e:
         return f"ERRO_DB_POSGRES: Falha ao executar consulta. Detalhes: {e}"
     except Exception as e:
         return f"ERRO_GERAL_POSGRES: {e}"
-    finally:
-        if conn:
-            conn.close()
+
+
+def _lista_status(status: str) -> list[str]:
+    return [s.strip() for s in status.split(',') if s.strip()]
+
+
+def _pagina(linhas: list[dict], cursor=None) -> str:
+    """Corta a linha extra do LIMIT e informa se há mais resultados (e o cursor da próxima página)."""
+    mais = len(linhas) > ENV.PEDIDOS_LIMITE
+    linhas = linhas[:ENV.PEDIDOS_LIMITE]
+    extras = {"mais_resultados": mais}
+    if cursor is not None:
+        extras["proximo_cursor"] = cursor(linhas[-1]) if mais else None
+    return formatar_linhas(linhas, extras)
+
+
+def _cursor_geral(linha: dict) -> str:
+    # isoformat mantém hora, microssegundos e fuso quando a coluna os tiver
+    data = linha["data"]
+    return f"{data.isoformat() if hasattr(data, 'isoformat') else data}|{linha['idpedido']}"
+
+
+def _ler_cursor_geral(cursor: str | None) -> tuple[str | None, int | None]:
+    """"data|idPedido" (vindo do LLM) → (data, id). ValueError se o cursor não tiver esse formato."""
+    if not cursor:
+        return None, None
+    partes = cursor.split("|")
+    if len(partes) != 2:
+        raise ValueError(f"esperado 'data|idPedido', recebido {cursor!r}")
+    cursor_data, cursor_id = partes
+    datetime.fromisoformat(cursor_data.strip())
+    return cursor_data.strip(), int(cursor_id)
+
+def participantes_pedido(pedido_id: int) -> list[str]:
+    """Vendedor e comprador de um pedido (usado para invalidar o cache das tools)."""
+    linhas = postgres.executar_preparada(SQL_PARTICIPANTES_PEDIDO, (pedido_id,))
+    return [u for linha in linhas for u in (linha["fkentregador"], linha["fkrecebedor"]) if u]
 
 # --- TOOLS ---
 
 @tool
+@medir_ferramenta
+@cache_por_usuario(ttl=60)
 def consultar_pedidos_usuario(user_id: str, status: str = 'aprovado,pendente') -> str:
     """
     Busca a lista de pedidos ATIVOS onde o usuário é o VENDEDOR (fkEntregador), filtrando por status.
     Args:
         user_id: O ID de identificação do usuário (fkEntregador/CNPJ). OBRIGATÓRIO.
         status: Status dos pedidos ('pendente', 'aprovado', 'concluído', 'cancelado'). Separe por vírgulas.
-    Retorna: Um JSON com os dados dos pedidos (idPedido, status, agendamentoColeta, valorTotal).
+    Retorna: Um JSON com os pedidos mais recentes (idPedido, status, agendamentoColeta, valorTotal)
+    e `mais_resultados` indicando se existem outros além dos listados.
     """
-    safe_status = ','.join([f"'{s.strip()}'" for s in status.split(',') if s.strip()])
-
-    sql = f"""
-    SELECT idPedido, agendamentoColeta, status, valorTotal
-    FROM pedido
-    WHERE fkEntregador = '{user_id}' AND status IN ({safe_status})
-    ORDER BY agendamentoColeta DESC;
-    """
-    return execute_sql_and_return_json(sql)
+    return _executar(SQL_PEDIDOS_VENDEDOR, (user_id, _lista_status(status), ENV.PEDIDOS_LIMITE + 1), _pagina)
 
 @tool
+@medir_ferramenta
+@cache_por_usuario(ttl=60)
 def obter_pedido_mais_antigo(user_id: str) -> str:
     """
     Retorna o ID, data e valor do pedido mais antigo com status 'pendente' ou 'aprovado' para o VENDEDOR (user_id).
@@ -58,16 +168,11 @@ def obter_pedido_mais_antigo(user_id: str) -> str:
         user_id: O ID de identificação do usuário (fkEntregador/CNPJ). OBRIGATÓRIO.
     Retorna: Um JSON com o ID, data e valor do pedido.
     """
-    sql = f"""
-    SELECT idPedido, data, valorTotal
-    FROM pedido
-    WHERE fkEntregador = '{user_id}' AND status IN ('pendente', 'aprovado')
-    ORDER BY data ASC
-    LIMIT 1;
-    """
-    return execute_sql_and_return_json(sql)
+    return _executar(SQL_PEDIDO_MAIS_ANTIGO, (user_id,))
 
 @tool
+@medir_ferramenta
+@cache_por_usuario(ttl=120)
 def consultar_transporte_pedido(pedido_id: int, user_id: str) -> str:
     """
     Consulta o transportador e a data de retirada de um pedido específico, validando a posse do VENDEDOR.
@@ -76,38 +181,29 @@ def consultar_transporte_pedido(pedido_id: int, user_id: str) -> str:
         user_id: O ID do usuário para validação de posse (fkEntregador/CNPJ). OBRIGATÓRIO.
     Retorna: Um JSON com os detalhes do transporte.
     """
-    sql = f"""
-    SELECT t.transportadora, t.dataRetirada
-    FROM transporte t
-    INNER JOIN pedido p ON t.fkPedido = p.idPedido
-    WHERE t.fkPedido = {pedido_id} AND p.fkEntregador = '{user_id}';
-    """
-    return execute_sql_and_return_json(sql)
+    return _executar(SQL_TRANSPORTE_PEDIDO, (pedido_id, user_id))
 
 @tool
+@medir_ferramenta
+@cache_por_usuario(ttl=60)
 def consultar_pedidos_comprados(user_id: str, status: str = 'aprovado,pendente') -> str:
     """
     Busca a lista de pedidos ATIVOS onde o usuário é o COMPRADOR (fkRecebedor), filtrando por status.
     Args:
         user_id: O ID de identificação do usuário (fkRecebedor/CNPJ). OBRIGATÓRIO.
         status: Status dos pedidos ('pendente', 'aprovado', 'concluído', 'cancelado'). Separe por vírgulas.
-    Retorna: Um JSON com os dados dos pedidos comprados.
+    Retorna: Um JSON com os pedidos comprados mais recentes e `mais_resultados`.
     """
-    safe_status = ','.join([f"'{s.strip()}'" for s in status.split(',') if s.strip()])
-
-    sql = f"""
-    SELECT idPedido, agendamentoColeta, status, valorTotal, fkEntregador as Vendedor
-    FROM pedido
-    WHERE fkRecebedor = '{user_id}' AND status IN ({safe_status})  -- <<< CORREÇÃO AQUI (fkComprador -> fkRecebedor)
-    ORDER BY agendamentoColeta DESC;
-    """
-    return execute_sql_and_return_json(sql)
+    return _executar(SQL_PEDIDOS_COMPRADOR, (user_id, _lista_status(status), ENV.PEDIDOS_LIMITE + 1), _pagina)
 
 @tool
-def consultar_pedidos_geral(user_id: str, min_data: str = None, max_data: str = None, min_valor: float = None, max_valor: float = None) -> str:
+@medir_ferramenta
+@cache_por_usuario(ttl=60)
+def consultar_pedidos_geral(user_id: str, min_data: str = None, max_data: str = None, min_valor: float = None,
+                            max_valor: float = None, cursor: str = None) -> str:
     """
-    Consulta todos os pedidos do usuário (VENDEDOR ou COMPRADOR), permitindo filtragem opcional por
-    intervalo de DATA (formato YYYY-MM-DD) e/ou VALOR.
+    Consulta os pedidos do usuário (VENDEDOR ou COMPRADOR), do mais recente para o mais antigo, permitindo
+    filtragem opcional por intervalo de DATA (formato YYYY-MM-DD) e/ou VALOR.
     
     Args:
         user_id: O ID de identificação do usuário (CNPJ). OBRIGATÓRIO.
@@ -115,32 +211,32 @@ def consultar_pedidos_geral(user_id: str, min_data: str = None, max_data: str =
         max_data: Data máxima da compra (ex: '2024-12-31'). Não obrigatório.
         min_valor: Valor mínimo para o pedido. Não obrigatório.
         max_valor: Valor máximo para o pedido. Não obrigatório.
-    Retorna: Um JSON com os pedidos que correspondem aos critérios.
+        cursor: Para ver a página seguinte, o `proximo_cursor` retornado pela chamada anterior. Não obrigatório.
+    Retorna: Um JSON com uma página de pedidos (colunas/linhas), `mais_resultados` e `proximo_cursor`.
     """
-    
-    # 1. Cláusula WHERE base: ser Vendedor OU Recebedor (Comprador)
-    where_clause = f"WHERE fkEntregador = '{user_id}' OR fkRecebedor = '{user_id}'"  # <<< CORREÇÃO AQUI (fkComprador -> fkRecebedor)
-    
-    # 2. Adiciona filtros opcionais de DATA
-    if min_data:
-        where_clause += f" AND data >= '{min_data}'"
-    if max_data:
-        where_clause += f" AND data <= '{max_data}'"
-
-    # 3. Adiciona filtros opcionais de VALOR
-    if min_valor is not None:
-        where_clause += f" AND valorTotal >= {min_valor}"
-    if max_valor is not None:
-        where_clause += f" AND valorTotal <= {max_valor}"
-
-    # 4. Constrói o SQL completo
-    sql = f"""
-    SELECT idPedido, data, agendamentoColeta, status, valorTotal, fkEntregador, fkRecebedor  -- <<< CORREÇÃO AQUI (fkComprador -> fkRecebedor)
-    FROM pedido
-    {where_clause}
-    ORDER BY data DESC;
+    try:
+        cursor_data, cursor_id = _ler_cursor_geral(cursor)
+    except ValueError as e:
+        return f"ERRO_CURSOR_INVALIDO: Use exatamente o `proximo_cursor` da chamada anterior. Detalhes: {e}"
+    params = (user_id, min_data, max_data, min_valor, max_valor, cursor_data, cursor_id, ENV.PEDIDOS_LIMITE + 1)
+    return _executar(SQL_PEDIDOS_GERAL, params, lambda linhas: _pagina(linhas, _cursor_geral))
+
+@tool
+@medir_ferramenta
+@cache_por_usuario(ttl=60)
+def consultar_pedidos_com_residuos(user_id: str, status: str = 'aprovado,pendente') -> str:
+    """
+    Busca os pedidos do usuário (como VENDEDOR ou COMPRADOR) JÁ COM os resíduos e o transporte de cada um,
+    em uma única chamada. Prefira esta tool sempre que a pergunta envolver resíduos ou transporte de
+    mais de um pedido, em vez de chamar obter_residuos_de_pedido / consultar_transporte_pedido para cada pedido.
+    Args:
+        user_id: O ID de identificação do usuário (CNPJ). OBRIGATÓRIO.
+        status: Status dos pedidos ('pendente', 'aprovado', 'concluído', 'cancelado'). Separe por vírgulas.
+    Retorna: Um JSON (colunas/linhas) com idPedido, agendamentoColeta, status, valorTotal, papel do usuário,
+    `residuos` (lista de {residuo, quantidade, peso, unidade}), `transporte` (lista de {transportadora,
+    dataRetirada} ou null) e `mais_resultados`.
     """
-    return execute_sql_and_return_json(sql)
+    return _executar(SQL_PEDIDOS_DETALHADOS, (user_id, _lista_status(status), ENV.PEDIDOS_LIMITE + 1), _pagina)
 
 
 PEDIDOS_TOOLS = [
@@ -148,5 +244,6 @@ PEDIDOS_TOOLS = [
     obter_pedido_mais_antigo, 
     consultar_transporte_pedido,
     consultar_pedidos_comprados, 
-    consultar_pedidos_geral
+    consultar_pedidos_geral,
+    consultar_pedidos_com_residuos
 ]
\ No newline at end of file
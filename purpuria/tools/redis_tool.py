@@ -1,76 +1,113 @@
 # redis_tool.py
-import redis
-import json
-import numpy as np
+import asyncio
 from langchain_core.tools import Tool
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from purpuria.indice_vetorial import IndiceVetorial
+from purpuria.indice_ann import criar_backend_ann
+from purpuria import base_conhecimento
+from purpuria.cache_embeddings import embeddings_model
+from purpuria.serializacao import formatar_textos
+from purpuria.medicao import medir_ferramenta
 from common.env import ENV
 
-# Conexão com Redis
-redis_client = redis.Redis.from_url(
-    ENV.REDIS_URL,
-    decode_responses=True
-)
-
-# redis_client = redis.Redis(
-#     host="localhost",
-#     port=6379,
-#     db=0,
-#     decode_responses=True
-# )
-
-# Modelo de embeddings Google
-embeddings_model = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004",
-    google_api_key=ENV.GEMINI_API_KEY
-)
-
-def cosine_similarity(vec1, vec2):
-    """Calcula similaridade de cosseno entre dois vetores."""
-    vec1 = np.array(vec1)
-    vec2 = np.array(vec2)
-    return float(np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2)))
+# Índice vetorial em memória, sincronizado com a base de conhecimento no Redis.
+# Com ANN_BACKEND=ivf|hnsw, bases com ANN_MIN_DOCUMENTOS ou mais usam busca aproximada.
+indice = IndiceVetorial(ann=criar_backend_ann(), min_documentos_ann=ENV.ANN_MIN_DOCUMENTOS)
+
+
+def _inicio_carga(epoca: str, total: int) -> int:
+    """Posição a partir da qual carregar: incremental na mesma época se a base só cresceu, senão 0."""
+    if indice.versao is not None and indice.versao[0] == epoca and total >= indice.carregados:
+        return indice.carregados
+    return 0
+
+
+def _aplicar_carga(versao: tuple, inicio: int, ids: list, textos: list, vetores: list,
+                   snapshot_ann: bytes | None = None):
+    """Atualiza o índice com os documentos lidos a partir de `inicio`."""
+    if inicio == 0:
+        indice.substituir(len(ids), vetores, textos, versao, snapshot_ann)
+    else:
+        indice.acrescentar(inicio, len(ids), vetores, textos, versao)
+
+
+def _snapshot_para_salvar() -> bytes | None:
+    """Exporta o ANN recém-construído (uma vez por construção)."""
+    if indice.ann is None or not indice.ann_snapshot_pendente:
+        return None
+    indice.ann_snapshot_pendente = False
+    return indice.ann.exportar()
+
+
+def sincronizar_indice():
+    """Lê apenas os documentos novos, e só quando a (época, quantidade) no Redis muda."""
+    epoca, total = base_conhecimento.estado()
+    if (epoca, total) == indice.versao:
+        return
+
+    inicio = _inicio_carga(epoca, total)
+    ids, textos, vetores = base_conhecimento.ler_documentos(inicio)
+    snapshot = None
+    if inicio == 0 and indice.ann is not None:
+        snapshot = base_conhecimento.ler_snapshot_ann(indice.ann.nome, epoca)
+    _aplicar_carga((epoca, inicio + len(ids)), inicio, ids, textos, vetores, snapshot)
+
+    novo_snapshot = _snapshot_para_salvar()
+    if novo_snapshot is not None:
+        base_conhecimento.salvar_snapshot_ann(indice.ann.nome, epoca, novo_snapshot)
+
+
+async def asincronizar_indice():
+    """Versão assíncrona de sincronizar_indice (a montagem do índice roda fora do event loop)."""
+    epoca, total = await base_conhecimento.aestado()
+    if (epoca, total) == indice.versao:
+        return
+
+    inicio = _inicio_carga(epoca, total)
+    ids, textos, vetores = await base_conhecimento.aler_documentos(inicio)
+    snapshot = None
+    if inicio == 0 and indice.ann is not None:
+        snapshot = await base_conhecimento.aler_snapshot_ann(indice.ann.nome, epoca)
+    await asyncio.to_thread(_aplicar_carga, (epoca, inicio + len(ids)), inicio, ids, textos, vetores, snapshot)
+
+    novo_snapshot = await asyncio.to_thread(_snapshot_para_salvar)
+    if novo_snapshot is not None:
+        await base_conhecimento.asalvar_snapshot_ann(indice.ann.nome, epoca, novo_snapshot)
+
+
+def _formatar_resultados(consulta_emb) -> list[str]:
+    if not len(indice):
+        return ["Nenhuma informação cadastrada no Redis."]
+
+    # Top-3 por similaridade de cosseno (um único produto matriz-vetor)
+    mensagens = [texto for _, texto in indice.buscar(consulta_emb, k=3)]
+    return mensagens or ["Nenhuma informação relevante encontrada."]
+
 
 def buscar_no_redis(consulta):
     """
     Busca as 3 informações mais próximas no Redis com base no embedding da consulta.
-    Estrutura esperada:
-      - info0, info1, ... → strings com os textos
-      - embeddings_list → lista JSON com todos os embeddings (na mesma ordem)
+    Os documentos (ver purpuria/base_conhecimento.py) ficam em um índice em
+    memória, atualizado de forma incremental quando a base no Redis cresce.
     """
-    # Gera embedding da consulta
+    # Gera embedding da consulta (via cache: consultas repetidas não chamam a API)
     consulta_emb = embeddings_model.embed_query(consulta)
 
-    # Recupera lista de embeddings
-    embeddings_json = redis_client.get("embeddings_list")
-    if not embeddings_json:
-        return ["Nenhum embedding armazenado no Redis."]
-
-    embeddings_list = json.loads(embeddings_json)
-
-    # Recupera todas as chaves infoX
-    chaves = sorted(redis_client.keys("info*"), key=lambda c: int(c.replace("info", "")))
-    if not chaves:
-        return ["Nenhuma informação cadastrada no Redis."]
-
-    resultados = []
-    for idx, chave in enumerate(chaves):
-        texto = redis_client.get(chave)
-        if texto and idx < len(embeddings_list):
-            score = cosine_similarity(consulta_emb, embeddings_list[idx])
-            resultados.append((score, texto))
+    sincronizar_indice()
+    return formatar_textos(_formatar_resultados(consulta_emb))
 
-    # Ordena por maior similaridade e retorna as 3 mais próximas
-    resultados = sorted(resultados, key=lambda x: x[0], reverse=True)[:3]
+async def abuscar_no_redis(consulta):
+    """Versão assíncrona de buscar_no_redis (usada pelo AgentExecutor.ainvoke)."""
+    consulta_emb = await embeddings_model.aembed_query(consulta)
 
-    mensagens = [msg for _, msg in resultados]
-    return mensagens or ["Nenhuma informação relevante encontrada."]
+    await asincronizar_indice()
+    return formatar_textos(_formatar_resultados(consulta_emb))
 
 # TOOL no formato correto (lista de instâncias de Tool)
 TOOLS = [
     Tool(
         name="buscar_no_redis",
-        func=buscar_no_redis,
+        func=medir_ferramenta(buscar_no_redis),
+        coroutine=medir_ferramenta(abuscar_no_redis, nome="buscar_no_redis"),
         description=(
             "Busca as 3 informações mais relevantes no Redis com base na pergunta do usuário. "
             "Use quando a dúvida for sobre dados, informações ou conteúdos armazenados."
@@ -1,13 +1,27 @@
 import json
-from langchain.tools import tool
-from pymongo import MongoClient
+from langchain_core.tools import tool
 import psycopg2
-from common.env import ENV
+from common import postgres
+from purpuria import catalogo_residuos
+from purpuria.serializacao import formatar_linhas, formatar_resultado
+from purpuria.medicao import medir_ferramenta
+from purpuria.tools.cache_tools import cache_por_usuario
+from purpuria.tools.pedidos_tool import consultar_pedidos_com_residuos
+
+
+# Só devolve os resíduos se o usuário for o vendedor ou o comprador do pedido
+SQL_RESIDUOS_PEDIDO = postgres.preparar("residuos_pedido", """
+    SELECT rp.fkResiduo, rp.quantidadeResiduo, rp.pesoComprado, rp.tipoUnidade
+    FROM residuoPedido rp
+    INNER JOIN pedido p ON rp.fkPedido = p.idPedido
+    WHERE rp.fkPedido = $1 AND (p.fkEntregador = $2 OR p.fkRecebedor = $2)
+""")
 
 
 # TOOLS PARA O AGENTE RESÍDUOS
 
 @tool
+@medir_ferramenta
 def consultar_catalogo_residuos(user_id: str) -> str:
     """
     Retorna o catálogo completo de resíduos disponíveis para a empresa (user_id) no MongoDB.
@@ -16,66 +30,40 @@ def consultar_catalogo_residuos(user_id: str) -> str:
         user_id: O ID de autenticação do usuário, que corresponde ao campo '_id' no Mongo. OBRIGATÓRIO.
     Retorna: Um JSON com a lista de resíduos da empresa.
     """
-    client = None
     try:
-        # 1. Conexão e Seleção de Coleção
-        client = MongoClient(ENV.MONGO_URL)
-        db = client['purpura'] 
-        collection = db['empresas']
-
-        # 2. Consulta: Filtra por _id
-        empresa = collection.find_one(
-            {"_id": user_id},
-            {"nome": 1, "residuos": 1, "_id": 0} # Projeta apenas os campos necessários
-        )
+        # Cliente Mongo compartilhado + cache por empresa (TTL / change stream)
+        empresa = catalogo_residuos.obter_empresa(user_id)
         
         if empresa:
-            # 3. Retorna apenas a lista de 'residuos'
-            return json.dumps(empresa.get('residuos', []), indent=2, default=str)
+            # Retorna apenas a lista de 'residuos'
+            return formatar_resultado(empresa.get('residuos', []))
         else:
             return json.dumps({"erro": f"Nenhuma empresa encontrada para o ID: {user_id}"})
 
     except Exception as e:
         return f"ERRO_DB_MONGO: Falha ao consultar o MongoDB. Detalhes: {e}"
-    finally:
-        if client:
-            client.close()
 
 @tool
-def obter_residuos_de_pedido(pedido_id: str) -> str:
+@medir_ferramenta
+@cache_por_usuario(ttl=300)
+def obter_residuos_de_pedido(pedido_id: str, user_id: str) -> str:
     """
-    Consulta os detalhes (fkResiduo, quantidade, peso, unidade) dos resíduos de um pedido específico na tabela residuoPedido (PostgreSQL).
+    Consulta os detalhes (fkResiduo, quantidade, peso, unidade) dos resíduos de um pedido específico na tabela residuoPedido (PostgreSQL),
+    validando que o usuário é o vendedor ou o comprador do pedido.
     
     Args:
         pedido_id: O ID do pedido (fkPedido) do qual buscar os resíduos. OBRIGATÓRIO.
-    Retorna: Um JSON com os resíduos daquele pedido.
+        user_id: O ID do usuário para validação de posse (CNPJ). OBRIGATÓRIO.
+    Retorna: Um JSON com os resíduos daquele pedido (vazio se o pedido não for do usuário).
     """
-    sql = f"""
-    SELECT rp.fkResiduo, rp.quantidadeResiduo, rp.pesoComprado, rp.tipoUnidade
-    FROM residuoPedido rp
-    WHERE rp.fkPedido = {pedido_id};
-    """
-    
-    conn = None
     try:
-        # 1. Conexão
-        conn = psycopg2.connect(ENV.POSTGRES_URL)
-        cur = conn.cursor()
-        cur.execute(sql)
-        
-        # 2. Formatação dos resultados
-        colnames = [desc[0] for desc in cur.description]
-        results = [dict(zip(colnames, row)) for row in cur.fetchall()]
-        
-        cur.close()
-        return json.dumps(results, indent=2, default=str)
+        # Conexão emprestada do pool compartilhado (prepared statement)
+        results = postgres.executar_preparada(SQL_RESIDUOS_PEDIDO, (pedido_id, user_id))
+        return formatar_linhas(results)
 
     except psycopg2.Error as e:
         return f"ERRO_DB_POSGRES: Falha ao executar consulta. Detalhes: {e}"
     except Exception as e:
         return f"ERRO_GERAL_POSGRES: {e}"
-    finally:
-        if conn:
-            conn.close()
 
-RESIDUOS_TOOLS = [consultar_catalogo_residuos, obter_residuos_de_pedido]
\ No newline at end of file
+RESIDUOS_TOOLS = [consultar_catalogo_residuos, obter_residuos_de_pedido, consultar_pedidos_com_residuos]
\ No newline at end of file
@@ -0,0 +1,320 @@
+"""
+Ambiente offline para exercitar o fluxo real sem serviços externos.
+
+Substitui só as bordas do processo; roteador, especialistas (AgentExecutor e
+tools), juiz, caches e histórico rodam como em produção:
+
+  - LLMs ("llm", "llm_fast"): ChatFalso, com latência configurável e saídas
+    roteirizadas pelo prompt de sistema de cada etapa (ROUTE=..., chamada de
+    tool, JSON do especialista, eco do juiz, resumo).
+  - Embeddings ("embeddings_google"): vetores determinísticos por texto.
+  - Redis: fakeredis (um FakeServer compartilhado pelos quatro clientes).
+  - MongoDB: mongomock, com a coleção empresas populada.
+  - PostgreSQL: SQLite em memória no lugar de postgres.executar_preparada. As
+    consultas registradas em preparar() são traduzidas ($n → ?n, sem casts
+    ::tipo, = ANY($n) → IN json_each); a de LATERAL tem versão própria.
+
+Uso: `instalar(...)` depois de importar main e antes da primeira requisição
+(os componentes ainda não podem ter sido construídos). Requer fakeredis e
+mongomock (pip install fakeredis mongomock).
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from common import componentes, mongo, postgres
+from purpuria import base_conhecimento
+
+DADOS = Path(__file__).parent / "dados"
+DIMENSAO_EMBEDDING = 768
+
+# Rota de cada pergunta do conjunto de avaliação (o roteador falso responde com ela)
+ROTAS_CONHECIDAS = {
+    linha["pergunta"]: linha["rota"]
+    for linha in map(json.loads, (DADOS / "roteador_avaliacao.jsonl").read_text(encoding="utf-8").splitlines())
+}
+PALAVRAS_ROTA = {
+    "pedidos": ("pedido", "compra", "venda", "entrega", "transport", "coleta"),
+    "residuos": ("resíduo", "residuo", "plástico", "metal", "papel", "vidro", "catálogo"),
+}
+FERRAMENTA_POR_ROTA = {
+    "pedidos": "consultar_pedidos_usuario",
+    "residuos": "consultar_pedidos_com_residuos",
+    "duvidas_app": "buscar_no_redis",
+}
+
+_aleatorio = random.Random(42)
+_aleatorio_lock = threading.Lock()
+
+
+def _latencia(media_ms: float, variacao: float) -> float:
+    """Atraso em segundos: media_ms ± variacao (fração), uniforme."""
+    if media_ms <= 0:
+        return 0.0
+    with _aleatorio_lock:
+        fator = _aleatorio.uniform(1 - variacao, 1 + variacao)
+    return media_ms * fator / 1000
+
+
+def _rota_falsa(pergunta: str) -> str:
+    if pergunta in ROTAS_CONHECIDAS:
+        return ROTAS_CONHECIDAS[pergunta]
+    texto = pergunta.lower()
+    for rota, palavras in PALAVRAS_ROTA.items():
+        if any(p in texto for p in palavras):
+            return rota
+    return "duvidas_app"
+
+
+# --- LLM ---
+
+class ChatFalso(BaseChatModel):
+    """Chat model roteirizado: responde conforme a etapa identificada no prompt de sistema."""
+
+    latencia_ms: float = 0.0
+    variacao: float = 0.2
+
+    @property
+    def _llm_type(self) -> str:
+        return "chat-falso"
+
+    def bind_tools(self, tools, **kwargs):
+        # As chamadas de tool são roteirizadas em _responder
+        return self
+
+    def _responder(self, mensagens: list) -> AIMessage:
+        sistema = mensagens[0].content if mensagens and isinstance(mensagens[0], SystemMessage) else ""
+        humanas = [i for i, m in enumerate(mensagens) if isinstance(m, HumanMessage)]
+        entrada = mensagens[humanas[-1]].content if humanas else ""
+
+        if "Roteador do PurPurIA" in sistema:
+            rota = _rota_falsa(entrada)
+            if rota == "fora_escopo":
+                return AIMessage(content="Consigo ajudar apenas com questões da Purpura.")
+            return AIMessage(content=f"ROUTE={rota}\nPERGUNTA_ORIGINAL={entrada}\nCLARIFY=")
+
+        if "Agente Especialista" in sistema:
+            rota = re.search(r"ROUTE=(\w+)", entrada).group(1)
+            usuario = re.search(r"USER_ID=(\S+)", entrada).group(1)
+            pergunta = re.search(r"PERGUNTA_ORIGINAL=(.*)", entrada).group(1)
+            # Já houve chamada de tool depois da entrada: devolve o JSON final
+            if any(isinstance(m, ToolMessage) for m in mensagens[humanas[-1]:]):
+                return AIMessage(content=json.dumps({
+                    "dominio": rota,
+                    "resposta": f"Encontrei as informações sobre: {pergunta}",
+                    "recomendacao": "Posso ajudar com mais alguma coisa?",
+                }, ensure_ascii=False))
+            ferramenta = FERRAMENTA_POR_ROTA[rota]
+            argumentos = {"__arg1": pergunta} if ferramenta == "buscar_no_redis" else {"user_id": usuario}
+            return AIMessage(content="", tool_calls=[{"name": ferramenta, "args": argumentos, "id": "chamada_1"}])
+
+        if "Agente Juiz" in sistema:
+            return AIMessage(content=entrada.split("RESPOSTA_FINAL:", 1)[-1].strip())
+
+        if "Agente Orquestrador" in sistema:
+            dados = json.loads(entrada.split("ESPECIALISTA_JSON:", 1)[-1])
+            return AIMessage(content=dados.get("resposta", ""))
+
+        if "resumo de uma conversa" in sistema:
+            return AIMessage(content="Usuário consultou pedidos e resíduos.")
+        return AIMessage(content="ok")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(_latencia(self.latencia_ms, self.variacao))
+        return ChatResult(generations=[ChatGeneration(message=self._responder(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(_latencia(self.latencia_ms, self.variacao))
+        return ChatResult(generations=[ChatGeneration(message=self._responder(messages))])
+
+
+# --- Embeddings ---
+
+class EmbeddingsFalsos:
+    """Vetor unitário determinístico por texto (mesmo texto → mesmo vetor)."""
+
+    def __init__(self, latencia_ms: float = 0.0, variacao: float = 0.2):
+        self.latencia_ms = latencia_ms
+        self.variacao = variacao
+
+    @staticmethod
+    def _vetor(texto: str) -> list[float]:
+        semente = int.from_bytes(hashlib.sha256(texto.strip().lower().encode()).digest()[:8], "little")
+        vetor = np.random.default_rng(semente).standard_normal(DIMENSAO_EMBEDDING)
+        return (vetor / np.linalg.norm(vetor)).tolist()
+
+    def embed_query(self, texto: str) -> list[float]:
+        time.sleep(_latencia(self.latencia_ms, self.variacao))
+        return self._vetor(texto)
+
+    def embed_documents(self, textos: list[str]) -> list[list[float]]:
+        time.sleep(_latencia(self.latencia_ms, self.variacao))
+        return [self._vetor(t) for t in textos]
+
+    async def aembed_query(self, texto: str) -> list[float]:
+        await asyncio.sleep(_latencia(self.latencia_ms, self.variacao))
+        return self._vetor(texto)
+
+    async def aembed_documents(self, textos: list[str]) -> list[list[float]]:
+        await asyncio.sleep(_latencia(self.latencia_ms, self.variacao))
+        return [self._vetor(t) for t in textos]
+
+
+# --- PostgreSQL (SQLite) ---
+
+ESQUEMA_SQLITE = """
+CREATE TABLE pedido (
+    idPedido INTEGER PRIMARY KEY, data TEXT, agendamentoColeta TEXT, status TEXT,
+    valorTotal REAL, fkEntregador TEXT, fkRecebedor TEXT
+);
+CREATE TABLE residuoPedido (
+    fkPedido INTEGER, fkResiduo TEXT, quantidadeResiduo INTEGER, pesoComprado REAL, tipoUnidade TEXT
+);
+CREATE TABLE transporte (fkPedido INTEGER, transportadora TEXT, dataRetirada TEXT);
+CREATE INDEX pedido_entregador ON pedido (fkEntregador, status, agendamentoColeta);
+CREATE INDEX pedido_recebedor ON pedido (fkRecebedor, status, agendamentoColeta);
+CREATE INDEX residuo_pedido ON residuoPedido (fkPedido);
+CREATE INDEX transporte_pedido ON transporte (fkPedido);
+"""
+
+# SQLite não tem LATERAL: as subconsultas correlacionadas fazem a mesma agregação
+SQL_SQLITE = {
+    "pedidos_detalhados": """
+        SELECT p.idPedido, p.agendamentoColeta, p.status, p.valorTotal,
+               CASE WHEN p.fkEntregador = ?1 THEN 'vendedor' ELSE 'comprador' END AS papel,
+               (SELECT json_group_array(json_object(
+                           'residuo', rp.fkResiduo, 'quantidade', rp.quantidadeResiduo,
+                           'peso', rp.pesoComprado, 'unidade', rp.tipoUnidade))
+                FROM residuoPedido rp WHERE rp.fkPedido = p.idPedido) AS residuos,
+               (SELECT CASE WHEN COUNT(*) THEN json_group_array(json_object(
+                           'transportadora', tr.transportadora, 'dataRetirada', tr.dataRetirada)) END
+                FROM transporte tr WHERE tr.fkPedido = p.idPedido) AS transporte
+        FROM pedido p
+        WHERE (p.fkEntregador = ?1 OR p.fkRecebedor = ?1) AND p.status IN (SELECT value FROM json_each(?2))
+        ORDER BY p.agendamentoColeta DESC
+        LIMIT ?3
+    """,
+}
+COLUNAS_JSON = {"residuos", "transporte"}
+
+
+def traduzir_sql(sql: str) -> str:
+    """SQL de preparar() (Postgres) → SQLite, para as construções usadas pelas tools."""
+    sql = re.sub(r"=\s*ANY\(\$(\d+)::text\[\]\)", r"IN (SELECT value FROM json_each(?\1))", sql)
+    sql = re.sub(r"::\w+(\[\])?", "", sql)
+    return re.sub(r"\$(\d+)", r"?\1", sql)
+
+
+class PostgresSQLite:
+    """Executa as consultas preparadas num SQLite em memória, com latência de rede simulada."""
+
+    def __init__(self, latencia_ms: float = 0.0, variacao: float = 0.2):
+        self.latencia_ms = latencia_ms
+        self.variacao = variacao
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.conn.executescript(ESQUEMA_SQLITE)
+        self.lock = threading.Lock()
+        self.consultas = {nome: SQL_SQLITE.get(nome) or traduzir_sql(sql) for nome, sql in postgres._consultas.items()}
+
+    def popular(self, usuarios: list[str], pedidos_por_usuario: int, semente: int = 42):
+        gerador = random.Random(semente)
+        residuos = ["plastico", "metal", "papel", "vidro", "oleo"]
+        transportadoras = ["Rota Verde", "EcoLog", "Recicla Já"]
+        pedido_id = 0
+        with self.lock:
+            for usuario in usuarios:
+                for _ in range(pedidos_por_usuario):
+                    pedido_id += 1
+                    dia = f"2025-{gerador.randint(1, 12):02d}-{gerador.randint(1, 28):02d}"
+                    self.conn.execute(
+                        "INSERT INTO pedido VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (pedido_id, dia, f"{dia} {gerador.randint(8, 18):02d}:00",
+                         gerador.choice(["pendente", "aprovado", "concluido", "cancelado"]),
+                         round(gerador.uniform(50, 5000), 2), usuario, gerador.choice(usuarios)),
+                    )
+                    for residuo in gerador.sample(residuos, gerador.randint(1, 3)):
+                        self.conn.execute(
+                            "INSERT INTO residuoPedido VALUES (?, ?, ?, ?, ?)",
+                            (pedido_id, residuo, gerador.randint(1, 50), round(gerador.uniform(1, 500), 1), "kg"),
+                        )
+                    if gerador.random() < 0.6:
+                        self.conn.execute(
+                            "INSERT INTO transporte VALUES (?, ?, ?)",
+                            (pedido_id, gerador.choice(transportadoras), dia),
+                        )
+            self.conn.commit()
+
+    def executar_preparada(self, nome: str, params: tuple = ()) -> list[dict]:
+        time.sleep(_latencia(self.latencia_ms, self.variacao))
+        params = [json.dumps(p) if isinstance(p, list) else p for p in params]
+        with self.lock:
+            cursor = self.conn.execute(self.consultas[nome], params)
+            # RealDictCursor devolve as colunas em minúsculas (identificadores sem aspas)
+            colunas = [c[0].lower() for c in cursor.description]
+            linhas = [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+        for linha in linhas:
+            for coluna in COLUNAS_JSON & linha.keys():
+                if isinstance(linha[coluna], str):
+                    linha[coluna] = json.loads(linha[coluna])
+        return linhas
+
+
+# --- Instalação ---
+
+DOCUMENTOS_BASE = [
+    "A Purpura é uma plataforma que conecta empresas geradoras de resíduos a compradores e recicladores.",
+    "Para cadastrar um resíduo, acesse o catálogo da empresa e informe tipo, quantidade e unidade.",
+    "A coleta é agendada pelo vendedor e o transporte pode ser feito por transportadora parceira.",
+    "Pedidos pendentes aguardam aprovação do comprador; pedidos aprovados seguem para a coleta.",
+    "O pagamento é liberado ao vendedor depois que o comprador confirma o recebimento.",
+    "O suporte da Purpura atende de segunda a sexta, das 8h às 18h, pelo chat do aplicativo.",
+    "Resíduos de plástico, metal, papel, vidro e óleo podem ser negociados na plataforma.",
+    "Para alterar os dados da empresa, acesse Perfil > Dados cadastrais no aplicativo.",
+]
+
+
+def instalar(usuarios: list[str], pedidos_por_usuario: int = 30, latencia_llm_ms: float = 0.0,
+             latencia_embedding_ms: float = 0.0, latencia_db_ms: float = 0.0, variacao: float = 0.2) -> dict:
+    """Troca LLMs, embeddings, Redis, Mongo e Postgres pelos falsos e popula os dados de teste."""
+    import fakeredis
+    import mongomock
+
+    for nome in ("redis", "redis_async", "redis_bin", "redis_bin_async", "llm", "llm_fast", "embeddings_google"):
+        if componentes.inicializado(nome):
+            raise RuntimeError(f"Componente {nome} já construído: instale o ambiente offline antes do primeiro uso")
+
+    servidor = fakeredis.FakeServer()
+    componentes.registrar("redis")(lambda: fakeredis.FakeRedis(server=servidor, decode_responses=True))
+    componentes.registrar("redis_async")(lambda: fakeredis.FakeAsyncRedis(server=servidor, decode_responses=True))
+    componentes.registrar("redis_bin")(lambda: fakeredis.FakeRedis(server=servidor))
+    componentes.registrar("redis_bin_async")(lambda: fakeredis.FakeAsyncRedis(server=servidor))
+
+    componentes.registrar("llm")(lambda: ChatFalso(latencia_ms=latencia_llm_ms, variacao=variacao))
+    componentes.registrar("llm_fast")(lambda: ChatFalso(latencia_ms=latencia_llm_ms, variacao=variacao))
+    componentes.registrar("embeddings_google")(lambda: EmbeddingsFalsos(latencia_embedding_ms, variacao))
+
+    banco = PostgresSQLite(latencia_db_ms, variacao)
+    banco.popular(usuarios, pedidos_por_usuario)
+    postgres.executar_preparada = banco.executar_preparada
+    postgres.aquecer = lambda: None
+
+    mongo._cliente = mongomock.MongoClient()
+    mongo.colecao("empresas").insert_many([
+        {"_id": usuario, "nome": f"Empresa {usuario}",
+         "residuos": [{"tipo": r, "quantidade": 10 * (i + 1), "unidade": "kg"}
+                      for i, r in enumerate(["plastico", "metal", "papel"])]}
+        for usuario in usuarios
+    ])
+
+    base_conhecimento.salvar_documentos([(texto, EmbeddingsFalsos._vetor(texto)) for texto in DOCUMENTOS_BASE])
+    return {"pedidos": len(usuarios) * pedidos_por_usuario, "documentos": len(DOCUMENTOS_BASE)}
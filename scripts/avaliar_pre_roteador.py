@@ -0,0 +1,99 @@
+"""
+Avaliação offline do pré-roteador local.
+
+Uso (na raiz do projeto):
+    python -m scripts.avaliar_pre_roteador [--dados scripts/dados/roteador_avaliacao.jsonl] [--limiar 0.2]
+
+Cada linha do arquivo de dados é {"pergunta": ..., "rota": ...}, onde rota é
+"pedidos", "residuos", "duvidas_app" ou "fora_escopo" (perguntas que o
+pré-roteador nunca deveria encaminhar sozinho).
+
+Relata, para cada limiar:
+  - cobertura     : % das perguntas resolvidas localmente (chamadas de LLM evitadas)
+  - chamadas LLM  : % das perguntas que continuam indo ao Roteador LLM
+  - precisão      : acertos entre as perguntas resolvidas localmente
+  - fora_escopo   : perguntas fora de escopo que o pré-roteador encaminhou (deveria ser 0)
+
+Perguntas iguais a um exemplo de treino (mesmos tokens, ver
+purpuria/dados/roteador_exemplos.json) inflariam precisão e cobertura: ficam
+fora da avaliação, com um aviso.
+"""
+import argparse
+import json
+from pathlib import Path
+from purpuria.pre_roteador import _carregar_exemplos, pre_roteador, tokenizar
+
+DADOS_PADRAO = Path(__file__).parent / "dados" / "roteador_avaliacao.jsonl"
+
+
+def carregar(caminho: Path) -> list[dict]:
+    with open(caminho, encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+def _assinatura(texto: str) -> tuple[str, ...]:
+    return tuple(sorted(tokenizar(texto)))
+
+
+def separar_vistas(amostras: list[dict]) -> tuple[list[dict], list[dict]]:
+    """(amostras inéditas, amostras que repetem um exemplo de treino do pré-roteador)."""
+    treino = {_assinatura(texto) for textos in _carregar_exemplos().values() for texto in textos}
+    ineditas, vistas = [], []
+    for amostra in amostras:
+        (vistas if _assinatura(amostra["pergunta"]) in treino else ineditas).append(amostra)
+    return ineditas, vistas
+
+
+def avaliar(amostras: list[dict], limiar: float) -> dict:
+    resolvidas = acertos = fora_escopo_encaminhadas = 0
+    erros = []
+    for amostra in amostras:
+        dominio, confianca = pre_roteador.classificar(amostra["pergunta"])
+        if confianca < limiar:
+            continue
+        resolvidas += 1
+        if dominio == amostra["rota"]:
+            acertos += 1
+        else:
+            if amostra["rota"] == "fora_escopo":
+                fora_escopo_encaminhadas += 1
+            erros.append((amostra["pergunta"], amostra["rota"], dominio, confianca))
+
+    total = len(amostras)
+    return {
+        "limiar": limiar,
+        "total": total,
+        "resolvidas_localmente": resolvidas,
+        "cobertura": resolvidas / total if total else 0.0,
+        "taxa_chamadas_llm": (total - resolvidas) / total if total else 0.0,
+        "precisao": acertos / resolvidas if resolvidas else 0.0,
+        "fora_escopo_encaminhadas": fora_escopo_encaminhadas,
+        "erros": erros,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avalia o pré-roteador local.")
+    parser.add_argument("--dados", type=Path, default=DADOS_PADRAO)
+    parser.add_argument("--limiar", type=float, action="append",
+                        help="Limiar a avaliar (pode repetir). Padrão: varredura de 0.05 a 0.5.")
+    parser.add_argument("--erros", action="store_true", help="Lista as perguntas roteadas errado.")
+    args = parser.parse_args()
+
+    amostras, vistas = separar_vistas(carregar(args.dados))
+    for amostra in vistas:
+        print(f"Aviso: ignorada por repetir um exemplo de treino: {amostra['pergunta']!r}")
+    limiares = args.limiar or [round(0.05 * i, 2) for i in range(1, 11)]
+
+    print(f"{'limiar':>7} {'cobertura':>10} {'chamadas LLM':>13} {'precisão':>9} {'fora_escopo':>12}")
+    for limiar in limiares:
+        r = avaliar(amostras, limiar)
+        print(f"{r['limiar']:>7.2f} {r['cobertura']:>10.1%} {r['taxa_chamadas_llm']:>13.1%} "
+              f"{r['precisao']:>9.1%} {r['fora_escopo_encaminhadas']:>12}")
+        if args.erros:
+            for pergunta, esperado, obtido, confianca in r["erros"]:
+                print(f"        ✗ {pergunta!r}: esperado={esperado} obtido={obtido} confiança={confianca:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark da busca vetorial: exata × IVF × HNSW.
+
+Uso (na raiz do projeto):
+    python -m scripts.benchmark_ann [--documentos 20000] [--dimensao 768] [--consultas 200] [--k 3]
+
+Gera uma base sintética agrupada (parecida com embeddings de textos de um mesmo
+tema) e mede, para cada backend: tempo de construção, latência por consulta
+(p50/p95) e recall@k em relação à busca exata. O HNSW só é medido se o pacote
+opcional hnswlib estiver instalado.
+"""
+import argparse
+import time
+import numpy as np
+from purpuria.indice_ann import IndiceIVF, IndiceHNSW
+from purpuria.indice_vetorial import IndiceVetorial
+
+
+def base_sintetica(documentos: int, dimensao: int, grupos: int, semente: int = 0):
+    rng = np.random.default_rng(semente)
+    centros = rng.normal(size=(grupos, dimensao)).astype(np.float32)
+    rotulos = rng.integers(0, grupos, size=documentos)
+    vetores = centros[rotulos] + 0.6 * rng.normal(size=(documentos, dimensao)).astype(np.float32)
+    consultas = centros[rng.integers(0, grupos, size=200)] + 0.6 * rng.normal(size=(200, dimensao)).astype(np.float32)
+    return vetores, consultas
+
+
+def medir(indice: IndiceVetorial, consultas: np.ndarray, k: int):
+    latencias, resultados = [], []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        resultados.append([texto for _, texto in indice.buscar(consulta, k)])
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return np.array(latencias), resultados
+
+
+def recall(resultados, referencia) -> float:
+    acertos = sum(len(set(r) & set(ref)) for r, ref in zip(resultados, referencia))
+    return acertos / sum(len(ref) for ref in referencia)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara busca exata com os backends ANN.")
+    parser.add_argument("--documentos", type=int, default=20000)
+    parser.add_argument("--dimensao", type=int, default=768)
+    parser.add_argument("--grupos", type=int, default=200)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    vetores, consultas = base_sintetica(args.documentos, args.dimensao, args.grupos)
+    consultas = consultas[:args.consultas]
+    textos = [str(i) for i in range(args.documentos)]
+
+    backends = [("exato", None)]
+    backends += [(f"ivf sondas={s}", IndiceIVF(sondas=s)) for s in (4, 8, 16, 32)]
+    try:
+        backends += [(f"hnsw ef={ef}", IndiceHNSW(ef_busca=ef)) for ef in (32, 64, 128)]
+    except ImportError:
+        print("[INFO] hnswlib não instalado; HNSW fora do benchmark.")
+
+    print(f"{args.documentos} documentos × {args.dimensao} dimensões, {len(consultas)} consultas, k={args.k}\n")
+    print(f"{'backend':<18} {'construção (s)':>15} {'p50 (ms)':>9} {'p95 (ms)':>9} {'recall@k':>9}")
+
+    referencia = None
+    for nome, ann in backends:
+        indice = IndiceVetorial(ann=ann, min_documentos_ann=0)
+        inicio = time.perf_counter()
+        indice.substituir(len(textos), vetores, textos, versao=("bench", len(textos)))
+        construcao = time.perf_counter() - inicio
+
+        latencias, resultados = medir(indice, consultas, args.k)
+        if referencia is None:
+            referencia = resultados
+        print(f"{nome:<18} {construcao:>15.2f} {np.percentile(latencias, 50):>9.3f} "
+              f"{np.percentile(latencias, 95):>9.3f} {recall(resultados, referencia):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
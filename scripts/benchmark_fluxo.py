@@ -0,0 +1,174 @@
+"""
+Benchmark ponta a ponta do fluxo de chat, offline.
+
+Uso (na raiz do projeto):
+    python -m scripts.benchmark_fluxo [--requisicoes 200] [--concorrencia 10] [--latencia-llm-ms 300]
+                                      [--saida resultado.json] [--comparar base.json]
+
+Sobe a API (main.app, com o lifespan) sobre o ambiente de scripts/ambiente_offline.py
+(LLMs roteirizados com latência configurável, fakeredis, mongomock e SQLite no
+lugar do Postgres) e dispara POST /chat/{chat_id} com as perguntas de
+scripts/dados/roteador_avaliacao.jsonl, mantendo --concorrencia requisições em
+andamento. Cada usuário virtual conversa no próprio chat, então histórico,
+resumo e caches evoluem como em uso real.
+
+Resultado em JSON (stdout ou --saida): configuração, RPS, latência da
+requisição e, por etapa do fluxo (medidas com purpuria/medicao.py), n, média,
+p50, p95 e p99 em ms. Com --comparar, um resumo das diferenças para um
+resultado anterior sai no stderr. Requer fakeredis, mongomock e httpx.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+import numpy as np
+
+DADOS = Path(__file__).parent / "dados"
+
+# Os clientes são falsos, mas ENV.check_missing() (lifespan) e /ready exigem as variáveis
+for _variavel in ("REDIS_URL", "POSTGRES_URL", "MONGO_URL", "GEMINI_API_KEY"):
+    os.environ.setdefault(_variavel, "offline")
+
+
+def percentis(valores: list[float]) -> dict:
+    ms = np.array(valores) * 1000
+    return {
+        "n": len(ms),
+        "media_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+async def disparar(cliente, perguntas: list[str], usuarios: list[str], total: int, concorrencia: int,
+                   tempos: dict[str, list[float]]) -> dict:
+    """Envia `total` mensagens com até `concorrencia` em andamento. Retorna contagem de erros e duração."""
+    fila = asyncio.Queue()
+    for i in range(total):
+        usuario = usuarios[i % len(usuarios)]
+        fila.put_nowait((usuario, f"bench-{usuario}", perguntas[i % len(perguntas)]))
+    erros = defaultdict(int)
+
+    async def trabalhador():
+        while not fila.empty():
+            usuario, chat_id, pergunta = fila.get_nowait()
+            inicio = time.perf_counter()
+            try:
+                resposta = await cliente.post(f"/chat/{chat_id}", json={"senderId": usuario, "content": pergunta})
+                if resposta.status_code != 200:
+                    erros[f"http_{resposta.status_code}"] += 1
+                    continue
+            except Exception as e:
+                erros[type(e).__name__] += 1
+                continue
+            tempos["requisicao"].append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return {"erros": dict(erros), "duracao_s": time.perf_counter() - inicio}
+
+
+async def executar(args) -> dict:
+    import httpx
+    import main
+    from purpuria import medicao
+    from scripts import ambiente_offline
+
+    usuarios = [f"empresa_{i:03d}" for i in range(args.usuarios)]
+    dados = ambiente_offline.instalar(
+        usuarios, args.pedidos_por_usuario, args.latencia_llm_ms, args.latencia_embedding_ms,
+        args.latencia_db_ms, args.variacao
+    )
+    with open(DADOS / "roteador_avaliacao.jsonl", encoding="utf-8") as f:
+        perguntas = [json.loads(linha)["pergunta"] for linha in f if linha.strip()]
+
+    tempos: dict[str, list[float]] = defaultdict(list)
+    medicao.observar(lambda etapa, segundos: tempos[etapa].append(segundos))
+
+    # O worker de ingestão não participa do chat, e o BLMOVE bloqueante do
+    # fakeredis não atende ao cancelamento: o lifespan nunca terminaria
+    async def sem_worker_ingestao():
+        await asyncio.Event().wait()
+    main.worker_ingestao = sem_worker_ingestao
+
+    transporte = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transporte, base_url="http://offline",
+                                                         timeout=None) as cliente:
+        if args.aquecimento:
+            await disparar(cliente, perguntas, usuarios, args.aquecimento, args.concorrencia, tempos)
+            tempos.clear()
+        resultado = await disparar(cliente, perguntas, usuarios, args.requisicoes, args.concorrencia, tempos)
+
+    concluidas = len(tempos["requisicao"])
+    return {
+        "config": {chave: valor for chave, valor in vars(args).items() if chave not in ("saida", "comparar")},
+        "dados": dados,
+        "requisicoes": args.requisicoes,
+        "concluidas": concluidas,
+        "erros": resultado["erros"],
+        "duracao_s": round(resultado["duracao_s"], 3),
+        "rps": round(concluidas / resultado["duracao_s"], 2) if resultado["duracao_s"] else 0.0,
+        "etapas": {etapa: percentis(valores) for etapa, valores in sorted(tempos.items()) if valores},
+    }
+
+
+def comparar(atual: dict, base: dict):
+    """Diferenças de RPS e percentis por etapa em relação a um resultado anterior (no stderr)."""
+    def variacao(novo, antigo):
+        return f"{(novo - antigo) / antigo * 100:+.1f}%" if antigo else "n/a"
+
+    saida = sys.stderr
+    print(f"rps: {base['rps']} → {atual['rps']} ({variacao(atual['rps'], base['rps'])})", file=saida)
+    print(f"{'etapa':<18} {'p50 (ms)':>22} {'p95 (ms)':>22} {'p99 (ms)':>22}", file=saida)
+    for etapa, medidas in atual["etapas"].items():
+        anterior = base["etapas"].get(etapa)
+        if anterior is None:
+            continue
+        colunas = [
+            f"{anterior[p]:.1f}→{medidas[p]:.1f} ({variacao(medidas[p], anterior[p])})"
+            for p in ("p50_ms", "p95_ms", "p99_ms")
+        ]
+        print(f"{etapa:<18} {colunas[0]:>22} {colunas[1]:>22} {colunas[2]:>22}", file=saida)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do fluxo de chat (API + pipeline real).")
+    parser.add_argument("--requisicoes", type=int, default=200)
+    parser.add_argument("--concorrencia", type=int, default=10)
+    parser.add_argument("--aquecimento", type=int, default=20, help="requisições descartadas antes da medição")
+    parser.add_argument("--usuarios", type=int, default=20)
+    parser.add_argument("--pedidos-por-usuario", type=int, default=30)
+    parser.add_argument("--latencia-llm-ms", type=float, default=300.0)
+    parser.add_argument("--latencia-embedding-ms", type=float, default=50.0)
+    parser.add_argument("--latencia-db-ms", type=float, default=2.0)
+    parser.add_argument("--variacao", type=float, default=0.2, help="fração de variação das latências (±)")
+    parser.add_argument("--saida", type=Path, help="arquivo JSON do resultado (padrão: stdout)")
+    parser.add_argument("--comparar", type=Path, help="resultado anterior (JSON) para comparação")
+    args = parser.parse_args()
+
+    try:
+        import fakeredis, mongomock, httpx  # noqa: F401,E401
+    except ImportError as e:
+        sys.exit(f"Dependência do benchmark ausente ({e.name}): pip install fakeredis mongomock httpx")
+
+    # Os logs do fluxo (print) vão para o stderr: o stdout fica só com o JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        resultado = asyncio.run(executar(args))
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        args.saida.write_text(texto + "\n", encoding="utf-8")
+        print(f"Resultado salvo em {args.saida}", file=sys.stderr)
+    else:
+        print(texto)
+    if args.comparar:
+        comparar(resultado, json.loads(args.comparar.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark dos guardrails: implementação anterior (lista + regex de alternância)
+× padrão único compilado de purpuria/guardrail.py.
+
+Uso (na raiz do projeto):
+    python -m scripts.benchmark_guardrail [--mensagens arquivo.txt] [--repeticoes 200]
+
+Corpus: as perguntas de scripts/dados/roteador_avaliacao.jsonl, os textos de
+scripts/dados/guardrail_casos.jsonl e, opcionalmente, um arquivo com uma
+mensagem real por linha (--mensagens). Cada mensagem passa pelos dois lados
+(entrada e saída) e a latência por chamada é relatada em µs (média, p50, p95,
+p99). Os casos rotulados (guardrail_casos.jsonl) também mostram onde cada
+implementação erra, incluindo variantes sem acento e ofuscadas.
+"""
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+import numpy as np
+from purpuria import guardrail
+
+DADOS = Path(__file__).parent / "dados"
+
+_regras = json.loads(guardrail.ARQUIVO_REGRAS.read_text(encoding="utf-8"))
+_TERMOS_LEGADO = _regras["entrada"][0]["termos"]
+_PADRAO_LEGADO = "(" + "|".join(re.escape(f) for f in _regras["entrada"][1]["termos"]) + ")"
+_OFENSIVAS_LEGADO = _regras["saida"][0]["termos"]
+
+
+def legado_entrada(pergunta: str) -> bool:
+    """Como check_input_guardrail era antes: busca linear por termo + regex recompilada via cache do re."""
+    pergunta_lower = pergunta.lower()
+    if any(palavra in pergunta_lower for palavra in _TERMOS_LEGADO):
+        return True
+    return re.search(_PADRAO_LEGADO, pergunta_lower, re.IGNORECASE) is not None
+
+
+def legado_saida(resposta: str) -> bool:
+    """Como check_output_guardrail era antes: remove pontuação e compara palavra a palavra."""
+    resposta_lower = re.sub(r'[^\w\s]', '', resposta).lower()
+    return any(palavra in resposta_lower.split() for palavra in _OFENSIVAS_LEGADO)
+
+
+IMPLEMENTACOES = {
+    "legado": {"entrada": legado_entrada, "saida": legado_saida},
+    "compilado": {
+        "entrada": lambda texto: guardrail.verificar_entrada(texto) is not None,
+        "saida": lambda texto: guardrail.verificar_saida(texto) is not None,
+    },
+}
+
+
+def carregar_jsonl(caminho: Path) -> list[dict]:
+    with open(caminho, encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+def medir(funcao, corpus: list[str], repeticoes: int) -> np.ndarray:
+    """Latência média por chamada (µs) de cada mensagem, sobre `repeticoes` execuções."""
+    latencias = []
+    for texto in corpus:
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao(texto)
+        latencias.append((time.perf_counter() - inicio) / repeticoes * 1e6)
+    return np.array(latencias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a latência e os acertos dos guardrails.")
+    parser.add_argument("--mensagens", type=Path, help="arquivo com uma mensagem real por linha")
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    casos = carregar_jsonl(DADOS / "guardrail_casos.jsonl")
+    corpus = [a["pergunta"] for a in carregar_jsonl(DADOS / "roteador_avaliacao.jsonl")]
+    corpus += [c["texto"] for c in casos]
+    if args.mensagens:
+        corpus += [linha.strip() for linha in args.mensagens.read_text(encoding="utf-8").splitlines() if linha.strip()]
+
+    print(f"{len(corpus)} mensagens, {args.repeticoes} repetições cada\n")
+    print(f"{'implementação':<14} {'lado':<8} {'média (µs)':>11} {'p50 (µs)':>9} {'p95 (µs)':>9} {'p99 (µs)':>9}")
+    for nome, lados in IMPLEMENTACOES.items():
+        for lado, funcao in lados.items():
+            latencias = medir(funcao, corpus, args.repeticoes)
+            print(f"{nome:<14} {lado:<8} {latencias.mean():>11.2f} {np.percentile(latencias, 50):>9.2f} "
+                  f"{np.percentile(latencias, 95):>9.2f} {np.percentile(latencias, 99):>9.2f}")
+
+    print(f"\nCasos rotulados ({len(casos)}):")
+    for nome, lados in IMPLEMENTACOES.items():
+        erros = [c for c in casos if lados[c["lado"]](c["texto"]) != c["bloquear"]]
+        print(f"  {nome:<14} acertos {len(casos) - len(erros)}/{len(casos)}")
+        for caso in erros:
+            esperado = "bloquear" if caso["bloquear"] else "liberar"
+            print(f"    - [{caso['lado']}] deveria {esperado}: {caso['texto']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Tempo de import da API (cold start).
+
+Uso (na raiz do projeto):
+    python -m scripts.benchmark_importacao [--modulo main] [--execucoes 5] [--top 15]
+
+Importa o módulo em interpretadores novos (um por execução, sem cache de
+módulos) e relata o tempo de import (média, p50, mín. e máx.) e os módulos
+mais caros pelo tempo acumulado do -X importtime na execução mediana. Com
+--aquecer, mede também quanto leva componentes.aquecer() de tudo
+(clientes e agentes construídos sem rede).
+"""
+import argparse
+import os
+import subprocess
+import sys
+import numpy as np
+
+MEDIR_IMPORT = """
+import time
+inicio = time.perf_counter()
+import {modulo}
+print("IMPORT", time.perf_counter() - inicio)
+if {aquecer}:
+    from common import componentes
+    inicio = time.perf_counter()
+    componentes.aquecer()
+    print("AQUECER", time.perf_counter() - inicio)
+"""
+
+
+def executar(modulo: str, aquecer: bool) -> tuple[dict[str, float], list[tuple[int, str]]]:
+    """Um interpretador novo: tempos medidos e (tempo acumulado em µs, módulo) do importtime."""
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", MEDIR_IMPORT.format(modulo=modulo, aquecer=aquecer)],
+        capture_output=True, text=True, env={**os.environ, "PYTHONWARNINGS": "ignore"}, check=True
+    )
+    tempos = {}
+    for linha in processo.stdout.splitlines():
+        if linha.startswith(("IMPORT ", "AQUECER ")):
+            nome, valor = linha.split()
+            tempos[nome] = float(valor)
+
+    modulos = []
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        _, acumulado, nome = linha[len("import time:"):].split("|")
+        modulos.append((int(acumulado), nome.strip()))
+    return tempos, modulos
+
+
+def resumir(etapa: str, tempos: list[float]):
+    tempos = np.array(tempos)
+    print(f"{etapa:<8} (s): média {tempos.mean():.3f} | p50 {np.percentile(tempos, 50):.3f} "
+          f"| mín {tempos.min():.3f} | máx {tempos.max():.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de import da API em interpretadores novos.")
+    parser.add_argument("--modulo", default="main")
+    parser.add_argument("--execucoes", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--aquecer", action="store_true", help="mede também componentes.aquecer()")
+    args = parser.parse_args()
+
+    resultados = [executar(args.modulo, False) for _ in range(args.execucoes)]
+    resumir("import", [r[0]["IMPORT"] for r in resultados])
+    if args.aquecer:
+        # Execuções à parte, para os imports do aquecimento não entrarem na lista de módulos
+        resumir("aquecer", [executar(args.modulo, True)[0]["AQUECER"] for _ in range(args.execucoes)])
+
+    # Módulos mais caros na execução mediana (pelo tempo de import)
+    mediana = sorted(resultados, key=lambda r: r[0]["IMPORT"])[len(resultados) // 2]
+    print("\nMódulos mais caros (acumulado, execução mediana):")
+    for acumulado, nome in sorted(mediana[1], reverse=True)[:args.top]:
+        print(f"  {acumulado / 1000:>8.1f} ms  {nome}")
+
+
+if __name__ == "__main__":
+    main()
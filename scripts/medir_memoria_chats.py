@@ -0,0 +1,85 @@
+"""
+Uso de memória dos históricos de chat no Redis.
+
+Uso (na raiz do projeto):
+    python -m scripts.medir_memoria_chats [--aplicar-ttl]
+
+Percorre as listas chat:* (SCAN, sem bloquear o Redis) e relata quantidade de
+chats, bytes por chat (MEMORY USAGE da lista + resumo: média, p50, p95 e máximo)
+e quantos ainda não têm TTL — chats criados antes do HISTORICO_TTL. Para cada
+etapa, mostra também os tokens que o chat envia ao LLM, carregando o histórico
+com purpuria/memoria_conversa.py (a mesma janela usada no fluxo). Com
+--aplicar-ttl, os chats sem TTL recebem o TTL configurado.
+"""
+import argparse
+import asyncio
+import numpy as np
+from common.env import ENV
+from purpuria import memoria_conversa
+from purpuria.redis_history import redis_client_async
+from purpuria.serializacao import estimar_tokens
+
+TAMANHO_LOTE = 500
+
+
+def _tokens(mensagens: list) -> int:
+    return sum(estimar_tokens(m.content) for m in mensagens)
+
+
+async def medir(aplicar_ttl: bool):
+    # Só as listas: o resumo (hash) e o lock (string) são contados junto com o chat
+    chats = [chave.split(":", 2)[1:] async for chave in redis_client_async.scan_iter("chat:*", count=1000,
+                                                                                      _type="list")]
+    if not chats:
+        print("Nenhum chat encontrado.")
+        return
+
+    tamanhos, sem_ttl = [], []
+    tokens = {etapa: [] for etapa in memoria_conversa.JANELAS}
+    for i in range(0, len(chats), TAMANHO_LOTE):
+        lote = chats[i:i + TAMANHO_LOTE]
+        pipe = redis_client_async.pipeline(transaction=False)
+        for usuario, chat_id in lote:
+            pipe.memory_usage(memoria_conversa._chat_key(usuario, chat_id))
+            pipe.memory_usage(memoria_conversa._resumo_key(usuario, chat_id))
+            pipe.ttl(memoria_conversa._chat_key(usuario, chat_id))
+        resultados = await pipe.execute()
+        historicos = await asyncio.gather(*(memoria_conversa.carregar(usuario, chat_id) for usuario, chat_id in lote))
+        for j, (usuario, chat_id) in enumerate(lote):
+            lista, resumo, ttl = resultados[3 * j:3 * j + 3]
+            tamanhos.append((lista or 0) + (resumo or 0))
+            if ttl == -1:
+                sem_ttl.append((usuario, chat_id))
+            for etapa in tokens:
+                tokens[etapa].append(_tokens(historicos[j].para_etapa(etapa)))
+
+    tamanhos = np.array(tamanhos)
+    print(f"chats        : {len(chats)}")
+    print(f"total        : {tamanhos.sum() / 1024 / 1024:.2f} MiB")
+    print(f"por chat (B) : média {tamanhos.mean():.0f} | p50 {np.percentile(tamanhos, 50):.0f} "
+          f"| p95 {np.percentile(tamanhos, 95):.0f} | máx {tamanhos.max()}")
+    print(f"sem TTL      : {len(sem_ttl)}")
+    print("tokens por etapa (janela + resumo):")
+    for etapa, valores in tokens.items():
+        print(f"  {etapa:<12} : média {np.mean(valores):.0f} | p95 {np.percentile(valores, 95):.0f} "
+              f"| máx {max(valores)} (orçamento {memoria_conversa.JANELAS[etapa][1]})")
+
+    if aplicar_ttl and sem_ttl:
+        pipe = redis_client_async.pipeline(transaction=False)
+        for usuario, chat_id in sem_ttl:
+            pipe.expire(memoria_conversa._chat_key(usuario, chat_id), ENV.HISTORICO_TTL)
+            pipe.expire(memoria_conversa._resumo_key(usuario, chat_id), ENV.HISTORICO_TTL)
+        await pipe.execute()
+        print(f"TTL de {ENV.HISTORICO_TTL}s aplicado a {len(sem_ttl)} chat(s).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a memória ocupada pelos chats no Redis.")
+    parser.add_argument("--aplicar-ttl", action="store_true",
+                        help="aplica HISTORICO_TTL aos chats que ainda não expiram")
+    args = parser.parse_args()
+    asyncio.run(medir(args.aplicar_ttl))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Relatório de índices recomendados para as consultas das tools (pedidos/resíduos).
+
+Uso (na raiz do projeto):
+    python -m scripts.relatorio_indices [--explain USER_ID]
+
+Para cada índice recomendado, verifica no catálogo do Postgres se já existe um
+índice que o cubra (mesmas colunas como prefixo) e imprime o CREATE INDEX
+CONCURRENTLY dos que faltam. Com --explain, mostra o plano (EXPLAIN ANALYZE) das
+consultas de pedidos para o usuário informado.
+"""
+import argparse
+from common import postgres
+
+# (tabela, colunas, consultas atendidas)
+RECOMENDADOS = [
+    ("pedido", ["fkentregador", "status", "agendamentocoleta"], "pedidos_vendedor, pedido_mais_antigo, pedidos_detalhados"),
+    ("pedido", ["fkrecebedor", "status", "agendamentocoleta"], "pedidos_comprador, pedidos_detalhados"),
+    ("pedido", ["fkentregador", "data", "idpedido"], "pedidos_geral (vendedor), pedido_mais_antigo"),
+    ("pedido", ["fkrecebedor", "data", "idpedido"], "pedidos_geral (comprador)"),
+    ("transporte", ["fkpedido"], "transporte_pedido, pedidos_detalhados"),
+    ("residuopedido", ["fkpedido"], "residuos_pedido, pedidos_detalhados"),
+]
+
+SQL_INDICES_EXISTENTES = """
+    SELECT i.relname AS indice, array_agg(a.attname ORDER BY k.ordem) AS colunas
+    FROM pg_index x
+    JOIN pg_class t ON t.oid = x.indrelid
+    JOIN pg_class i ON i.oid = x.indexrelid
+    CROSS JOIN LATERAL unnest(x.indkey) WITH ORDINALITY AS k(attnum, ordem)
+    JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+    WHERE t.relname = %s
+    GROUP BY i.relname
+"""
+
+
+def indice_que_cobre(existentes: list[dict], colunas: list[str]) -> str | None:
+    for existente in existentes:
+        if list(existente["colunas"][:len(colunas)]) == colunas:
+            return existente["indice"]
+    return None
+
+
+def explicar(user_id: str):
+    consultas = [
+        ("pedidos_vendedor", (user_id, ["aprovado", "pendente"], 21)),
+        ("pedidos_comprador", (user_id, ["aprovado", "pendente"], 21)),
+        ("pedidos_geral", (user_id, None, None, None, None, None, None, 21)),
+        ("pedidos_detalhados", (user_id, ["aprovado", "pendente"], 21)),
+    ]
+    for nome, params in consultas:
+        marcadores = ", ".join(["%s"] * len(params))
+        with postgres.conexao() as conn, conn.cursor() as cur:
+            cur.execute(f"PREPARE explicar_{nome} AS {postgres._consultas[nome]}")
+            cur.execute(f"EXPLAIN ANALYZE EXECUTE explicar_{nome} ({marcadores})", params)
+            plano = "\n".join(linha[0] for linha in cur.fetchall())
+            cur.execute(f"DEALLOCATE explicar_{nome}")
+        print(f"\n--- {nome} ---\n{plano}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica os índices recomendados para as tools SQL.")
+    parser.add_argument("--explain", metavar="USER_ID", help="mostra o plano das consultas de pedidos")
+    args = parser.parse_args()
+
+    # Registra as consultas preparadas das tools
+    import purpuria.tools.pedidos_tool  # noqa: F401
+    import purpuria.tools.residuos_tool  # noqa: F401
+
+    faltando = []
+    for tabela, colunas, consultas in RECOMENDADOS:
+        existentes = postgres.executar(SQL_INDICES_EXISTENTES, (tabela,))
+        coberto_por = indice_que_cobre(existentes, colunas)
+        situacao = f"OK ({coberto_por})" if coberto_por else "FALTANDO"
+        print(f"{tabela}({', '.join(colunas)}) → {situacao}  [{consultas}]")
+        if not coberto_por:
+            faltando.append((tabela, colunas))
+
+    if faltando:
+        print("\n-- Índices sugeridos (CONCURRENTLY não bloqueia escritas; rode fora de transação):")
+        for tabela, colunas in faltando:
+            nome = f"idx_{tabela}_{'_'.join(colunas)}"
+            print(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nome} ON {tabela} ({', '.join(colunas)});")
+
+    if args.explain:
+        explicar(args.explain)
+
+
+if __name__ == "__main__":
+    main()
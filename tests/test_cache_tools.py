@@ -0,0 +1,110 @@
+"""
+Cache de resultados das tools por usuário: acerto, isolamento entre usuários,
+invalidação por geração e pré-busca.
+
+Roda sobre fakeredis (pip install -r requirements-dev.txt).
+"""
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from common import componentes  # noqa: E402
+from common.env import ENV  # noqa: E402
+from purpuria.tools import cache_tools  # noqa: E402
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    servidor = fakeredis.FakeServer()
+    monkeypatch.setitem(componentes._fabricas, "redis",
+                        lambda: fakeredis.FakeRedis(server=servidor, decode_responses=True))
+    monkeypatch.setattr(ENV, "TOOL_CACHE_ATIVO", True)
+    componentes._instancias.pop("redis", None)
+    yield servidor
+    componentes._instancias.pop("redis", None)
+
+
+@pytest.fixture
+def consulta(servidor):
+    """Tool de mentira que conta as execuções reais e devolve a versão dos dados."""
+    estado = {"execucoes": 0, "versao": 1, "antes_de_devolver": None}
+
+    @cache_tools.cache_por_usuario(ttl=60)
+    def consultar(user_id: str, status: str = "aprovado,pendente") -> str:
+        estado["execucoes"] += 1
+        resultado = f"{user_id}:{status}:v{estado['versao']}"
+        if estado["antes_de_devolver"]:
+            estado["antes_de_devolver"]()
+        return resultado
+
+    consultar.estado = estado
+    return consultar
+
+
+def test_acerto_e_argumentos_equivalentes(consulta):
+    assert consulta(user_id="u1") == "u1:aprovado,pendente:v1"
+    assert consulta(user_id="u1", status="pendente, aprovado") == "u1:aprovado,pendente:v1"
+    assert consulta.estado["execucoes"] == 1
+    assert cache_tools.estatisticas()["consultar"]["acertos"] == 1
+    assert cache_tools.estatisticas()["consultar"]["falhas"] == 1
+
+
+def test_usuarios_nao_compartilham_resultado(consulta):
+    assert consulta(user_id="u1") == "u1:aprovado,pendente:v1"
+    assert consulta(user_id="u2") == "u2:aprovado,pendente:v1"
+    assert consulta.estado["execucoes"] == 2
+
+
+def test_invalidacao_descarta_so_o_usuario(consulta):
+    consulta(user_id="u1")
+    consulta(user_id="u2")
+    consulta.estado["versao"] = 2
+
+    assert cache_tools.invalidar_usuarios(["u1", "u1"]) == ["u1"]
+    assert consulta(user_id="u1") == "u1:aprovado,pendente:v2"
+    assert consulta(user_id="u2") == "u2:aprovado,pendente:v1"
+    assert consulta.estado["execucoes"] == 3
+
+
+def test_resultado_calculado_durante_a_invalidacao_nao_e_servido(consulta):
+    # A escrita chega no meio da consulta: o resultado (v1) fica na geração antiga
+    def escrita_concorrente():
+        consulta.estado["versao"] = 2
+        consulta.estado["antes_de_devolver"] = None
+        cache_tools.invalidar_usuarios(["u1"])
+    consulta.estado["antes_de_devolver"] = escrita_concorrente
+
+    assert consulta(user_id="u1") == "u1:aprovado,pendente:v1"
+    assert consulta(user_id="u1") == "u1:aprovado,pendente:v2"
+
+
+def test_erros_nao_sao_cacheados(servidor):
+    execucoes = []
+
+    @cache_tools.cache_por_usuario(ttl=60)
+    def falhar(user_id: str) -> str:
+        execucoes.append(user_id)
+        return "ERRO_DB_POSGRES: indisponível"
+
+    falhar(user_id="u1")
+    falhar(user_id="u1")
+    assert len(execucoes) == 2
+
+
+def test_redis_fora_executa_sem_cache(consulta, servidor):
+    consulta(user_id="u1")
+    servidor.connected = False
+    assert consulta(user_id="u1") == "u1:aprovado,pendente:v1"
+    assert consulta.estado["execucoes"] == 2
+
+
+def test_pre_busca_fora_de_acertos_e_falhas(consulta):
+    consulta.pre_buscar(user_id="u1")
+    consulta.pre_buscar(user_id="u1")
+    consulta(user_id="u1")
+    consulta(user_id="u1")
+
+    assert consulta.estado["execucoes"] == 1
+    assert cache_tools.estatisticas()["consultar"] == {
+        "acertos": 1, "falhas": 0, "pre_buscas": 1, "acertos_pre_busca": 1
+    }
@@ -0,0 +1,45 @@
+"""
+Guardrails compilados: os casos rotulados de scripts/dados/guardrail_casos.jsonl,
+todos os termos de purpuria/dados/guardrail.json e as fronteiras de palavra.
+"""
+import json
+from pathlib import Path
+import pytest
+
+from purpuria import guardrail
+
+CASOS = Path(__file__).parent.parent / "scripts" / "dados" / "guardrail_casos.jsonl"
+REGRAS = json.loads(guardrail.ARQUIVO_REGRAS.read_text(encoding="utf-8"))
+VERIFICAR = {"entrada": guardrail.verificar_entrada, "saida": guardrail.verificar_saida}
+
+
+def _casos() -> list[dict]:
+    with open(CASOS, encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+@pytest.mark.parametrize("caso", _casos(), ids=lambda caso: caso["texto"][:40])
+def test_casos_rotulados(caso):
+    acionamento = VERIFICAR[caso["lado"]](caso["texto"])
+    assert (acionamento is not None) == caso["bloquear"]
+
+
+@pytest.mark.parametrize("lado,regra,termo", [
+    (lado, regra["regra"], termo)
+    for lado, regras in REGRAS.items() for regra in regras for termo in regra["termos"]
+])
+def test_todo_termo_bloqueia_com_a_sua_regra(lado, regra, termo):
+    acionamento = VERIFICAR[lado](f"Olá, {termo.upper()}!")
+    assert acionamento == guardrail.Acionamento(regra, guardrail.normalizar(termo).strip())
+
+
+@pytest.mark.parametrize("lado,texto,bloquear", [
+    ("entrada", "Quantos partidos existem?", True),           # "inicio": prefixo de palavra
+    ("entrada", "O lote foi repartido em dois pedidos", False),
+    ("entrada", "Quero falar de POLÍTICA", True),
+    ("saida", "Que merdaaa de entrega", True),                 # letras repetidas
+    ("saida", "A disputa pelo frete terminou", False),         # "palavra": só a palavra inteira
+    ("saida", "Pedido 1234 entregue", False),                  # números soltos não viram letras
+])
+def test_fronteiras(lado, texto, bloquear):
+    assert (VERIFICAR[lado](texto) is not None) == bloquear
@@ -0,0 +1,101 @@
+"""
+GET /chat paginado: percorrer as páginas com `before` devolve cada mensagem
+guardada exatamente uma vez, da mais recente para a mais antiga, com ids
+absolutos que não mudam quando a lista é aparada.
+
+Roda sobre fakeredis (pip install -r requirements-dev.txt).
+"""
+import asyncio
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+httpx = pytest.importorskip("httpx")
+
+from common import componentes  # noqa: E402
+from common.env import ENV  # noqa: E402
+from purpuria import memoria_conversa  # noqa: E402
+from purpuria.redis_history import aadd_turno  # noqa: E402
+import main  # noqa: E402
+
+
+@pytest.fixture
+def redis_falso(monkeypatch):
+    servidor = fakeredis.FakeServer()
+    monkeypatch.setitem(componentes._fabricas, "redis_async",
+                        lambda: fakeredis.FakeAsyncRedis(server=servidor, decode_responses=True))
+    componentes._instancias.pop("redis_async", None)
+    yield
+    componentes._instancias.pop("redis_async", None)
+
+
+async def _conversar(turnos: int):
+    for turno in range(turnos):
+        await aadd_turno("usuario", "chat", f"pergunta {turno}", f"resposta {turno}")
+
+
+async def _paginas(cliente, limite: int) -> list[list[dict]]:
+    paginas, antes = [], None
+    while True:
+        params = {"chatId": "chat", "senderId": "usuario", "limit": limite}
+        if antes is not None:
+            params["before"] = antes
+        resposta = await cliente.get("/chat", params=params)
+        assert resposta.status_code == 200
+        pagina = resposta.json()
+        if not pagina:
+            return paginas
+        paginas.append(pagina)
+        antes = pagina[-1]["id"]
+
+
+def _cliente():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://teste")
+
+
+def test_paginas_cobrem_o_chat_sem_repetir(redis_falso):
+    async def cenario():
+        await _conversar(12)
+        async with _cliente() as cliente:
+            return await _paginas(cliente, 7)
+
+    paginas = asyncio.run(cenario())
+    assert [len(p) for p in paginas] == [7, 7, 7, 3]
+    mensagens = [m for pagina in paginas for m in pagina]
+    assert [m["id"] for m in mensagens] == list(range(23, -1, -1))
+    assert mensagens[0]["content"] == "resposta 11" and mensagens[0]["senderId"] is None
+    assert mensagens[-1]["content"] == "pergunta 0" and mensagens[-1]["senderId"] == "usuario"
+
+
+def test_ids_estaveis_depois_do_ltrim(redis_falso, monkeypatch):
+    monkeypatch.setattr(ENV, "HISTORICO_MAX_MENSAGENS", 10)
+
+    async def resumir(resumo_anterior, mensagens):
+        return "resumo"
+
+    async def cenario():
+        await _conversar(15)
+        await memoria_conversa.atualizar_resumo("usuario", "chat", resumir)
+        async with _cliente() as cliente:
+            primeira = (await cliente.get("/chat", params={"chatId": "chat", "senderId": "usuario",
+                                                           "limit": 4})).json()
+            return primeira, await _paginas(cliente, 4)
+
+    primeira, paginas = asyncio.run(cenario())
+    mensagens = [m for pagina in paginas for m in pagina]
+    # Os ids continuam sendo a posição desde o início do chat, mesmo com as antigas aparadas
+    assert primeira[0]["id"] == 29 and primeira[0]["content"] == "resposta 14"
+    ids = [m["id"] for m in mensagens]
+    assert ids == list(range(29, 29 - len(ids), -1)) and ids[-1] > 0
+    assert all(m["content"].endswith(str(m["id"] // 2)) for m in mensagens)
+
+
+def test_limite_validado(redis_falso):
+    async def cenario():
+        async with _cliente() as cliente:
+            params = {"chatId": "chat", "senderId": "usuario"}
+            return [
+                (await cliente.get("/chat", params={**params, **extra})).status_code
+                for extra in ({"limit": 0}, {"limit": 201}, {"before": -1}, {})
+            ]
+
+    assert asyncio.run(cenario()) == [422, 422, 422, 200]
@@ -0,0 +1,88 @@
+"""
+IndiceVetorial: o top-k (busca exata e IVF com todas as listas sondadas) é o
+mesmo de uma força bruta por cosseno, inclusive após cargas incrementais e remoções.
+"""
+import numpy as np
+import pytest
+
+from purpuria.indice_ann import IndiceIVF
+from purpuria.indice_vetorial import IndiceVetorial
+
+DIMENSAO = 32
+
+
+def _base(quantidade: int, semente: int = 0):
+    rng = np.random.default_rng(semente)
+    vetores = rng.normal(size=(quantidade, DIMENSAO)).astype(np.float32)
+    return vetores, [f"doc {i}" for i in range(quantidade)]
+
+
+def _forca_bruta(vetores: np.ndarray, textos: list[str], consulta: np.ndarray, k: int) -> list[str]:
+    normas = np.linalg.norm(vetores, axis=1)
+    normas[normas == 0] = 1.0
+    scores = (vetores @ consulta) / normas / np.linalg.norm(consulta)
+    return [textos[i] for i in np.argsort(-scores, kind="stable")[:k]]
+
+
+def _consultas(quantidade: int = 20):
+    return np.random.default_rng(99).normal(size=(quantidade, DIMENSAO)).astype(np.float32)
+
+
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_busca_exata_igual_forca_bruta(k):
+    vetores, textos = _base(500)
+    indice = IndiceVetorial()
+    indice.substituir(len(textos), vetores, textos, versao="1")
+
+    for consulta in _consultas():
+        resultado = indice.buscar(consulta, k)
+        assert [texto for _, texto in resultado] == _forca_bruta(vetores, textos, consulta, k)
+        scores = [score for score, _ in resultado]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_carga_incremental_igual_carga_inteira():
+    vetores, textos = _base(300)
+    indice = IndiceVetorial()
+    indice.substituir(100, vetores[:100], textos[:100], versao="1")
+    assert indice.acrescentar(100, 200, vetores[100:], textos[100:], versao="2")
+    # Carga atrasada (outro worker já avançou): ignorada, sem duplicatas
+    assert not indice.acrescentar(100, 200, vetores[100:], textos[100:], versao="2")
+
+    assert len(indice) == 300
+    for consulta in _consultas():
+        assert [t for _, t in indice.buscar(consulta, 5)] == _forca_bruta(vetores, textos, consulta, 5)
+
+
+def test_k_maior_que_a_base_e_vetor_nulo():
+    vetores, textos = _base(4)
+    vetores[2] = 0
+    indice = IndiceVetorial()
+    indice.substituir(4, vetores, textos, versao="1")
+
+    resultado = indice.buscar(_consultas(1)[0], 10)
+    assert sorted(texto for _, texto in resultado) == sorted(textos)
+    assert IndiceVetorial().buscar(_consultas(1)[0], 3) == []
+
+
+def test_remover():
+    vetores, textos = _base(50)
+    indice = IndiceVetorial()
+    indice.substituir(50, vetores, textos, versao="1")
+    assert indice.remover(["doc 3", "doc 7", "inexistente"]) == 2
+
+    manter = [i for i in range(50) if i not in (3, 7)]
+    for consulta in _consultas():
+        esperado = _forca_bruta(vetores[manter], [textos[i] for i in manter], consulta, 3)
+        assert [t for _, t in indice.buscar(consulta, 3)] == esperado
+
+
+def test_ivf_sondando_todas_as_listas_igual_forca_bruta():
+    vetores, textos = _base(400)
+    indice = IndiceVetorial(ann=IndiceIVF(listas=8, sondas=8), min_documentos_ann=100)
+    indice.substituir(300, vetores[:300], textos[:300], versao="1")
+    indice.acrescentar(300, 100, vetores[300:], textos[300:], versao="2")
+    assert indice.ann_linhas == 400
+
+    for consulta in _consultas():
+        assert [t for _, t in indice.buscar(consulta, 3)] == _forca_bruta(vetores, textos, consulta, 3)
@@ -0,0 +1,78 @@
+"""
+Recuperação de jobs de ingestão: um job com lease vencido volta à fila uma
+única vez, mesmo com vários workers recuperando ao mesmo tempo.
+
+Roda sobre fakeredis (pip install -r requirements-dev.txt).
+"""
+import asyncio
+import time
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from common import componentes  # noqa: E402
+from purpuria import ingestao  # noqa: E402
+
+
+@pytest.fixture
+def redis_falso(monkeypatch):
+    servidor = fakeredis.FakeServer()
+    monkeypatch.setitem(componentes._fabricas, "redis_async",
+                        lambda: fakeredis.FakeAsyncRedis(server=servidor, decode_responses=True))
+    componentes._instancias.pop("redis_async", None)
+    yield componentes.obter("redis_async")
+    componentes._instancias.pop("redis_async", None)
+
+
+def test_job_abandonado_volta_uma_vez(redis_falso, monkeypatch):
+    workers = 4
+
+    async def cenario():
+        job_id = await ingestao.enfileirar_job(["a", "b"])
+        await redis_falso.lmove(ingestao.CHAVE_FILA, ingestao.CHAVE_PROCESSANDO, "RIGHT", "LEFT")
+        await redis_falso.hset(ingestao._chave_job(job_id), "lease_ate", time.time() - 1)
+
+        # Todos os workers leem o lease vencido antes de qualquer um devolver o job
+        barreira = asyncio.Barrier(workers)
+        hmget = redis_falso.hmget
+
+        async def hmget_simultaneo(*args):
+            resultado = await hmget(*args)
+            await barreira.wait()
+            return resultado
+        monkeypatch.setattr(redis_falso, "hmget", hmget_simultaneo)
+
+        await asyncio.gather(*(ingestao.recuperar_jobs_abandonados() for _ in range(workers)))
+        return job_id, await redis_falso.lrange(ingestao.CHAVE_FILA, 0, -1), \
+            await redis_falso.lrange(ingestao.CHAVE_PROCESSANDO, 0, -1)
+
+    job_id, fila, processando = asyncio.run(cenario())
+    assert fila == [job_id]
+    assert processando == []
+
+
+def test_job_com_lease_valido_fica(redis_falso):
+    async def cenario():
+        job_id = await ingestao.enfileirar_job(["a"])
+        await redis_falso.lmove(ingestao.CHAVE_FILA, ingestao.CHAVE_PROCESSANDO, "RIGHT", "LEFT")
+        await redis_falso.hset(ingestao._chave_job(job_id), "lease_ate", time.time() + 60)
+        await ingestao.recuperar_jobs_abandonados()
+        return job_id, await redis_falso.lrange(ingestao.CHAVE_PROCESSANDO, 0, -1)
+
+    job_id, processando = asyncio.run(cenario())
+    assert processando == [job_id]
+
+
+def test_retentativas_renovam_lease(redis_falso, monkeypatch):
+    monkeypatch.setattr(ingestao, "BACKOFF_INICIAL", 0)
+    chamadas = []
+
+    async def add_embeddings_lote(textos):
+        chamadas.append(await redis_falso.hget("embed:job:x", "lease_ate"))
+        status = "erro" if len(chamadas) < 3 else "adicionado"
+        return [{"status": status} for _ in textos]
+    monkeypatch.setattr(ingestao, "add_embeddings_lote", add_embeddings_lote)
+
+    itens = asyncio.run(ingestao._processar_lote(["a", "b"], 0, "embed:job:x"))
+    assert [item["status"] for item in itens] == ["adicionado", "adicionado"]
+    assert len(chamadas) == 3 and all(float(lease) > time.time() for lease in chamadas)
@@ -0,0 +1,66 @@
+"""
+Memória de conversa: o resumo e as mensagens carregadas cobrem o chat inteiro,
+sem lacuna, enquanto o chat cruza o limiar de resumo e a lista é aparada.
+
+Roda sobre fakeredis (pip install -r requirements-dev.txt).
+"""
+import asyncio
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from common import componentes  # noqa: E402
+from common.env import ENV  # noqa: E402
+from purpuria import memoria_conversa  # noqa: E402
+from purpuria.redis_history import aadd_turno  # noqa: E402
+
+
+@pytest.fixture
+def redis_falso(monkeypatch):
+    servidor = fakeredis.FakeServer()
+    monkeypatch.setitem(componentes._fabricas, "redis_async",
+                        lambda: fakeredis.FakeAsyncRedis(server=servidor, decode_responses=True))
+    componentes._instancias.pop("redis_async", None)
+    yield
+    componentes._instancias.pop("redis_async", None)
+
+
+def test_resumo_e_janela_sem_lacuna(redis_falso, monkeypatch):
+    # Lista pequena para o LTRIM entrar em ação durante o teste
+    monkeypatch.setattr(ENV, "HISTORICO_MAX_MENSAGENS", 20)
+    resumidas: list[str] = []
+
+    async def resumir(resumo_anterior, mensagens):
+        resumidas.extend(m["conteudo"] for m in mensagens)
+        return f"{len(resumidas)} mensagens resumidas"
+
+    async def conversar():
+        enviadas = []
+        for turno in range(40):
+            pergunta, resposta = f"pergunta {turno}", f"resposta {turno}"
+            historico = await memoria_conversa.carregar("usuario", "chat")
+            tamanho = await aadd_turno("usuario", "chat", pergunta, resposta)
+            enviadas += [pergunta, resposta]
+            if historico.precisa_resumir(tamanho):
+                await memoria_conversa.atualizar_resumo("usuario", "chat", resumir)
+
+            carregado = await memoria_conversa.carregar("usuario", "chat")
+            assert carregado.resumo_ate == len(resumidas)
+            assert resumidas + [m["conteudo"] for m in carregado.mensagens] == enviadas
+        return carregado
+
+    final = asyncio.run(conversar())
+    assert final.descartadas > 0
+    assert final.resumo_ate >= ENV.HISTORICO_BLOCO_RESUMO
+
+
+def test_resumo_atrasado_carrega_o_restante(redis_falso):
+    """Sem resumo por muitos turnos (ex.: falhas do LLM), nada fica fora do contexto."""
+    async def conversar():
+        for turno in range(30):
+            await aadd_turno("usuario", "chat", f"pergunta {turno}", f"resposta {turno}")
+        return await memoria_conversa.carregar("usuario", "chat")
+
+    carregado = asyncio.run(conversar())
+    assert len(carregado.mensagens) == 60 > memoria_conversa.MAX_MENSAGENS_JANELA
+    assert carregado.mensagens[0]["conteudo"] == "pergunta 0"
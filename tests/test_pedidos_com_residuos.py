@@ -0,0 +1,88 @@
+"""
+consultar_pedidos_com_residuos num PostgreSQL real (pgserver): uma consulta
+traz cada pedido com os seus resíduos e transportes, sem multiplicar as linhas
+filhas, pelo mesmo pool e prepared statement da API.
+
+Requer pgserver (pip install -r requirements-dev.txt), que embute o PostgreSQL.
+"""
+import json
+import psycopg2
+import pytest
+
+pgserver = pytest.importorskip("pgserver")
+
+from common import postgres  # noqa: E402
+from common.env import ENV  # noqa: E402
+from purpuria.tools import pedidos_tool  # noqa: E402
+
+ESQUEMA = """
+CREATE TABLE pedido (
+    idPedido integer PRIMARY KEY, data timestamp, agendamentoColeta timestamp, status text,
+    valorTotal numeric, fkEntregador text, fkRecebedor text
+);
+CREATE TABLE residuoPedido (
+    fkPedido integer, fkResiduo text, quantidadeResiduo integer, pesoComprado numeric, tipoUnidade text
+);
+CREATE TABLE transporte (fkPedido integer, transportadora text, dataRetirada timestamp);
+
+INSERT INTO pedido VALUES
+    (1, '2025-01-01', '2025-01-10 08:00', 'aprovado', 100, 'vendedor', 'comprador'),
+    (2, '2025-01-02', '2025-01-11 08:00', 'pendente', 200, 'outro', 'vendedor'),
+    (3, '2025-01-03', '2025-01-12 08:00', 'concluido', 300, 'vendedor', 'comprador'),
+    (4, '2025-01-04', '2025-01-13 08:00', 'pendente', 400, 'vendedor', 'comprador');
+INSERT INTO residuoPedido VALUES
+    (1, 'plastico', 10, 5.5, 'kg'), (1, 'metal', 2, 1.0, 'kg'), (2, 'papel', 1, 3, 'kg');
+INSERT INTO transporte VALUES
+    (1, 'Rota Verde', '2025-01-10 09:00'), (1, 'EcoLog', '2025-01-11 09:00');
+"""
+
+
+@pytest.fixture(scope="module")
+def banco(tmp_path_factory):
+    servidor = pgserver.get_server(tmp_path_factory.mktemp("pg"), cleanup_mode="stop")
+    uri = servidor.get_uri()
+    with psycopg2.connect(uri) as conn, conn.cursor() as cur:
+        cur.execute(ESQUEMA)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(ENV, "POSTGRES_URL", uri)
+        mp.setattr(ENV, "TOOL_CACHE_ATIVO", False)
+        postgres.fechar()
+        yield
+        postgres.fechar()
+
+
+def _consultar(**kwargs) -> tuple[dict[int, dict], bool]:
+    """({idPedido: linha}, mais_resultados) na ordem devolvida pela tool."""
+    resultado = pedidos_tool.consultar_pedidos_com_residuos.func(user_id="vendedor", **kwargs)
+    assert not resultado.startswith("ERRO_"), resultado
+    dados = json.loads(resultado)
+    pedidos = {linha[0]: dict(zip(dados["colunas"], linha)) for linha in dados["linhas"]}
+    return pedidos, dados["mais_resultados"]
+
+
+def test_pedidos_com_residuos_e_transporte(banco):
+    pedidos, mais = _consultar()
+    assert mais is False
+    # Ativos (padrão: aprovado, pendente) como vendedor ou comprador, do agendamento mais recente
+    assert list(pedidos) == [4, 2, 1]
+
+    primeiro = pedidos[1]
+    assert primeiro["papel"] == "vendedor"
+    assert sorted(r["residuo"] for r in primeiro["residuos"]) == ["metal", "plastico"]
+    assert sorted(t["transportadora"] for t in primeiro["transporte"]) == ["EcoLog", "Rota Verde"]
+
+    assert pedidos[2]["papel"] == "comprador"
+    assert pedidos[2]["residuos"] == [{"residuo": "papel", "quantidade": 1, "peso": 3, "unidade": "kg"}]
+    assert pedidos[2]["transporte"] is None
+    assert pedidos[4]["residuos"] == []
+
+
+def test_filtro_de_status_e_limite(banco, monkeypatch):
+    pedidos, _ = _consultar(status="concluido")
+    assert list(pedidos) == [3]
+
+    monkeypatch.setattr(ENV, "PEDIDOS_LIMITE", 2)
+    pedidos, mais = _consultar(status="aprovado, pendente,concluido")
+    assert mais is True
+    assert list(pedidos) == [4, 3]
@@ -0,0 +1,49 @@
+"""
+Cursor de consultar_pedidos_geral: o `proximo_cursor` de uma página, devolvido
+pelo LLM, vira exatamente os parâmetros do keyset da página seguinte.
+"""
+import json
+from datetime import date, datetime, timedelta, timezone
+import pytest
+
+from common import postgres
+from common.env import ENV
+from purpuria.tools import pedidos_tool
+
+
+@pytest.fixture
+def consultas(monkeypatch):
+    monkeypatch.setattr(ENV, "TOOL_CACHE_ATIVO", False)
+    monkeypatch.setattr(ENV, "PEDIDOS_LIMITE", 2)
+    chamadas = []
+
+    def executar_preparada(nome, params=()):
+        chamadas.append(params)
+        base = datetime(2025, 1, 1, 9, 30, 15, 123456, tzinfo=timezone(timedelta(hours=-3)))
+        return [{"idpedido": 10 - i, "data": base - timedelta(minutes=i), "status": "aprovado"} for i in range(3)]
+    monkeypatch.setattr(postgres, "executar_preparada", executar_preparada)
+    return chamadas
+
+
+def test_cursor_ida_e_volta(consultas):
+    pagina = json.loads(pedidos_tool.consultar_pedidos_geral.func(user_id="u"))
+    assert pagina["mais_resultados"] is True
+    cursor = pagina["proximo_cursor"]
+    assert cursor == "2025-01-01T09:29:15.123456-03:00|9"
+
+    pedidos_tool.consultar_pedidos_geral.func(user_id="u", cursor=cursor)
+    cursor_data, cursor_id = consultas[-1][5:7]
+    assert datetime.fromisoformat(cursor_data) == datetime(2025, 1, 1, 12, 29, 15, 123456, tzinfo=timezone.utc)
+    assert cursor_id == 9
+
+
+def test_cursor_de_coluna_date():
+    assert pedidos_tool._cursor_geral({"data": date(2025, 1, 1), "idpedido": 7}) == "2025-01-01|7"
+    assert pedidos_tool._ler_cursor_geral("2025-01-01|7") == ("2025-01-01", 7)
+
+
+@pytest.mark.parametrize("cursor", ["2025-01-01", "ontem|3", "2025-01-01|x", "2025-01-01|3|4"])
+def test_cursor_invalido(consultas, cursor):
+    resultado = pedidos_tool.consultar_pedidos_geral.func(user_id="u", cursor=cursor)
+    assert resultado.startswith("ERRO_CURSOR_INVALIDO")
+    assert consultas == []
@@ -0,0 +1,7 @@
+"""Conjunto de avaliação do pré-roteador disjunto dos exemplos de treino."""
+from scripts import avaliar_pre_roteador
+
+
+def test_avaliacao_nao_repete_exemplos_de_treino():
+    _, vistas = avaliar_pre_roteador.separar_vistas(avaliar_pre_roteador.carregar(avaliar_pre_roteador.DADOS_PADRAO))
+    assert vistas == []
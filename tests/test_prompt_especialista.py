@@ -0,0 +1,23 @@
+"""
+Prompt do especialista: o texto passa por .format() e depois pelo
+ChatPromptTemplate, então chaves literais (ex.: o formato tabular das tools)
+não podem virar variáveis do template.
+"""
+import pytest
+from langchain_core.messages import HumanMessage
+
+from purpuria import core
+
+
+@pytest.mark.parametrize("dominio", sorted(core.TOOLS_POR_DOMINIO))
+def test_prompt_especialista_formata(dominio):
+    prompt = core.montar_prompt_especialista(dominio)
+    assert set(prompt.input_variables) == {"chat_history", "input", "agent_scratchpad"}
+
+    mensagens = prompt.format_messages(
+        chat_history=[], input="ROUTE=pedidos\nPERGUNTA_ORIGINAL=oi", agent_scratchpad=[]
+    )
+    sistema = mensagens[0].content
+    assert f'dominio  : "{dominio}"' in sistema
+    assert '{"colunas": [...], "linhas": [[...]]}' in sistema
+    assert isinstance(mensagens[-1], HumanMessage)
@@ -0,0 +1,28 @@
+"""Formatação dos resultados das tools dentro do orçamento de tokens."""
+import json
+
+from purpuria.serializacao import formatar_linhas, formatar_textos
+
+
+def test_primeira_linha_acima_do_orcamento_vai_cortada():
+    linhas = [{"id": 1, "status": "ativo", "obs": "x" * 4000}, {"id": 2, "status": "ativo", "obs": "y" * 400}]
+    resultado = json.loads(formatar_linhas(linhas, orcamento=60))
+
+    assert len(resultado["linhas"]) == 1
+    id_pedido, status, obs = resultado["linhas"][0]
+    assert (id_pedido, status) == (1, "ativo")
+    assert obs.startswith("xxx") and obs.endswith("…")
+    assert resultado["resumo"]["linhas_omitidas"] == 1
+    assert resultado["resumo"]["por_status"]["ativo"]["quantidade"] == 2
+
+
+def test_linhas_dentro_do_orcamento_vao_inteiras():
+    linhas = [{"id": i, "status": "ativo"} for i in range(3)]
+    resultado = json.loads(formatar_linhas(linhas, orcamento=500))
+    assert resultado["linhas"] == [[i, "ativo"] for i in range(3)]
+    assert "resumo" not in resultado
+
+
+def test_primeiro_texto_acima_do_orcamento_vai_cortado():
+    textos = json.loads(formatar_textos(["a" * 1000, "b"], orcamento=10))
+    assert textos == ["a" * 40 + "…"]